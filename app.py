@@ -32,16 +32,37 @@ import random
 import pandas as pd
 import streamlit as st
 import unicodedata
-from supabase import create_client
+from supabase import create_client, ClientOptions
 from streamlit_cookies_manager import EncryptedCookieManager
 import streamlit.components.v1 as components
 from collections import Counter
+import heapq
 import time
 import traceback
 import base64
 import textwrap 
 import json
 import html
+import threading
+import hashlib
+import httpx
+import numpy as np
+import zlib
+import os
+import io
+import cProfile
+import pstats
+import marshal
+import sqlite3
+import uuid
+import bisect
+import re
+import csv
+import functools
+import tempfile
+import shutil
+import sys
+from collections import deque
 
 # ============================================================
 # ✅ Page Config + Paths
@@ -64,6 +85,18 @@ st.markdown(f"""
 BASE_DIR = Path(__file__).resolve().parent
 CSV_PATH = BASE_DIR / "data" / "beginner.csv"   # ✅ 왕초보 단어 CSV
 PATTERN_CSV_PATH = BASE_DIR / "data" / "patterns_beginner.csv"
+
+# ✅ 단어장(덱) 레지스트리: 새 레벨(N4~N1 등)은 여기 한 줄 추가
+#   - 파일은 처음 선택될 때만 로드(시작 시엔 stat만)
+#   - 내용이 같은 파일은 하나로 합침(해시 비교)
+#   - stats_level: record_word_results_bulk에 넘기는 level 값
+DEFAULT_DECK_ID = "beginner"
+DECK_SPECS = {
+    "beginner": {"path": CSV_PATH, "label": "왕초보 단어", "stats_level": "BEGINNER"},
+    "words_beginner": {"path": BASE_DIR / "data" / "words_beginner.csv", "label": "왕초보 단어", "stats_level": "BEGINNER"},
+    "one": {"path": BASE_DIR / "data" / "one.csv", "label": "기초 300", "stats_level": "ONE"},
+}
+WORD_ID_PATH = BASE_DIR / "data" / "word_ids.csv"   # ✅ jp_word → 고정 word_id (커밋된 목록, 실행 중에는 읽기만)
 APP_URL = "https://YOUR_STREAMLIT_APP_URL_HERE/"      # ✅ 이메일 인증 redirect용 (스트림릿 앱 주소로 교체)
 
 # ============================================================
@@ -87,6 +120,8 @@ POS_LABEL_MAP = {
     "adj_na": "な형용사",
     "other": "기타",
 }
+# quiz_attempts.level: 보통 pos_group, 여러 품사가 섞인 챌린지/과제 회차는 그 표시
+ATTEMPT_LEVEL_LABEL_MAP = {**POS_LABEL_MAP, "challenge": "챌린지", "assignment": "과제"}
 
 OTHER_POS_OPTIONS = ["adv", "particle", "conj", "interj"]
 OTHER_POS_LABEL_MAP = {
@@ -507,7 +542,31 @@ if "SUPABASE_URL" not in st.secrets or "SUPABASE_ANON_KEY" not in st.secrets:
 
 SUPABASE_URL = st.secrets["SUPABASE_URL"]
 SUPABASE_ANON_KEY = st.secrets["SUPABASE_ANON_KEY"]
-sb = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+
+DB_HTTP_TIMEOUT_S = 15.0  # 호출 예산(DB 보호 섹션)을 넘겨 버려진 요청도 결국 끝나도록
+
+@st.cache_resource(show_spinner=False)
+def get_shared_http_client() -> httpx.Client:
+    """
+    프로세스 공용 HTTP 커넥션 풀.
+    - 모든 Supabase 클라이언트(anon/authed)가 같은 TLS 연결을 재사용
+    - 인증 헤더는 요청마다 따로 실리므로 세션 간 공유해도 안전
+    """
+    return httpx.Client(
+        http2=True,
+        follow_redirects=True,
+        timeout=httpx.Timeout(DB_HTTP_TIMEOUT_S, connect=5.0),
+    )
+
+def create_supabase_client():
+    # ✅ 클라이언트 객체는 세션/rerun별로 따로(인증 상태 분리), 커넥션 풀만 공유
+    return create_client(
+        SUPABASE_URL,
+        SUPABASE_ANON_KEY,
+        options=ClientOptions(httpx_client=get_shared_http_client()),
+    )
+
+sb = create_supabase_client()
 
 # ============================================================
 # ✅ Utils: 위젯 잔상(q_...) 제거
@@ -594,24 +653,35 @@ def render_combo_small_badge():
 # ============================================================
 # ✅ POS filters (✅ B안 핵심)
 # ============================================================
-def get_pos_filters() -> list[str]:
-    g = str(st.session_state.get("pos_group", "noun")).strip().lower()
+def pos_group_filters(pos_group: str, other_selected=None) -> list[str]:
+    """세션 없이 쓰는 버전 (학습지 생성 등). other는 세부 선택이 없으면 전체."""
+    g = str(pos_group or "noun").strip().lower()
     if g == "other":
-        sel = st.session_state.get("other_pos_selected", set())
-        sel = [x for x in OTHER_POS_OPTIONS if x in sel]
+        sel = [x for x in OTHER_POS_OPTIONS if x in (other_selected or ())]
         return sel if sel else list(OTHER_POS_OPTIONS)
     return [g]
 
+def get_pos_filters() -> list[str]:
+    return pos_group_filters(
+        st.session_state.get("pos_group", "noun"),
+        st.session_state.get("other_pos_selected", set()),
+    )
+
 # ============================================================
 # ✅ Key helpers (정복/제외/배너)
 # ============================================================
-def mastery_key(qtype: str | None = None, pos: str | None = None) -> str:
+def mastery_key(qtype: str | None = None, pos: str | None = None, deck_id: str | None = None) -> str:
     qt = qtype or st.session_state.get("quiz_type", "meaning")
     ps = (pos or st.session_state.get("pos_group", "noun")).lower().strip()
+    deck_id = deck_id or st.session_state.get("deck_id", DEFAULT_DECK_ID)
+    if deck_id and deck_id != DEFAULT_DECK_ID:
+        # ✅ 기본 덱은 기존 키 그대로(저장된 기록 호환), 다른 덱만 접두어
+        return f"{deck_id}:{ps}__{qt}"
     return f"{ps}__{qt}"
 
-def fetch_is_admin_from_db(sb_authed, user_id: str) -> bool:
-    try:
+def fetch_is_admin_from_db(sb_authed, user_id: str) -> bool | None:
+    """None = 지금은 확인 불가(백엔드 장애, 기억된 값도 없음)."""
+    def _fetch():
         res = (
             sb_authed.table("profiles")
             .select("is_admin")
@@ -621,9 +691,9 @@ def fetch_is_admin_from_db(sb_authed, user_id: str) -> bool:
         )
         if res and res.data is not None:
             return bool(res.data.get("is_admin", False))
-    except Exception:
         return False
-    return False
+
+    return stale_read(("is_admin", user_id), _fetch, name="profiles.is_admin", default=None)
 
 def is_admin() -> bool:
     cached = st.session_state.get("is_admin_cached")
@@ -646,6 +716,8 @@ def is_admin() -> bool:
         return False
 
     val = fetch_is_admin_from_db(sb_authed_local, u.id)
+    if val is None:
+        return False  # 확인 불가 → 이번 rerun만 False (세션에 굳히지 않음)
     st.session_state["is_admin_cached"] = val
     return bool(val)
 
@@ -698,7 +770,7 @@ def sync_answers_from_widgets():
     for idx in range(len(quiz)):
         widget_key = f"q_{qv}_{idx}"
         if widget_key in st.session_state:
-            st.session_state.answers[idx] = st.session_state[widget_key]
+            st.session_state.answers[idx] = answer_index(quiz[idx], st.session_state[widget_key])
 
 def start_quiz_state(quiz_list: list, qtype: str, clear_wrongs: bool = True):
     st.session_state.quiz_version = int(st.session_state.get("quiz_version", 0)) + 1
@@ -714,6 +786,8 @@ def start_quiz_state(quiz_list: list, qtype: str, clear_wrongs: bool = True):
     st.session_state.saved_this_attempt = False
     st.session_state.stats_saved_this_attempt = False
     st.session_state.session_stats_applied_this_attempt = False
+    st.session_state.srs_applied_this_attempt = False
+    st.session_state.attempt_id = new_attempt_id()  # ✅ 제출 저널/중복 방지 키
     
     # ✅ 추가: 새 회차 시작 시 콤보 알림 단계 초기화
     st.session_state["combo_last_notice"] = 0
@@ -732,19 +806,12 @@ def mark_progress_dirty():
     if (sb_authed_local is None) or (u is None):
         return
 
-    now = time.time()
-    last = st.session_state.get("_last_progress_save_ts", 0.0)
-    if now - last < 60.0:
-        return
-
     try:
-        save_progress_to_db(sb_authed_local, u.id)
-        st.session_state._last_progress_save_ts = now
-        st.session_state.progress_dirty = False
+        queue_progress_change(sb_authed_local, u.id)  # 백그라운드 저장(debounce)
     except Exception:
         pass
 
-def mark_quiz_as_seen(quiz_list: list[dict], qtype: str, pos_group: str):
+def mark_quiz_as_seen(quiz_list: list[QuizQuestion], qtype: str, pos_group: str):
     ensure_seen_words_shape()
     k = mastery_key(qtype=qtype, pos=pos_group)
     s = st.session_state.seen_words.setdefault(k, set())
@@ -752,6 +819,7 @@ def mark_quiz_as_seen(quiz_list: list[dict], qtype: str, pos_group: str):
         w = str(q.get("jp_word", "")).strip()
         if w:
             s.add(w)
+    queue_word_sets_save()
             
 # ============================================================
 # ✅ Auth helpers (JWT refresh, sb authed)
@@ -761,6 +829,11 @@ def is_jwt_expired_error(e: Exception) -> bool:
     return ("jwt expired" in msg) or ("pgrst303" in msg)
 
 def clear_auth_everywhere():
+    try:
+        progress_flush(getattr(st.session_state.get("user"), "id", None))
+    except Exception:
+        pass
+
     try:
         cookies["access_token"] = ""
         cookies["refresh_token"] = ""
@@ -768,6 +841,10 @@ def clear_auth_everywhere():
     except Exception:
         pass
 
+    export = st.session_state.pop("_export_file", None)
+    if export:
+        Path(export["path"]).unlink(missing_ok=True)
+
     for k in [
         "user", "access_token", "refresh_token",
         "login_email", "email_link_notice_shown",
@@ -780,7 +857,7 @@ def clear_auth_everywhere():
         "attendance_checked", "streak_count", "did_attend_today",
         "is_admin_cached",
         "session_stats_applied_this_attempt",
-        "mastered_words",
+        "mastered_words", "srs",
         "progress_restored", "pool_ready",
         "_sb_authed", "_sb_authed_token",
         "excluded_wrong_words",
@@ -788,13 +865,248 @@ def clear_auth_everywhere():
         "pos_group",
         "other_pos_selected",
         "plan_cached",
+        "deck_id",
+        "profile_ensured_uid",
+        "progress_seq", "progress_base_version", "progress_base_seq", "progress_base_answers",
     ]:
         st.session_state.pop(k, None)
 
-def run_db(callable_fn):
+# ============================================================
+# ✅ DB 보호: 호출별 시간 예산 · 읽기 헤징 · 서킷 브레이커 · stale 캐시
+#   - 실제 호출은 공용 워커 풀에서 실행 → 스크립트 스레드는 예산만큼만 기다림
+#   - 읽기(hedge=True): DB_HEDGE_AFTER_S 안에 안 오면 같은 요청을 1번 더 보내 먼저 온 것 사용
+#   - 최근 DB_BREAKER_WINDOW_S 동안 오류/느린 호출 비율이 높으면 잠시 "열림" → 즉시 실패
+#   - stale_read: 성공 값을 기억해 두고, 실패하면 오래되지 않은 값으로 대신 응답
+#     (plan / is_admin / 오늘 푼 문항 수 / 리포트 → 백엔드가 느려도 퀴즈는 계속)
+#   - 프로세스 전체 동시 요청 상한(DB_MAX_INFLIGHT): 넘치면 예산 안에서 기다렸다가, 그래도 안 되면 빨리 실패
+#   - 같은 키의 읽기가 동시에 들어오면 1번만 보내고 결과를 나눠 씀(coalesce)
+# ============================================================
+DB_TIMEOUT_READ_S = 4.0
+DB_TIMEOUT_WRITE_S = 8.0
+DB_HEDGE_AFTER_S = 1.0
+DB_WORKERS = 16
+DB_MAX_INFLIGHT = 48            # 워커 풀에 올라간(실행 + 대기) 호출 상한
+DB_BREAKER_WINDOW_S = 30.0
+DB_BREAKER_MIN_CALLS = 6
+DB_BREAKER_BAD_RATE = 0.5       # 오류 + 느린 호출 비율
+DB_BREAKER_SLOW_S = 3.0
+DB_BREAKER_COOLDOWN_S = 20.0
+DB_STALE_MAX_AGE_S = 24 * 3600
+DB_STALE_MAX_KEYS = 5000
+
+class DBUnavailable(Exception):
+    """시간 예산 초과 또는 서킷 열림 (백엔드를 기다리지 않고 빨리 실패)."""
+
+class DBTimeout(DBUnavailable):
+    """시간 예산 초과: 요청은 이미 나갔음 → 서버에서는 반영됐을 수도 있음."""
+
+@st.cache_resource(show_spinner=False)
+def get_db_guard() -> dict:
+    from concurrent.futures import ThreadPoolExecutor
+    from collections import OrderedDict
+
+    return {
+        "lock": threading.Lock(),
+        "pool": ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="hotena-db"),
+        "events": deque(maxlen=256),   # (ts, bad)
+        "open_until": 0.0,
+        "probing": False,
+        "stale": OrderedDict(),        # key → (value, ts)
+        "slots": threading.Condition(),
+        "inflight": 0,
+        "flights": {},                 # 읽기 키 → 진행 중 Future (coalesce)
+    }
+
+def _breaker_allow(guard: dict) -> bool | str:
+    """통과면 True, 반열림 확인용 1건이면 "probe" (그 호출이 결과를 못 남기면 _breaker_release_probe)."""
+    now = time.time()
+    with guard["lock"]:
+        if now >= guard["open_until"]:
+            if guard["open_until"] and not guard["probing"]:
+                guard["probing"] = True  # 반열림: 1건만 통과시켜 회복 확인
+                return "probe"
+            return not guard["probing"] or guard["open_until"] == 0.0
+        return False
+
+def _breaker_record(guard: dict, ok: bool, took: float):
+    now = time.time()
+    bad = (not ok) or took >= DB_BREAKER_SLOW_S
+    with guard["lock"]:
+        if guard["probing"]:
+            guard["probing"] = False
+            guard["open_until"] = now + DB_BREAKER_COOLDOWN_S if bad else 0.0
+            if not bad:
+                guard["events"].clear()
+            return
+        guard["events"].append((now, bad))
+        recent = [b for t, b in guard["events"] if now - t <= DB_BREAKER_WINDOW_S]
+        if len(recent) >= DB_BREAKER_MIN_CALLS and sum(recent) / len(recent) >= DB_BREAKER_BAD_RATE:
+            guard["open_until"] = now + DB_BREAKER_COOLDOWN_S
+            guard["events"].clear()
+
+def _breaker_release_probe(guard: dict):
+    """확인용 호출이 백엔드까지 못 감(풀 포화) → 판정 없이 반열림으로 되돌림 (다음 호출이 다시 확인)."""
+    with guard["lock"]:
+        guard["probing"] = False
+
+def db_breaker_status() -> dict:
+    guard = get_db_guard()
+    now = time.time()
+    with guard["lock"]:
+        recent = [b for t, b in guard["events"] if now - t <= DB_BREAKER_WINDOW_S]
+        return {
+            "open": now < guard["open_until"],
+            "open_for_s": round(max(0.0, guard["open_until"] - now), 1),
+            "probing": guard["probing"],
+            "recent_calls": len(recent),
+            "recent_bad": int(sum(recent)),
+        }
+
+def _pool_submit(guard: dict, fn, deadline: float | None):
+    """
+    동시 요청 상한 안에서 워커 풀에 올림.
+    deadline(perf_counter 기준)까지 자리가 안 나면 None. deadline=None이면 기다리지 않음(헤징용).
+    """
+    with guard["slots"]:
+        while guard["inflight"] >= DB_MAX_INFLIGHT:
+            left = (deadline - time.perf_counter()) if deadline is not None else 0.0
+            if left <= 0:
+                return None
+            guard["slots"].wait(timeout=left)
+        guard["inflight"] += 1
+
+    def _release(_f):
+        with guard["slots"]:
+            guard["inflight"] -= 1
+            guard["slots"].notify()
+
+    fut = guard["pool"].submit(fn)
+    fut.add_done_callback(_release)
+    return fut
+
+def db_inflight() -> int:
+    guard = get_db_guard()
+    with guard["slots"]:
+        return guard["inflight"]
+
+def db_call(fn, name: str = "db", timeout: float | None = None, hedge: bool = False):
+    """
+    fn()을 워커 풀에서 실행하고 timeout(초)까지만 기다림.
+    fn 안에서는 st.* 를 쓰지 말 것(스크립트 컨텍스트 밖에서 실행됨).
+    """
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    guard = get_db_guard()
+    allowed = _breaker_allow(guard)
+    if not allowed:
+        metric_inc("hotena_db_fastfail_total", {"name": name, "reason": "circuit_open"})
+        raise DBUnavailable(f"{name}: circuit open")
+
+    budget = float(timeout if timeout is not None else (DB_TIMEOUT_READ_S if hedge else DB_TIMEOUT_WRITE_S))
+    t0 = time.perf_counter()
+    first = _pool_submit(guard, fn, t0 + budget)
+    if first is None:
+        if allowed == "probe":
+            _breaker_release_probe(guard)
+        metric_inc("hotena_db_fastfail_total", {"name": name, "reason": "overloaded"})
+        raise DBUnavailable(f"{name}: {DB_MAX_INFLIGHT} calls already in flight")
+    futures = [first]
+    first_error = None
+    while True:
+        left = budget - (time.perf_counter() - t0)
+        if left <= 0:
+            break
+        step = left
+        if hedge and len(futures) == 1:
+            step = min(left, max(0.0, DB_HEDGE_AFTER_S - (time.perf_counter() - t0)))
+        done, _ = wait(futures, timeout=step, return_when=FIRST_COMPLETED)
+        for f in done:
+            futures.remove(f)
+            err = f.exception()
+            if err is None:
+                _breaker_record(guard, True, time.perf_counter() - t0)
+                return f.result()
+            first_error = first_error or err
+        if not futures:
+            break
+        if hedge and len(futures) == 1 and not done and first_error is None:
+            extra = _pool_submit(guard, fn, None)  # 붐비면 헤징 생략
+            if extra is not None:
+                metric_inc("hotena_db_hedges_total", {"name": name})
+                futures.append(extra)
+
+    took = time.perf_counter() - t0
+    _breaker_record(guard, False, took)
+    if first_error is not None and not futures:
+        raise first_error
+    metric_inc("hotena_db_fastfail_total", {"name": name, "reason": "timeout"})
+    raise DBTimeout(f"{name}: no response in {budget:.1f}s")
+
+def db_coalesce(key: tuple, call):
+    """
+    같은 key의 call()이 이미 진행 중이면 그 결과(또는 예외)를 같이 받음.
+    call은 스크립트 스레드에서 실행됨(내부에서 db_call로 예산/헤징 적용).
+    """
+    from concurrent.futures import Future
+
+    guard = get_db_guard()
+    with guard["lock"]:
+        fut = guard["flights"].get(key)
+        leader = fut is None
+        if leader:
+            fut = Future()
+            guard["flights"][key] = fut
+    if not leader:
+        metric_inc("hotena_db_coalesced_total")
+        return fut.result(timeout=DB_TIMEOUT_WRITE_S)
     try:
-        return callable_fn()
+        value = call()
+        fut.set_result(value)
+        return value
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        with guard["lock"]:
+            guard["flights"].pop(key, None)
+
+_STALE_MISSING = object()
+
+def stale_read(key: tuple, fn, name: str, default=_STALE_MISSING, timeout: float | None = None):
+    """읽기 전용: 성공하면 값 기억, 실패하면 기억해 둔 값(없으면 default, default도 없으면 예외)."""
+    guard = get_db_guard()
+    try:
+        value = db_coalesce(key, lambda: db_call(fn, name=name, timeout=timeout, hedge=True))
+    except Exception:
+        with guard["lock"]:
+            hit = guard["stale"].get(key)
+        if hit is not None and time.time() - hit[1] <= DB_STALE_MAX_AGE_S:
+            metric_inc("hotena_db_stale_fallback_total", {"name": name})
+            return hit[0]
+        if default is _STALE_MISSING:
+            raise
+        return default
+    with guard["lock"]:
+        guard["stale"][key] = (value, time.time())
+        guard["stale"].move_to_end(key)
+        while len(guard["stale"]) > DB_STALE_MAX_KEYS:
+            guard["stale"].popitem(last=False)
+    return value
+
+def run_db(callable_fn, name: str, hedge: bool = False, key: tuple | None = None):
+    """name은 필수: 메트릭/프로파일 라벨 (lambda의 __name__은 전부 "<lambda>"라 구분 안 됨)."""
+    t0 = time.perf_counter()
+    try:
+        if key is not None:
+            res = db_coalesce(key, lambda: db_call(callable_fn, name=name, hedge=hedge))
+        else:
+            res = db_call(callable_fn, name=name, hedge=hedge)
+        metric_inc("hotena_db_calls_total", {"name": name, "status": "ok"})
+        metric_observe("hotena_db_seconds", time.perf_counter() - t0, {"name": name})
+        return res
     except Exception as e:
+        metric_inc("hotena_db_calls_total", {"name": name, "status": "error"})
+        metric_observe("hotena_db_seconds", time.perf_counter() - t0, {"name": name})
         if is_jwt_expired_error(e):
             ok = refresh_session_from_cookie_if_needed(force=True)
             if ok:
@@ -803,6 +1115,424 @@ def run_db(callable_fn):
             st.warning("세션이 만료되었습니다. 다시 로그인해 주세요.")
             st.rerun()
         raise
+
+# ============================================================
+# ✅ 제출 저널 (로컬 SQLite WAL → 백그라운드 재전송)
+#   - 제출은 먼저 journal 테이블에 기록(재시작해도 남음) → 드레이너 스레드가 Supabase로 전송
+#   - attempt_id로 중복 방지: quiz_attempts는 attempt_id 기준 upsert(중복 무시)
+#     (컬럼/UNIQUE 제약이 없으면 일반 insert로 자동 전환 = 최소 1회 전송)
+#   - 밀린 기록은 종류·인증별로 묶어 한 번에 전송(bulk insert / RPC 1회)
+#     제출 직후 JOURNAL_BATCH_WINDOW_S 동안 모아서 → 동시에 몰린 제출도 몇 번의 요청으로
+#   - 인증: SUPABASE_SERVICE_ROLE_KEY가 있으면 그것으로, 없으면 제출자의 access token
+#     (토큰은 메모리에만 보관 → 재시작 후에는 그 유저가 다시 접속할 때 journal_refresh_token으로 채움)
+#   - 전송 전에 claim_id로 행을 먼저 잡음(UPDATE 1문장) → 드레이너/다른 프로세스가 같은 행을 동시에 보내지 않음
+#   - word_results 항목마다 attempt_id가 들어 있음 → 서버 RPC record_word_results_bulk_once가
+#     처음 보는 attempt_id의 항목만 누적 (supabase/migrations/20261019000000_attempt_id_dedupe.sql)
+#     이 RPC가 없는 서버(확인 전/미적용): 예전 record_word_results_bulk로 제출 1건씩 보내고,
+#     응답이 불확실한 실패(타임아웃/전송 중 끊김)는 다시 보내지 않음(unconfirmed로 끝냄) → 두 번 누적 X
+#   - attempt_id 컬럼이 없는 스키마(일반 insert)는 (user_id, created_at)으로 이미 들어간 회차를 걸러냄
+# ============================================================
+JOURNAL_PATH = Path(os.environ.get("HOTENA_JOURNAL_PATH", "") or (BASE_DIR / "data" / "attempt_journal.sqlite3"))
+JOURNAL_BATCH = 200
+JOURNAL_IDLE_S = 5.0
+JOURNAL_BATCH_WINDOW_S = 0.25   # 깨어난 뒤 잠깐 모아서 보냄(동시 제출 → 1번의 bulk 전송)
+JOURNAL_BACKOFF_MAX_S = 60.0
+JOURNAL_KEEP_SENT_S = 24 * 3600
+WORD_STATS_DAILY_KEEP_DAYS = 90  # word_stats_daily는 이 기간만 (전체 누적 word_stats는 그대로)
+JOURNAL_CLAIM_TTL_S = 120.0     # 잡아 둔 채 죽은 드레이너의 행은 이 시간이 지나면 다시 가져감
+JOURNAL_DEDUPE_RECHECK_S = 600.0  # 서버에 record_word_results_bulk_once가 없으면 이 간격으로 다시 확인
+
+def _journal_connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path), timeout=10.0, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS journal (
+            entry_id     TEXT PRIMARY KEY,      -- attempt_id:kind
+            attempt_id   TEXT NOT NULL,
+            kind         TEXT NOT NULL,         -- attempt | word_results
+            user_id      TEXT NOT NULL,
+            payload      TEXT NOT NULL,         -- JSON
+            created_at   REAL NOT NULL,
+            tries        INTEGER NOT NULL DEFAULT 0,
+            last_error   TEXT,
+            sent_at      REAL,
+            claim_id     TEXT,                  -- 전송 중인 드레이너
+            claimed_at   REAL
+        )
+        """
+    )
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(journal)")}
+    for col, typ in (("claim_id", "TEXT"), ("claimed_at", "REAL")):
+        if col not in cols:
+            conn.execute(f"ALTER TABLE journal ADD COLUMN {col} {typ}")
+    if "access_token" in cols:
+        conn.execute("UPDATE journal SET access_token = NULL WHERE access_token IS NOT NULL")  # 예전 버전이 남긴 토큰 지움
+    conn.execute("CREATE INDEX IF NOT EXISTS journal_pending ON journal(sent_at, created_at)")
+    # ✅ 단어별 정답 롤업 (word_results 저널 기록과 같은 트랜잭션에서 누적 → 관리자 분석용)
+    for table, day_col in (("word_stats", ""), ("word_stats_daily", "day TEXT NOT NULL, ")):
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {day_col}level TEXT NOT NULL,
+                word_key  TEXT NOT NULL,
+                pos       TEXT NOT NULL,
+                qtype     TEXT NOT NULL,
+                n         INTEGER NOT NULL,
+                correct   INTEGER NOT NULL,
+                PRIMARY KEY ({"day, " if day_col else ""}level, word_key, pos, qtype)
+            )
+            """
+        )
+    # ✅ 혼동 행렬 누적값 (제출마다 증분 → 재시작해도 유지)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS confusions (
+            qtype   TEXT NOT NULL,
+            correct TEXT NOT NULL,
+            picked  TEXT NOT NULL,
+            n       INTEGER NOT NULL,
+            PRIMARY KEY (qtype, correct, picked)
+        )
+        """
+    )
+    return conn
+
+@st.cache_resource(show_spinner=False)
+def get_journal() -> dict:
+    JOURNAL_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = _journal_connect(JOURNAL_PATH)
+    pending = {r[0] for r in conn.execute("SELECT DISTINCT user_id FROM journal WHERE sent_at IS NULL")}
+    try:
+        service_key = str(st.secrets.get("SUPABASE_SERVICE_ROLE_KEY", "") or "")
+    except Exception:
+        service_key = ""
+    j = {
+        "lock": threading.Lock(),
+        "conn": conn,
+        "wake": threading.Event(),
+        "pending_users": pending,
+        "tokens": {},               # user_id → access token (메모리에만)
+        "service_key": service_key,
+        "attempt_id_supported": True,
+        "word_results_dedupe": None,        # None = 아직 모름, True = 서버가 attempt_id로 중복 제거, False = 없음
+        "word_results_dedupe_checked_at": 0.0,
+        "unconfirmed_total": 0,
+        "last_error": "",
+        "last_drain_at": 0.0,
+        "sent_total": 0,
+    }
+    threading.Thread(target=_journal_drain_loop, args=(j,), name="hotena-journal", daemon=True).start()
+    return j
+
+def new_attempt_id() -> str:
+    return uuid.uuid4().hex
+
+def journal_append(attempt_id: str, user_id: str, access_token: str | None, entries: list[tuple[str, object]]):
+    """한 번의 제출 = 한 트랜잭션. 같은 attempt_id로 다시 불러도 중복 기록 안 됨. 토큰은 저장하지 않음."""
+    j = get_journal()
+    now = time.time()
+    rows = [
+        (f"{attempt_id}:{kind}", attempt_id, kind, str(user_id), json.dumps(payload, ensure_ascii=False), now)
+        for kind, payload in entries
+    ]
+    with j["lock"]:
+        conn = j["conn"]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row, (kind, payload) in zip(rows, entries):
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO journal(entry_id, attempt_id, kind, user_id, payload, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+                if kind == "word_results" and cur.rowcount == 1:
+                    _word_stats_rollup(conn, payload, now)  # 새로 들어간 제출만 (재시도 중복 X)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        j["pending_users"].add(str(user_id))
+        if access_token:
+            j["tokens"][str(user_id)] = access_token
+    j["wake"].set()
+
+def _word_stats_rollup(conn: sqlite3.Connection, items: list[dict], ts: float):
+    """제출 1회분 word_results → 전체/일별 롤업에 더하기 (호출하는 쪽 트랜잭션 안에서)."""
+    day = time.strftime("%Y-%m-%d", time.gmtime(ts + 9 * 3600))  # KST 날짜
+    agg: dict[tuple, list[int]] = {}
+    for it in items or []:
+        key = (str(it.get("level", "")), str(it.get("word_key", "")), str(it.get("pos", "")), str(it.get("quiz_type", "")))
+        if not key[1]:
+            continue
+        acc = agg.setdefault(key, [0, 0])
+        acc[0] += 1
+        acc[1] += 1 if it.get("is_correct") else 0
+    if not agg:
+        return
+    conn.executemany(
+        "INSERT INTO word_stats(level, word_key, pos, qtype, n, correct) VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(level, word_key, pos, qtype) DO UPDATE SET n = n + excluded.n, correct = correct + excluded.correct",
+        [(*k, n, c) for k, (n, c) in agg.items()],
+    )
+    conn.executemany(
+        "INSERT INTO word_stats_daily(day, level, word_key, pos, qtype, n, correct) VALUES (?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(day, level, word_key, pos, qtype) DO UPDATE SET n = n + excluded.n, correct = correct + excluded.correct",
+        [(day, *k, n, c) for k, (n, c) in agg.items()],
+    )
+
+def journal_refresh_token(user_id: str | None, access_token: str | None):
+    """밀린 기록이 있는 유저가 다시 접속하면 새 토큰으로 교체 (없으면 아무것도 안 함)."""
+    if not user_id or not access_token:
+        return
+    j = get_journal()
+    if str(user_id) not in j["pending_users"]:
+        return
+    with j["lock"]:
+        if j["tokens"].get(str(user_id)) == access_token:
+            return
+        j["tokens"][str(user_id)] = access_token
+    j["wake"].set()
+
+def journal_purge_user(user_id: str | None):
+    """기록 초기화 시 그 유저의 저널도 지움 (안 그러면 드레이너가 지운 기록을 다시 만듦)."""
+    if not user_id:
+        return
+    j = get_journal()
+    with j["lock"]:
+        j["conn"].execute("DELETE FROM journal WHERE user_id = ?", (str(user_id),))
+        j["pending_users"].discard(str(user_id))
+
+def journal_status(user_id: str | None = None) -> dict:
+    j = get_journal()
+    with j["lock"]:
+        conn = j["conn"]
+        pending = conn.execute("SELECT COUNT(*) FROM journal WHERE sent_at IS NULL").fetchone()[0]
+        mine = 0
+        if user_id:
+            mine = conn.execute(
+                "SELECT COUNT(*) FROM journal WHERE sent_at IS NULL AND user_id = ?", (str(user_id),)
+            ).fetchone()[0]
+        oldest = conn.execute("SELECT MIN(created_at) FROM journal WHERE sent_at IS NULL").fetchone()[0]
+    return {
+        "pending": int(pending),
+        "pending_mine": int(mine),
+        "oldest_age_s": round(time.time() - oldest, 1) if oldest else 0.0,
+        "sent_total": j["sent_total"],
+        "last_error": j["last_error"],
+        "attempt_id_supported": j["attempt_id_supported"],
+        "word_results_dedupe": j["word_results_dedupe"],
+        "unconfirmed_total": j["unconfirmed_total"],
+    }
+
+def _is_missing_attempt_id_error(e: Exception) -> bool:
+    msg = str(e).lower()
+    return "attempt_id" in msg and ("column" in msg or "constraint" in msg or "conflict" in msg)
+
+def _is_missing_rpc_error(e: Exception, fn_name: str) -> bool:
+    """PostgREST: 그런 함수 없음 (PGRST202) → 요청은 아무것도 반영하지 않았음."""
+    msg = str(e).lower()
+    return fn_name in msg and ("pgrst202" in msg or "could not find the function" in msg or "does not exist" in msg)
+
+def _maybe_applied(e: Exception) -> bool:
+    """요청이 서버에 닿은 뒤 응답을 못 받은 실패 = 반영됐는지 모름 (서버가 오류로 답했으면 롤백된 것)."""
+    if isinstance(e, DBTimeout):
+        return True
+    if isinstance(e, DBUnavailable) or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return False  # 보내기 전에 실패
+    return isinstance(e, httpx.TransportError)
+
+def _word_results_dedupe(j: dict) -> bool | None:
+    """서버 중복 제거 지원 여부. 없다고 본 지 오래됐으면 다시 확인(None) → 마이그레이션 후 재시작 없이 전환."""
+    with j["lock"]:
+        ok = j["word_results_dedupe"]
+        if ok is False and time.time() - j["word_results_dedupe_checked_at"] >= JOURNAL_DEDUPE_RECHECK_S:
+            ok = j["word_results_dedupe"] = None
+    return ok
+
+def _journal_send_word_results_once(j: dict, client, items: list[dict]) -> bool:
+    """
+    중복 제거 RPC로 전송 (실패하면 그대로 다시 보내도 됨 = 서버가 attempt_id로 걸러냄).
+    반환 False = 서버에 그 RPC가 없음(아무것도 반영 안 됨) → 호출하는 쪽이 예전 RPC로.
+    """
+    if _word_results_dedupe(j) is False:
+        return False
+    try:
+        db_call(
+            lambda: client.rpc("record_word_results_bulk_once", {"p_items": items}).execute(),
+            name="journal.word_results",
+        )
+    except Exception as e:
+        if not _is_missing_rpc_error(e, "record_word_results_bulk_once"):
+            raise
+        with j["lock"]:
+            j["word_results_dedupe"] = False
+            j["word_results_dedupe_checked_at"] = time.time()
+        return False
+    with j["lock"]:
+        j["word_results_dedupe"] = True
+    return True
+
+def _journal_client(j: dict, cred: str):
+    if cred == "service":
+        return create_client(SUPABASE_URL, j["service_key"], options=ClientOptions(httpx_client=get_shared_http_client()))
+    if not cred:
+        raise RuntimeError("no credential for journal entries")
+    client = create_supabase_client()
+    client.postgrest.auth(cred)
+    return client
+
+def _journal_send_attempts(j: dict, client, payloads: list[dict]):
+    if j["attempt_id_supported"]:
+        try:
+            return db_call(
+                lambda: client.table("quiz_attempts")
+                .upsert(payloads, on_conflict="attempt_id", ignore_duplicates=True)
+                .execute(),
+                name="journal.quiz_attempts",
+            )
+        except Exception as e:
+            if not _is_missing_attempt_id_error(e):
+                raise
+            j["attempt_id_supported"] = False  # 스키마에 attempt_id가 없음 → 일반 insert
+    plain = [{k: v for k, v in p.items() if k != "attempt_id"} for p in payloads]
+    plain = _drop_already_inserted(client, plain)
+    if not plain:
+        return None
+    return db_call(lambda: client.table("quiz_attempts").insert(plain).execute(), name="journal.quiz_attempts")
+
+def _drop_already_inserted(client, payloads: list[dict]) -> list[dict]:
+    """attempt_id가 없는 스키마: 같은 (user_id, created_at) 회차가 이미 있으면 빼고 보냄 (타임아웃 후 재전송 대비)."""
+    stamps = [p.get("created_at") for p in payloads if p.get("created_at")]
+    if not stamps:
+        return payloads
+    res = db_call(
+        lambda: client.table("quiz_attempts")
+        .select("user_id, created_at")
+        .in_("user_id", sorted({str(p["user_id"]) for p in payloads}))
+        .in_("created_at", stamps)
+        .execute(),
+        name="journal.quiz_attempts.dedupe",
+    )
+    have = {(str(r.get("user_id")), _parse_dt_any(r.get("created_at"))) for r in (res.data or [])}
+    return [p for p in payloads if (str(p["user_id"]), _parse_dt_any(p.get("created_at"))) not in have]
+
+def journal_drain_once(j: dict) -> int:
+    """
+    밀린 기록을 한 번 전송. 반환: 전송 완료 건수 (실패가 있으면 예외).
+    보낼 행은 claim_id로 먼저 잡아 둠 → 동시에 도는 다른 드레이너는 같은 행을 못 가져감.
+    서비스 키가 없으면 토큰이 있는(재접속한) 유저의 행만.
+    서버 중복 제거가 확인되기 전의 word_results는 제출 1건씩 보냄 → 불확실한 실패가 그 1건에만 걸림.
+    """
+    claim = uuid.uuid4().hex
+    now = time.time()
+    with j["lock"]:
+        conn = j["conn"]
+        who, args = "", []
+        if not j["service_key"]:
+            users = sorted(j["tokens"])
+            if not users:
+                return 0
+            who = f"AND user_id IN ({', '.join('?' * len(users))}) "
+            args = users
+        conn.execute(
+            "UPDATE journal SET claim_id = ?, claimed_at = ? WHERE entry_id IN ("
+            "SELECT entry_id FROM journal WHERE sent_at IS NULL "
+            "AND (claimed_at IS NULL OR claimed_at < ?) " + who +
+            "ORDER BY created_at LIMIT ?)",
+            (claim, now, now - JOURNAL_CLAIM_TTL_S, *args, JOURNAL_BATCH),
+        )
+        rows = conn.execute(
+            "SELECT entry_id, kind, user_id, payload FROM journal WHERE claim_id = ? ORDER BY created_at",
+            (claim,),
+        ).fetchall()
+        tokens = dict(j["tokens"])
+    if not rows:
+        return 0
+
+    merge_word_results = _word_results_dedupe(j) is True
+    groups: dict[tuple[str, str, str], list] = {}
+    for entry_id, kind, user_id, payload in rows:
+        cred = "service" if j["service_key"] else tokens.get(user_id, "")
+        one = entry_id if kind == "word_results" and not merge_word_results else ""
+        groups.setdefault((kind, cred, one), []).append((entry_id, user_id, json.loads(payload)))
+
+    sent = 0
+    first_error = None
+    for (kind, cred, _), items in groups.items():
+        ids = [x[0] for x in items]
+        deduped = True
+        try:
+            client = _journal_client(j, cred)
+            if kind == "attempt":
+                _journal_send_attempts(j, client, [x[2] for x in items])
+                for uid in {x[1] for x in items}:
+                    attempt_cache_invalidate(uid)  # 전송 전에 캐시된 기록에는 이번 제출이 없음
+            elif kind == "word_results":
+                merged = [it for x in items for it in (x[2] or [])]
+                if merged and not _journal_send_word_results_once(j, client, merged):
+                    deduped = False  # 여기부터 실패는 반영됐을 수도 있음 → 아래에서 재전송 여부 판단
+                    db_call(
+                        lambda: client.rpc("record_word_results_bulk", {"p_items": merged}).execute(),
+                        name="journal.word_results",
+                    )
+            now = time.time()
+            with j["lock"]:
+                j["conn"].executemany(
+                    "UPDATE journal SET sent_at = ?, claim_id = NULL WHERE entry_id = ? AND claim_id = ?",
+                    [(now, i, claim) for i in ids],
+                )
+            sent += len(ids)
+        except Exception as e:
+            if kind == "word_results" and not deduped and _maybe_applied(e):
+                # 서버 중복 제거 없이 보낸 요청의 응답을 못 받음 → 다시 보내면 두 번 누적될 수 있으니 여기서 끝냄
+                now = time.time()
+                with j["lock"]:
+                    j["conn"].executemany(
+                        "UPDATE journal SET sent_at = ?, last_error = ?, claim_id = NULL WHERE entry_id = ? AND claim_id = ?",
+                        [(now, f"unconfirmed: {e}"[:500], i, claim) for i in ids],
+                    )
+                    j["unconfirmed_total"] += len(ids)
+                metric_inc("hotena_journal_unconfirmed_total", value=len(ids))
+                continue
+            first_error = first_error or e
+            with j["lock"]:
+                j["conn"].executemany(
+                    "UPDATE journal SET tries = tries + 1, last_error = ?, claim_id = NULL, claimed_at = NULL "
+                    "WHERE entry_id = ? AND claim_id = ?",
+                    [(str(e)[:500], i, claim) for i in ids],
+                )
+
+    with j["lock"]:
+        conn = j["conn"]
+        j["pending_users"] = {r[0] for r in conn.execute("SELECT DISTINCT user_id FROM journal WHERE sent_at IS NULL")}
+        conn.execute("DELETE FROM journal WHERE sent_at IS NOT NULL AND sent_at < ?", (time.time() - JOURNAL_KEEP_SENT_S,))
+        cutoff_day = time.strftime("%Y-%m-%d", time.gmtime(time.time() + 9 * 3600 - WORD_STATS_DAILY_KEEP_DAYS * 86400))
+        conn.execute("DELETE FROM word_stats_daily WHERE day < ?", (cutoff_day,))  # PK 앞부분이 day → 범위 삭제
+        j["sent_total"] += sent
+        j["last_drain_at"] = time.time()
+        j["last_error"] = str(first_error)[:500] if first_error else ""
+    if sent:
+        metric_inc("hotena_journal_sent_total", value=sent)
+    if first_error is not None:
+        raise first_error
+    return sent
+
+def _journal_drain_loop(j: dict):
+    fails = 0
+    while True:
+        wait_s = JOURNAL_IDLE_S if fails == 0 else min(JOURNAL_BACKOFF_MAX_S, 2.0 ** fails)
+        if j["wake"].wait(timeout=wait_s):
+            time.sleep(JOURNAL_BATCH_WINDOW_S)
+        j["wake"].clear()
+        try:
+            while journal_drain_once(j) >= JOURNAL_BATCH:
+                pass  # 복구 중이면 남은 배치를 바로 이어서
+            fails = 0
+        except Exception:
+            fails += 1
+
 def refresh_session_from_cookie_if_needed(force: bool = False) -> bool:
     # 이미 세션이 있으면 OK
     if not force and st.session_state.get("user") and st.session_state.get("access_token"):
@@ -868,9 +1598,11 @@ def get_authed_sb():
     cached_token = st.session_state.get("_sb_authed_token")
 
     if cached is not None and cached_token == token:
+        cache_event("authed_client", True)
         return cached
+    cache_event("authed_client", False)
 
-    sb2 = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+    sb2 = create_supabase_client()
     sb2.postgrest.auth(token)
 
     st.session_state["_sb_authed"] = sb2
@@ -888,16 +1620,26 @@ def to_kst_naive(x):
 # ============================================================
 # ✅ DB functions (기존 테이블 구조 그대로 활용)
 # ============================================================
-def delete_all_learning_records(sb_authed, user_id):
+def delete_all_learning_records(sb_authed, user_id, reset_at: float):
+    """워커 스레드에서 실행됨(st.* X). reset_at은 스크립트 쪽 mark_word_sets_reset() 값."""
+    journal_purge_user(user_id)  # 아직 안 보낸 제출이 지운 뒤에 다시 올라가지 않도록 먼저
     sb_authed.table("quiz_attempts").delete().eq("user_id", user_id).execute()
-    clear_progress_in_db(sb_authed, user_id)
+    clear_progress_in_db(sb_authed, user_id, reset_at)
 
 def ensure_profile(sb_authed, user):
+    # ✅ 세션당 1번이면 충분 (매 rerun upsert는 장애 때 화면을 붙잡음)
+    if st.session_state.get("profile_ensured_uid") == user.id:
+        return
     try:
-        sb_authed.table("profiles").upsert(
-            {"id": user.id, "email": getattr(user, "email", None)},
-            on_conflict="id",
-        ).execute()
+        db_call(
+            lambda: sb_authed.table("profiles").upsert(
+                {"id": user.id, "email": getattr(user, "email", None)},
+                on_conflict="id",
+            ).execute(),
+            name="profiles.ensure",
+            timeout=DB_TIMEOUT_READ_S,
+        )
+        st.session_state["profile_ensured_uid"] = user.id
     except Exception:
         pass
 
@@ -905,15 +1647,16 @@ def mark_attendance_once(sb_authed):
     if st.session_state.get("attendance_checked"):
         return None
     try:
-        res = sb_authed.rpc("mark_attendance_kst", {}).execute()
+        res = db_call(lambda: sb_authed.rpc("mark_attendance_kst", {}).execute(), name="rpc.mark_attendance_kst", timeout=DB_TIMEOUT_READ_S)
         st.session_state.attendance_checked = True
         return res.data[0] if res.data else None
     except Exception:
         st.session_state.attendance_checked = True
         return None
 
-def save_attempt_to_db(sb_authed, user_id, user_email, pos, quiz_type, quiz_len, score, wrong_list):
+def build_attempt_payload(user_id, user_email, pos, quiz_type, quiz_len, score, wrong_list, attempt_id=None) -> dict:
     payload = {
+        "created_at": datetime.now(timezone.utc).isoformat(),  # ✅ 제출 시각 (저널 재전송 시각 X → 일별 집계/스트릭 그대로)
         "user_id": user_id,
         "user_email": user_email,
         "level": str(pos),          # ✅ level 컬럼에 pos_group 저장
@@ -923,6 +1666,12 @@ def save_attempt_to_db(sb_authed, user_id, user_email, pos, quiz_type, quiz_len,
         "wrong_count": int(len(wrong_list)),
         "wrong_list": wrong_list,
     }
+    if attempt_id:
+        payload["attempt_id"] = attempt_id
+    return payload
+
+def save_attempt_to_db(sb_authed, user_id, user_email, pos, quiz_type, quiz_len, score, wrong_list):
+    payload = build_attempt_payload(user_id, user_email, pos, quiz_type, quiz_len, score, wrong_list)
     sb_authed.table("quiz_attempts").insert(payload).execute()
 
 def fetch_recent_attempts(sb_authed, user_id, limit=10):
@@ -935,6 +1684,155 @@ def fetch_recent_attempts(sb_authed, user_id, limit=10):
         .execute()
     )
 
+# ============================================================
+# ✅ 전체 기록 내보내기 (keyset 페이지 → CSV/Parquet에 페이지씩 이어 쓰기)
+#   - id > 마지막 id 순으로 EXPORT_PAGE개씩 (OFFSET 없음 → 몇만 건이어도 페이지당 비용 일정)
+#   - 메모리에는 한 페이지만. 오답(wrong_list)은 1개 = 1행으로 펼침(오답 없는 회차도 1행)
+#   - 파일은 EXPORT_DIR 임시 파일 → EXPORT_MAX_BYTES 넘으면 중단.
+#     다운로드 버튼에는 callable만 넘김 → 누를 때만 읽음 (rerun마다 파일 전체를 메모리에 올리지 않음)
+#   - 로그아웃 없이 끝난 세션의 파일은 EXPORT_FILE_TTL_S 지나면 정리 (만들 때·세션 정리 때)
+# ============================================================
+EXPORT_PAGE = 1000
+EXPORT_MAX_BYTES = 50 * 1024 * 1024
+EXPORT_FILE_TTL_S = 60 * 60
+EXPORT_DIR = Path(tempfile.gettempdir()) / "hotena_exports"
+EXPORT_ATTEMPT_COLS = ("id", "created_at", "level", "pos_mode", "quiz_len", "score", "wrong_count")
+EXPORT_WRONG_COLS = ("No", "문제", "내 답", "정답", "단어", "읽기", "뜻")
+
+def iter_attempt_pages(sb_authed, user_id: str, page: int = EXPORT_PAGE):
+    last_id = None
+    cols = ", ".join(EXPORT_ATTEMPT_COLS + ("wrong_list",))
+    while True:
+        def _fetch(after=last_id):
+            q = sb_authed.table("quiz_attempts").select(cols).eq("user_id", user_id)
+            if after is not None:
+                q = q.gt("id", after)
+            return q.order("id").limit(page).execute()
+
+        rows = run_db(_fetch, name="export_attempts").data or []
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page:
+            return
+        last_id = rows[-1]["id"]
+
+def expand_attempt_rows(rows: list[dict]) -> list[dict]:
+    out = []
+    for r in rows:
+        base = {
+            "attempt_id": r.get("id"),
+            "created_at": str(r.get("created_at") or ""),
+            "pos_group": str(r.get("level") or ""),
+            "qtype": str(r.get("pos_mode") or ""),
+            "quiz_len": int(r.get("quiz_len") or 0),
+            "score": int(r.get("score") or 0),
+            "wrong_count": int(r.get("wrong_count") or 0),
+        }
+        wl = r.get("wrong_list") if isinstance(r.get("wrong_list"), list) else []
+        if not wl:
+            out.append({**base, **{c: "" for c in EXPORT_WRONG_COLS}})
+        for w in wl:
+            out.append({**base, **{c: str((w or {}).get(c, "")) for c in EXPORT_WRONG_COLS}})
+    return out
+
+def write_history_export(pages, f, fmt: str = "csv") -> tuple[int, int]:
+    """페이지(원본 행 목록)를 받는 대로 f에 씀. 반환: (회차 수, 출력 행 수)."""
+    n_attempts = n_rows = 0
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema(
+            [("attempt_id", pa.int64()), ("created_at", pa.string()), ("pos_group", pa.string()),
+             ("qtype", pa.string()), ("quiz_len", pa.int32()), ("score", pa.int32()), ("wrong_count", pa.int32())]
+            + [(c, pa.string()) for c in EXPORT_WRONG_COLS]
+        )
+        with pq.ParquetWriter(f, schema, compression="zstd") as writer:
+            for rows in pages:
+                out = expand_attempt_rows(rows)
+                for r in out:
+                    r["No"] = str(r["No"])
+                writer.write_table(pa.Table.from_pylist(out, schema=schema))
+                n_attempts += len(rows)
+                n_rows += len(out)
+        return n_attempts, n_rows
+
+    writer = csv.DictWriter(f, fieldnames=list(expand_attempt_rows([{}])[0]))
+    writer.writeheader()
+    for rows in pages:
+        out = expand_attempt_rows(rows)
+        writer.writerows(out)
+        n_attempts += len(rows)
+        n_rows += len(out)
+    return n_attempts, n_rows
+
+def sweep_export_files(max_age_s: float = EXPORT_FILE_TTL_S) -> int:
+    """max_age_s보다 오래된 내보내기 임시 파일 삭제. 반환: 지운 파일 수."""
+    if not EXPORT_DIR.exists():
+        return 0
+    cutoff = time.time() - max_age_s
+    n = 0
+    for fp in EXPORT_DIR.glob("hotena_export_*"):
+        try:
+            if fp.stat().st_mtime < cutoff:
+                fp.unlink()
+                n += 1
+        except OSError:
+            pass
+    return n
+
+def _capped_pages(pages, f):
+    """페이지마다 지금까지 쓴 크기 확인 → EXPORT_MAX_BYTES 넘으면 중단."""
+    for rows in pages:
+        f.flush()
+        if os.fstat(f.fileno()).st_size > EXPORT_MAX_BYTES:
+            raise ValueError(f"파일이 {EXPORT_MAX_BYTES // (1024 * 1024)}MB를 넘습니다. 관리자에게 문의하세요.")
+        yield rows
+
+def _export_reader(path: str):
+    def _read() -> bytes:
+        try:
+            return Path(path).read_bytes()
+        except OSError:
+            return b""
+    return _read
+
+def render_history_export(sb_authed, user_id: str):
+    fmt = st.radio("형식", ["csv", "parquet"], horizontal=True, key="export_fmt",
+                   format_func=lambda x: {"csv": "CSV (엑셀)", "parquet": "Parquet (분석용)"}[x])
+    prev = st.session_state.get("_export_file")
+    if st.button("📦 내보내기 파일 만들기", use_container_width=True, key="btn_export_make"):
+        if prev:
+            Path(prev["path"]).unlink(missing_ok=True)
+        sweep_export_files()
+        EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix="hotena_export_", suffix=f".{fmt}", dir=EXPORT_DIR)
+        try:
+            if fmt == "parquet":
+                with os.fdopen(fd, "wb") as f:
+                    n_att, n_rows = write_history_export(_capped_pages(iter_attempt_pages(sb_authed, user_id), f), f, "parquet")
+            else:
+                with os.fdopen(fd, "w", encoding="utf-8-sig", newline="") as f:
+                    n_att, n_rows = write_history_export(_capped_pages(iter_attempt_pages(sb_authed, user_id), f), f, "csv")
+            if os.path.getsize(path) > EXPORT_MAX_BYTES:
+                raise ValueError(f"파일이 {EXPORT_MAX_BYTES // (1024 * 1024)}MB를 넘습니다. 관리자에게 문의하세요.")
+        except Exception as e:
+            Path(path).unlink(missing_ok=True)
+            st.session_state.pop("_export_file", None)
+            st.error(f"내보내기 실패: {e}")
+            return
+        prev = {"path": path, "fmt": fmt, "attempts": n_att, "rows": n_rows}
+        st.session_state["_export_file"] = prev
+
+    if prev and Path(prev["path"]).exists():
+        st.caption(f"{prev['attempts']}회 · {prev['rows']}행")
+        mime = "text/csv" if prev["fmt"] == "csv" else "application/vnd.apache.parquet"
+        st.download_button("⬇️ 다운로드", _export_reader(prev["path"]), f"hotena_history.{prev['fmt']}", mime,
+                           use_container_width=True, key="btn_export_download")
+    elif prev:
+        st.session_state.pop("_export_file", None)  # TTL 정리로 지워진 파일
+
 def fetch_all_attempts_admin(sb_authed, limit=500):
     return (
         sb_authed.table("quiz_attempts")
@@ -944,15 +1842,16 @@ def fetch_all_attempts_admin(sb_authed, limit=500):
         .execute()
     )
 
-def fetch_plan_from_db(sb_authed, user_id) -> str:
-    try:
+def fetch_plan_from_db(sb_authed, user_id) -> str | None:
+    """None = 지금은 확인 불가(백엔드 장애, 기억된 값도 없음)."""
+    def _fetch():
         res = sb_authed.table("profiles").select("plan").eq("id", user_id).single().execute()
         if res and res.data and "plan" in res.data:
             v = str(res.data["plan"] or "free").strip().lower()
             return v if v in ("free", "pro") else "free"
-    except Exception:
-        pass
-    return "free"
+        return "free"
+
+    return stale_read(("plan", user_id), _fetch, name="profiles.plan", default=None)
 
 def get_user_plan() -> str:
     cached = st.session_state.get("plan_cached")
@@ -970,6 +1869,8 @@ def get_user_plan() -> str:
         return "free"
 
     plan = fetch_plan_from_db(sb_authed_local, u.id)
+    if plan is None:
+        return "free"  # 확인 불가 → 이번 rerun만 free (세션에 굳히지 않음)
     st.session_state["plan_cached"] = plan
     return plan
 
@@ -980,20 +1881,51 @@ def is_pro() -> bool:
     except Exception:
         return False
     
-def build_word_results_bulk_payload(quiz: list[dict], answers: list, quiz_type: str, pos: str) -> list[dict]:
+def pos_group_of(pos: str) -> str:
+    """단어의 pos → 통계용 품사 그룹 (부사/조사 등은 other)."""
+    p = str(pos or "").strip().lower()
+    return p if p in POS_GROUP_OPTIONS else "other"
+
+def quiz_source() -> tuple[str | None, str | None]:
+    """지금 퀴즈의 출처: ("challenge", 기본 덱) / ("assignment", 과제 덱) / (None, None) = 일반 퀴즈."""
+    if active_challenge():
+        return "challenge", DEFAULT_DECK_ID
+    cur = active_assignment()
+    a = get_assignment(cur["code"]) if cur else None
+    if a is not None:
+        return "assignment", a["deck_id"]
+    return None, None
+
+def quiz_mastery_key_of(qtype: str):
+    """
+    문항 → SRS/mastered 키.
+    일반 퀴즈는 세션의 pos_group·덱 그대로, 챌린지/과제는 품사가 섞여 있으니 단어마다 자기 품사·출제 덱으로.
+    """
+    kind, deck_id = quiz_source()
+    if kind is None:
+        k = mastery_key(qtype)
+        return lambda q: k
+    return lambda q: mastery_key(qtype, pos_group_of(q.pos), deck_id)
+
+def quiz_stats_level() -> str:
+    """지금 퀴즈가 나온 덱의 stats_level (챌린지 = 기본 덱, 과제 = 과제 덱, 그 외 = 선택한 덱)."""
+    _, deck_id = quiz_source()
+    spec = DECK_SPECS.get(deck_id) if deck_id else current_deck_spec()
+    return (spec or DECK_SPECS[DEFAULT_DECK_ID]).get("stats_level", "BEGINNER")
+
+def build_word_results_bulk_payload(quiz: list, graded: bytes, quiz_type: str, level: str) -> list[dict]:
     items = []
     for idx, q in enumerate(quiz):
         word_key = (str(q.get("jp_word", "")).strip() or str(q.get("reading", "")).strip())
         if not word_key:
             continue
-        picked = answers[idx] if idx < len(answers) else None
-        is_correct = (picked == q.get("correct_text"))
+        is_correct = bool(graded[idx]) if idx < len(graded) else False
 
         items.append(
             {
                 "word_key": word_key,
-                "level": "BEGINNER",
-                "pos": str(pos),            # ✅ pos_group 저장(통계에서는 그룹 기준)
+                "level": level,
+                "pos": pos_group_of(q.get("pos", "")),  # ✅ 문항 단어의 그룹 (챌린지는 여러 그룹이 섞임)
                 "quiz_type": str(quiz_type),
                 "is_correct": bool(is_correct),
             }
@@ -1002,51 +1934,454 @@ def build_word_results_bulk_payload(quiz: list[dict], answers: list, quiz_type:
 
 # ============================================================
 # ✅ Progress (DB 저장/복원)  (✅ pos_group + 기타 체크 저장)
+#   - base: profiles.progress (퀴즈 전체 + srs) → 새 회차의 첫 선택 / 제출 때만
+#   - delta: profiles.progress_delta (작은 JSON) → base 이후 바뀐 보기 {문항 idx: 보기 idx}
+#     quiz_version + seq로 태깅 → 복원 때 base의 seq와 맞는 delta만 덮어씀
+#   - 라디오 on_change는 큐에 넣기만 함 → 백그라운드 스레드가 PROGRESS_DEBOUNCE_S 뒤 유저별 최신 1건 전송
+#   - 제출(base 동기 저장) · 페이지 이동 · 로그아웃 때 밀린 것 바로 flush
+#   - progress_delta 컬럼이 없으면 자동으로 base 전체 저장 방식으로 전환
+#   - word_sets: 출제 이력/정복/제외 세트를 mastery_key별 압축 비트맵으로 (같은 read로 복원, 같은 writer로 저장)
 # ============================================================
-def save_progress_to_db(sb_authed, user_id: str):
-    if "quiz" not in st.session_state or "answers" not in st.session_state:
-        return
+PROGRESS_DEBOUNCE_S = 3.0
+PROGRESS_RETRY_S = 15.0
+PROGRESS_OPTIONAL_COLS = ("progress_delta", "word_sets")   # 없으면 자동으로 빼고 동작
+
+@st.cache_resource(show_spinner=False)
+def get_progress_writer() -> dict:
+    w = {
+        "lock": threading.Lock(),
+        "pending": {},                 # user_id → {"sb", "base", "delta", "sets", "due"}
+        "wake": threading.Event(),
+        "missing_cols": set(),         # PROGRESS_OPTIONAL_COLS 중 DB에 없는 것
+        "stale_sets": {},              # user_id → DB의 더 최근 초기화 word_sets (다음 rerun에 세션이 받아 감)
+        "last_error": "",
+    }
+    threading.Thread(target=_progress_writer_loop, args=(w,), name="hotena-progress", daemon=True).start()
+    return w
+
+def _progress_next_seq() -> int:
+    seq = int(st.session_state.get("progress_seq", 0) or 0) + 1
+    st.session_state.progress_seq = seq
+    return seq
+
+def _progress_answer_indices() -> list[int | None]:
+    """문항별 선택한 보기 index (on_change 안에서도 최신이 되도록 위젯 값 우선)."""
+    quiz = st.session_state.get("quiz") or []
+    answers = st.session_state.get("answers") or []
+    ver = st.session_state.get("quiz_version", 0)
+    out = []
+    for idx, q in enumerate(quiz):
+        v = answer_index(q, st.session_state.get(f"q_{ver}_{idx}", None))
+        if v is None and idx < len(answers):
+            v = answers[idx]
+        out.append(v)
+    return out
 
-    payload = {
+def build_progress_payload(seq: int) -> dict:
+    quiz = st.session_state.get("quiz") or []
+    picked = _progress_answer_indices()
+    return {
+        "deck_id": current_deck_id(),
         "pos_group": st.session_state.get("pos_group"),
         "other_pos_selected": list(st.session_state.get("other_pos_selected", set())),
         "quiz_type": st.session_state.get("quiz_type"),
         "quiz_version": int(st.session_state.get("quiz_version", 0) or 0),
-        "quiz": st.session_state.get("quiz"),
-        "answers": st.session_state.get("answers"),
+        "seq": int(seq),
+        "quiz": [q.to_dict() for q in quiz],
+        "answers": picked,              # 보기 index
         "submitted": bool(st.session_state.get("submitted", False)),
+        "srs_applied": bool(st.session_state.get("srs_applied_this_attempt", False)),
+        "srs": srs_dump(st.session_state.get("srs")),
+    }
+
+def _progress_mark_base(seq: int, picked: list):
+    st.session_state.progress_base_version = int(st.session_state.get("quiz_version", 0) or 0)
+    st.session_state.progress_base_seq = int(seq)
+    st.session_state.progress_base_answers = list(picked)
+
+def _progress_enqueue(user_id: str, sb_authed, kind: str, payload: dict):
+    w = get_progress_writer()
+    with w["lock"]:
+        e = w["pending"].get(str(user_id))
+        if e is None:
+            e = w["pending"][str(user_id)] = {
+                "base": None, "delta": None, "sets": None, "due": time.time() + PROGRESS_DEBOUNCE_S,
+            }
+        e["sb"] = sb_authed
+        if kind == "base":
+            e["base"], e["delta"] = payload, None
+        elif kind == "sets":
+            e["sets"] = payload
+        else:
+            e["delta"] = payload
+    w["wake"].set()
+
+def queue_progress_change(sb_authed, user_id: str):
+    """보기 선택 변경 → base(새 회차 첫 변경) 또는 delta를 큐에 넣음. DB는 기다리지 않음."""
+    if not isinstance(st.session_state.get("quiz"), list):
+        return
+    w = get_progress_writer()
+    ver = int(st.session_state.get("quiz_version", 0) or 0)
+    seq = _progress_next_seq()
+    picked = _progress_answer_indices()
+
+    if st.session_state.get("progress_base_version") != ver or "progress_delta" in w["missing_cols"]:
+        _progress_enqueue(user_id, sb_authed, "base", build_progress_payload(seq))
+        _progress_mark_base(seq, picked)
+        return
+
+    base = st.session_state.get("progress_base_answers") or []
+    changed = {str(i): a for i, a in enumerate(picked) if (base[i] if i < len(base) else None) != a}
+    _progress_enqueue(user_id, sb_authed, "delta", {
+        "quiz_version": ver,
+        "base_seq": int(st.session_state.get("progress_base_seq", 0) or 0),
+        "seq": seq,
+        "answers": changed,
+    })
+
+def progress_flush(user_id: str | None):
+    """밀린 progress를 debounce 없이 바로 보내도록 (페이지 이동/로그아웃)."""
+    if not user_id:
+        return
+    w = get_progress_writer()
+    with w["lock"]:
+        e = w["pending"].get(str(user_id))
+        if e is None:
+            return
+        e["due"] = 0.0
+    w["wake"].set()
+
+def _progress_upsert(w: dict, sb_authed, row: dict, name: str):
+    """profiles upsert. 선택 컬럼이 DB에 없으면 기억해 두고 빼서 다시 (남는 게 id뿐이면 생략)."""
+    row = {k: v for k, v in row.items() if k not in w["missing_cols"]}
+    while len(row) > 1:
+        try:
+            db_call(lambda: sb_authed.table("profiles").upsert(row, on_conflict="id").execute(), name=name)
+            return
+        except Exception as e:
+            msg = str(e).lower()
+            missing = [c for c in PROGRESS_OPTIONAL_COLS if c in row and c in msg]
+            if not missing:
+                raise
+            w["missing_cols"].update(missing)  # progress_delta 없음 → 다음 변경부터 base 저장
+            row = {k: v for k, v in row.items() if k not in missing}
+
+def _progress_send(w: dict, user_id: str, e: dict):
+    row = {"id": user_id}
+    if e["base"] is not None:
+        row["progress"] = e["base"]
+        row["progress_delta"] = None
+    if e.get("sets") is not None:
+        newer = word_sets_newer_in_db(w, e["sb"], user_id, e["sets"])
+        if newer is None:
+            row["word_sets"] = e["sets"]
+        else:
+            with w["lock"]:
+                w["stale_sets"][str(user_id)] = newer
+    if len(row) > 1:
+        _progress_upsert(w, e["sb"], row, name="profiles.progress_save" if "progress" in row else "profiles.word_sets")
+    if e["delta"] is not None:
+        _progress_upsert(w, e["sb"], {"id": user_id, "progress_delta": e["delta"]}, name="profiles.progress_delta")
+
+def _progress_writer_loop(w: dict):
+    while True:
+        now = time.time()
+        with w["lock"]:
+            due = [(uid, e) for uid, e in w["pending"].items() if e["due"] <= now]
+            for uid, _ in due:
+                w["pending"].pop(uid, None)
+            next_due = min((e["due"] for e in w["pending"].values()), default=now + 60.0)
+        for uid, e in due:
+            try:
+                _progress_send(w, uid, e)
+            except Exception as ex:
+                w["last_error"] = str(ex)[:300]
+                with w["lock"]:
+                    cur = w["pending"].get(uid)
+                    if cur is None:  # 그사이 새 변경이 없으면 나중에 다시
+                        e["due"] = time.time() + PROGRESS_RETRY_S
+                        w["pending"][uid] = e
+                    elif cur["base"] is None and e["base"] is not None:
+                        cur["base"] = e["base"]  # base가 먼저 가야 delta가 의미 있음
+        if due:
+            continue
+        w["wake"].wait(timeout=max(0.05, next_due - time.time()))
+        w["wake"].clear()
+
+def save_progress_to_db(sb_authed, user_id: str):
+    """전체(base) 저장 — 제출 때. 밀려 있던 base/delta는 이걸로 합쳐짐."""
+    if "quiz" not in st.session_state or "answers" not in st.session_state:
+        return
+
+    w = get_progress_writer()
+    with w["lock"]:
+        w["pending"].pop(str(user_id), None)
+
+    seq = _progress_next_seq()
+    picked = _progress_answer_indices()
+    row = {
+        "id": user_id,
+        "progress": build_progress_payload(seq),
+        "progress_delta": None,
+        "word_sets": encode_word_sets(),   # 제출 때 정복 세트가 바뀜
+    }
+    try:
+        newer = word_sets_newer_in_db(w, sb_authed, user_id, row["word_sets"])
+    except Exception:
+        newer = None  # 확인 실패로 진행 상황 저장까지 막지는 않음
+    if newer is not None:
+        row.pop("word_sets")  # 다른 기기에서 초기화됨 → 이 세션 세트는 버리고 DB 것으로
+        restore_word_sets(newer)
+    _progress_upsert(w, sb_authed, row, name="profiles.progress_save")
+    _progress_mark_base(seq, picked)
+
+def clear_progress_in_db(sb_authed, user_id: str, reset_at: float):
+    w = get_progress_writer()
+    with w["lock"]:
+        w["pending"].pop(str(user_id), None)
+    # word_sets는 지우지 않고 "초기화 시각"만 남김 → 다른 기기의 예전 세트가 덮어쓰지 못함
+    row = {"id": user_id, "progress": None, "progress_delta": None, "word_sets": {"v": 2, "reset_at": reset_at}}
+    row = {k: v for k, v in row.items() if k not in w["missing_cols"]}
+    sb_authed.table("profiles").upsert(row, on_conflict="id").execute()
+
+def _fetch_progress_row(sb_authed, user_id: str):
+    w = get_progress_writer()
+    cols = ["progress"] + [c for c in PROGRESS_OPTIONAL_COLS if c not in w["missing_cols"]]
+    while True:
+        try:
+            return db_call(
+                lambda: sb_authed.table("profiles").select(", ".join(cols)).eq("id", user_id).single().execute(),
+                name="profiles.progress_restore",
+                hedge=True,
+            )
+        except Exception as e:
+            msg = str(e).lower()
+            missing = [c for c in cols if c in PROGRESS_OPTIONAL_COLS and c in msg]
+            if not missing:
+                raise
+            w["missing_cols"].update(missing)
+            cols = [c for c in cols if c not in missing]
+
+# ============================================================
+# ✅ 단어 세트 비트맵 (seen / mastered / excluded)
+#   - mastery_key별 세트(jp_word) → word_id → "목록 ID 비트맵.해시 ID 배열" (각각 zlib → base64)
+#   - 단어 수천 개도 키마다 수백 바이트 수준 / word_id가 없는 단어(덱에서 빠짐)는 저장 안 함
+#   - "ids": 비트맵을 만들 때의 WORD_ID_PATH (단어 수, 지문) → 목록이 바뀌었으면 비트맵 부분은 버림
+#   - "reset_at": 마지막 초기화 시각. DB 것이 더 최근이면 합치지 않고 통째로 교체,
+#     저장할 때도 DB에 더 최근 초기화가 있으면 이 세션의 (초기화 전) 세트로 덮어쓰지 않음
+# ============================================================
+WORD_SET_FIELDS = {"seen": "seen_words", "mastered": "mastered_words", "excluded": "excluded_wrong_words"}
+
+def word_id_registry_fp(n: int | None = None) -> tuple[int, str]:
+    """WORD_ID_PATH 앞 n개 단어의 (개수, 지문). n이 없으면 전체."""
+    store = get_deck_store()
+    with store["lock"]:
+        _ensure_word_ids_loaded(store)
+        keys = store["registry_keys"]
+        if n is None:
+            n = len(keys)
+        if n > len(keys):
+            return n, ""
+        memo = store.setdefault("registry_fp", {})
+        if n not in memo:
+            memo[n] = hashlib.blake2b("\x1f".join(keys[:n]).encode("utf-8"), digest_size=8).hexdigest()
+        return n, memo[n]
+
+def mark_word_sets_reset() -> float:
+    """세트 초기화 시각을 세션에 기록 (다음 저장 payload에 실림)."""
+    now = time.time()
+    st.session_state["word_sets_reset_at"] = now
+    return now
+
+def word_ids_for_keys(keys) -> list[int]:
+    store = get_deck_store()
+    with store["lock"]:
+        _ensure_word_ids_loaded(store)
+        ids = store["word_ids"]
+        out = []
+        for k in keys:
+            wid = ids.get(k)
+            if wid is None:
+                wid = ids.get(_nfkc_str(k))
+            if wid is not None:
+                out.append(int(wid))
+    return out
+
+def word_keys_for_ids(wids) -> list[str]:
+    store = get_deck_store()
+    with store["lock"]:
+        _ensure_word_ids_loaded(store)
+        n, rev = store.get("id_keys") or (-1, {})
+        if n != len(store["word_ids"]):
+            rev = {wid: key for key, wid in store["word_ids"].items()}
+            store["id_keys"] = (len(store["word_ids"]), rev)
+    return [rev[w] for w in wids if w in rev]
+
+def _b64z(raw: bytes) -> str:
+    return base64.b64encode(zlib.compress(raw, 9)).decode("ascii") if raw else ""
+
+def _unb64z(b64: str) -> bytes:
+    return zlib.decompress(base64.b64decode(b64)) if b64 else b""
+
+def encode_word_bitmap(words) -> str:
+    wids = word_ids_for_keys(words)
+    if not wids:
+        return ""
+    listed = [w for w in wids if w < WORD_ID_HASH_BASE]
+    hashed = sorted(w for w in wids if w >= WORD_ID_HASH_BASE)
+    bm = ""
+    if listed:
+        bits = np.zeros(max(listed) + 1, dtype=np.uint8)
+        bits[listed] = 1
+        bm = _b64z(np.packbits(bits, bitorder="little").tobytes())
+    return f"{bm}.{_b64z(np.array(hashed, dtype='<u8').tobytes())}" if hashed else bm
+
+def decode_word_bitmap(b64: str, max_listed: int | None = None) -> set[str]:
+    """max_listed: 목록 ID는 이 값 미만만 믿음 (None = 전부, 0 = 비트맵 부분 버림)."""
+    if not b64:
+        return set()
+    bm, _, hx = b64.partition(".")
+    wids: list[int] = []
+    if bm and max_listed != 0:
+        raw = np.frombuffer(_unb64z(bm), dtype=np.uint8)
+        wids = np.flatnonzero(np.unpackbits(raw, bitorder="little")).tolist()
+        if max_listed is not None:
+            wids = [w for w in wids if w < max_listed]
+    if hx:
+        wids += np.frombuffer(_unb64z(hx), dtype="<u8").tolist()
+    return set(word_keys_for_ids(wids))
+
+def encode_word_sets() -> dict:
+    out: dict = {
+        "v": 2,
+        "ids": list(word_id_registry_fp()),
+        "reset_at": float(st.session_state.get("word_sets_reset_at", 0.0) or 0.0),
     }
+    for short, name in WORD_SET_FIELDS.items():
+        d = st.session_state.get(name)
+        if isinstance(d, dict):
+            out[short] = {k: encode_word_bitmap(v) for k, v in d.items() if v}
+    return out
+
+def _payload_max_listed(payload: dict) -> int | None:
+    """이 payload의 비트맵을 믿을 수 있는 목록 ID 범위."""
+    if int(payload.get("v", 1) or 1) < 2:
+        return word_id_registry_fp()[0]  # 예전 형식: 실행 중 덧붙인 번호(목록 밖)는 버림
+    try:
+        n, fp = payload.get("ids") or (0, "")
+        return int(n) if word_id_registry_fp(int(n)) == (int(n), fp) else 0
+    except Exception:
+        return 0
 
-    sb_authed.table("profiles").upsert(
-        {"id": user_id, "progress": payload},
-        on_conflict="id",
-    ).execute()
+def restore_word_sets(payload: dict | None):
+    """
+    DB의 비트맵 → 세션 세트에 합침 (세션에 이미 있는 것은 유지).
+    DB 쪽 초기화(reset_at)가 세션이 아는 것보다 최근이면 합치지 않고 통째로 교체.
+    """
+    if not isinstance(payload, dict):
+        return
+    theirs = float(payload.get("reset_at", 0.0) or 0.0)
+    replace = theirs > float(st.session_state.get("word_sets_reset_at", 0.0) or 0.0)
+    if replace:
+        st.session_state["word_sets_reset_at"] = theirs
+    max_listed = _payload_max_listed(payload)
+    for short, name in WORD_SET_FIELDS.items():
+        saved = payload.get(short)
+        d = st.session_state.get(name)
+        if not isinstance(d, dict) or replace:
+            d = {}
+            st.session_state[name] = d
+        if not isinstance(saved, dict):
+            continue
+        for k, b64 in saved.items():
+            try:
+                d.setdefault(k, set()).update(decode_word_bitmap(b64, max_listed))
+            except Exception:
+                continue
 
-def clear_progress_in_db(sb_authed, user_id: str):
-    sb_authed.table("profiles").upsert(
-        {"id": user_id, "progress": None},
-        on_conflict="id",
-    ).execute()
+def word_sets_newer_in_db(w: dict, sb_authed, user_id: str, sets: dict) -> dict | None:
+    """저장 직전 확인: DB에 이 payload보다 최근 초기화가 있으면 그 DB 값(덮어쓰면 안 됨), 아니면 None."""
+    if "word_sets" in w["missing_cols"]:
+        return None
+    res = db_call(
+        lambda: sb_authed.table("profiles").select("word_sets").eq("id", user_id).single().execute(),
+        name="profiles.word_sets_check",
+        timeout=DB_TIMEOUT_READ_S,
+    )
+    cur = (res.data or {}).get("word_sets") if res is not None else None
+    if isinstance(cur, dict) and float(cur.get("reset_at", 0.0) or 0.0) > float(sets.get("reset_at", 0.0) or 0.0):
+        return cur
+    return None
+
+def take_stale_word_sets(user_id: str | None):
+    """writer가 저장을 건너뛴(다른 기기에서 초기화된) 경우 → 이 세션 세트를 DB 값으로 교체."""
+    if not user_id:
+        return
+    w = get_progress_writer()
+    with w["lock"]:
+        newer = w["stale_sets"].pop(str(user_id), None)
+    if newer is not None:
+        restore_word_sets(newer)
+
+def queue_word_sets_save():
+    """세트가 바뀐 곳(출제/초기화)에서 호출 → progress writer가 debounce해서 저장."""
+    sb_authed_local = get_authed_sb()
+    u = st.session_state.get("user")
+    if sb_authed_local is None or u is None:
+        return
+    try:
+        _progress_enqueue(u.id, sb_authed_local, "sets", encode_word_sets())
+    except Exception:
+        pass
 
 def restore_progress_from_db(sb_authed, user_id: str):
     try:
-        res = (
-            sb_authed.table("profiles")
-            .select("progress")
-            .eq("id", user_id)
-            .single()
-            .execute()
-        )
+        res = _fetch_progress_row(sb_authed, user_id)
     except Exception:
         return
 
     if not res or not res.data:
         return
 
+    restore_word_sets(res.data.get("word_sets"))
+
     progress = res.data.get("progress")
     if not progress:
         return
 
+    # ✅ 문항 레코드로 변환 (구버전: 10개 키 dict + 보기 글자로 저장된 answers)
+    quiz_restored = None
+    base_answers: list = []
+    if isinstance(progress.get("quiz"), list):
+        quiz_restored = [QuizQuestion.from_dict(d) for d in progress["quiz"]]
+        saved = list(progress.get("answers") or [])
+        base_answers = [
+            answer_index(q, saved[i] if i < len(saved) else None) for i, q in enumerate(quiz_restored)
+        ]
+
+    # ✅ base 이후 변경분(delta) 적용: 같은 회차 + 같은 base일 때만
+    base_seq = int(progress.get("seq", 0) or 0)
+    answers = list(base_answers)
+    last_seq = base_seq
+    delta = res.data.get("progress_delta")
+    if (
+        isinstance(delta, dict)
+        and quiz_restored is not None
+        and int(delta.get("quiz_version", -1)) == int(progress.get("quiz_version", 0) or 0)
+        and int(delta.get("base_seq", -1)) == base_seq
+        and int(delta.get("seq", 0) or 0) > base_seq
+    ):
+        for k, a in (delta.get("answers") or {}).items():
+            i = int(k)
+            if 0 <= i < len(answers):
+                answers[i] = answer_index(quiz_restored[i], a)
+        last_seq = int(delta["seq"])
+    if quiz_restored is not None:
+        progress = dict(progress, quiz=quiz_restored, answers=answers)
+
+    deck_id = progress.get("deck_id") or DEFAULT_DECK_ID
+    st.session_state.deck_id = deck_id if deck_id in DECK_SPECS else DEFAULT_DECK_ID
+
     # ✅ 구버전(progress에 pos가 있던 경우)도 최대한 흡수
     restored_group = progress.get("pos_group") or progress.get("pos") or st.session_state.get("pos_group", "noun")
     st.session_state.pos_group = restored_group
@@ -1060,6 +2395,8 @@ def restore_progress_from_db(sb_authed, user_id: str):
     st.session_state.quiz = progress.get("quiz", st.session_state.get("quiz"))
     st.session_state.answers = progress.get("answers", st.session_state.get("answers"))
     st.session_state.submitted = bool(progress.get("submitted", st.session_state.get("submitted", False)))
+    st.session_state.srs = srs_load(progress.get("srs"))
+    st.session_state.srs_applied_this_attempt = bool(progress.get("srs_applied", st.session_state.submitted))
 
     if st.session_state.pos_group not in POS_GROUP_OPTIONS:
         st.session_state.pos_group = "noun"
@@ -1075,6 +2412,12 @@ def restore_progress_from_db(sb_authed, user_id: str):
         if not isinstance(st.session_state.answers, list) or len(st.session_state.answers) != qlen:
             st.session_state.answers = [None] * qlen
 
+        # 다음 delta의 기준 = DB에 있는 base
+        st.session_state.progress_seq = last_seq
+        st.session_state.progress_base_version = st.session_state.quiz_version
+        st.session_state.progress_base_seq = base_seq
+        st.session_state.progress_base_answers = list(base_answers)
+
 # ============================================================
 # ✅ Admin
 # ============================================================
@@ -1603,19 +2946,50 @@ READ_KW = dict(
     na_values=["nan", "NaN", "NULL", "null", "None", "none"],
 )
 
-@st.cache_data(show_spinner=False)
-def load_pool(csv_path_str: str) -> pd.DataFrame:
-    df = pd.read_csv(csv_path_str, **READ_KW)
-
-    # ✅ CSV 최종 필수 컬럼
-    required_cols = {"level", "pos", "jp_word", "reading", "meaning", "example_jp", "example_kr"}
-    missing = required_cols - set(df.columns)
-    if missing:
+# ✅ 덱 CSV 스키마: (이름, 필수 컬럼, canonical 컬럼명으로 바꿀 것)
+#   - canonical: beginner.csv / words_beginner.csv
+#   - one: one.csv (jp_kanji, meaning_kr, show_kanji, kanji_confidence)
+POOL_REQUIRED_COLS = {"level", "pos", "jp_word", "reading", "meaning", "example_jp", "example_kr"}
+DECK_SCHEMAS = [
+    ("canonical", POOL_REQUIRED_COLS, {}),
+    (
+        "one",
+        {"level", "pos", "jp_word", "jp_kanji", "reading", "meaning_kr", "example_jp", "example_kr"},
+        {"meaning_kr": "meaning"},
+    ),
+]
+
+def detect_deck_schema(columns) -> str | None:
+    cols = set(columns)
+    for name, required, _ in DECK_SCHEMAS:
+        if required <= cols:
+            return name
+    return None
+
+def require_deck_schema(columns) -> str:
+    schema = detect_deck_schema(columns)
+    if schema is None:
+        missing = POOL_REQUIRED_COLS - set(columns)
         raise ValueError(f"CSV 필수 컬럼 누락: {sorted(list(missing))}")
+    return schema
 
+def normalize_deck_frame(df: pd.DataFrame, schema: str) -> pd.DataFrame:
+    """스키마별 컬럼 → canonical 이름 + NFKC 정리 (load_pool / 업로드 검증 공용, 빈 행은 그대로 둠)."""
     def _nfkc(s):
         return unicodedata.normalize("NFKC", str(s or "")).strip()
 
+    rename = next(r for (name, _, r) in DECK_SCHEMAS if name == schema)
+    df = df.rename(columns=rename)
+
+    if schema == "one":
+        # show_kanji=1인 단어만 한자 표기로 출제(나머지는 가나 그대로)
+        kanji = df["jp_kanji"].apply(_nfkc)
+        show = df["show_kanji"].apply(_nfkc) == "1" if "show_kanji" in df.columns else False
+        df["jp_word"] = df["jp_word"].where(~(show & (kanji != "")), kanji)
+    if "jp_kanji" not in df.columns:
+        df["jp_kanji"] = df["jp_word"]
+    df["jp_kanji"] = df["jp_kanji"].apply(_nfkc)
+
     df["level"] = df["level"].apply(_nfkc).str.upper().str.strip()
     df["pos"] = df["pos"].apply(_nfkc).str.lower().str.strip()
     df["jp_word"] = df["jp_word"].apply(_nfkc).str.strip()
@@ -1623,6 +2997,15 @@ def load_pool(csv_path_str: str) -> pd.DataFrame:
     df["meaning"] = df["meaning"].apply(_nfkc).str.strip()
     df["example_jp"] = df["example_jp"].apply(_nfkc).str.strip()
     df["example_kr"] = df["example_kr"].apply(_nfkc).str.strip()
+    return df
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_pool(csv_path_str: str, content_hash: str = "") -> pd.DataFrame:
+    # content_hash는 캐시 키 용도(파일 내용이 바뀌면 새 항목으로 다시 읽음)
+    df = pd.read_csv(csv_path_str, **READ_KW)
+
+    # ✅ 스키마 감지 → canonical 컬럼으로 맞춤
+    df = normalize_deck_frame(df, require_deck_schema(df.columns))
 
     # 빈 줄 제거
     df = df[
@@ -1634,29 +3017,339 @@ def load_pool(csv_path_str: str) -> pd.DataFrame:
 
     return df.reset_index(drop=True)
 
-def ensure_pool_ready():
-    if st.session_state.get("pool_ready") and isinstance(st.session_state.get("_pool"), pd.DataFrame):
-        return
-    try:
-        pool = load_pool(str(CSV_PATH))
-    except Exception as e:
-        st.error(f"단어 데이터 로드 실패: {e}")
-        st.stop()
+# ============================================================
+# ✅ Deck Store (핫 리로드)
+#   - 캐시 키 = 파일 내용 해시 (경로만 보던 기존 방식은 재시작 전까지 옛 데이터)
+#   - mtime/size가 바뀐 경우에만 다시 해시 → 평소엔 stat 1번
+#   - 새 버전은 다 만든 뒤 락 안에서 한 번에 교체(atomic swap)
+#   - 세션은 "새 퀴즈를 만들 때"만 새 버전으로 갈아탐(풀던 퀴즈는 그대로)
+#   - word_id: WORD_ID_PATH(커밋된 목록)에 있으면 그 번호, 없으면 단어 키 해시(stable_word_id)
+#     → 프로세스/레플리카/재배포와 무관하게 같은 단어 = 같은 ID (실행 중에 파일에 덧붙이지 않음)
+#   - 버전 간 차이(추가/삭제)는 교체 시 1번만 계산
+# ============================================================
+DECK_CHECK_INTERVAL_S = 2.0
 
-    if len(pool) < N:
-        st.error(f"단어가 부족합니다: pool={len(pool)} (N={N})")
-        st.stop()
+@st.cache_resource(show_spinner=False)
+def get_deck_store() -> dict:
+    return {
+        "lock": threading.Lock(),
+        "build_lock": threading.Lock(),
+        "files": {},     # path -> {"sig": (mtime_ns, size), "hash": str, "checked_at": float}
+        "decks": {},     # path -> deck dict (현재 버전)
+        "by_hash": {},   # content hash -> deck dict (내용이 같은 파일은 1벌만)
+        "swaps": {},     # (old_version, new_version) -> 변경분
+        "neighbors_cv": threading.Condition(),  # 백그라운드 이웃 인덱스 완료 알림
+        "word_ids": {},  # jp_word -> word_id
+        "taken_ids": set(),
+        "registry_keys": [],  # WORD_ID_PATH의 단어 키 (id 순서, 비트맵 버전 확인용)
+    }
 
-    st.session_state["_pool"] = pool
-    st.session_state["pool_ready"] = True
+def _file_sig(path: str) -> tuple[int, int]:
+    stt = Path(path).stat()
+    return (int(stt.st_mtime_ns), int(stt.st_size))
 
-    if is_admin():
-        with st.expander("🔎 디버그: 품사별 단어 수", expanded=False):
-            st.write(pool["pos"].value_counts(dropna=False))
-            st.write("CSV_PATH =", str(CSV_PATH))
+def file_content_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
 
-@st.cache_data(show_spinner=False)
-def load_patterns(csv_path_str: str) -> dict[str, list[dict]]:
+def deck_content_hash(path: str, force: bool = False) -> str:
+    """stat 시그니처가 그대로면 메모된 해시, 바뀌었으면 다시 해시."""
+    store = get_deck_store()
+    now = time.time()
+    with store["lock"]:
+        memo = store["files"].get(path)
+        if memo and not force and now - memo["checked_at"] < DECK_CHECK_INTERVAL_S:
+            return memo["hash"]
+
+    sig = _file_sig(path)
+    if memo and memo["sig"] == sig:
+        digest = memo["hash"]
+    else:
+        digest = file_content_hash(path)
+
+    with store["lock"]:
+        store["files"][path] = {"sig": sig, "hash": digest, "checked_at": now}
+    return digest
+
+WORD_ID_HASH_BASE = 1 << 32   # 이 값 이상 = 해시 ID (목록 번호와 안 겹침)
+WORD_ID_HASH_BITS = 48        # base + 48비트 < 2^53 → JSON/JS 정수로 안전
+
+def stable_word_id(key: str, salt: int = 0) -> int:
+    """WORD_ID_PATH에 없는 단어의 ID = NFKC 키의 해시 (어느 프로세스에서 계산해도 같음)."""
+    data = key.encode("utf-8") if not salt else f"{salt}\x1f{key}".encode("utf-8")
+    h = int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+    return WORD_ID_HASH_BASE + h % (1 << WORD_ID_HASH_BITS)
+
+def _ensure_word_ids_loaded(store: dict):
+    if store["registry_keys"] or not WORD_ID_PATH.exists():
+        return
+    df = pd.read_csv(WORD_ID_PATH, **READ_KW)
+    pairs = sorted((int(wid), _nfkc_str(key)) for wid, key in zip(df["word_id"], df["word_key"]))
+    for wid, key in pairs:
+        if key:
+            store["word_ids"][key] = wid
+            store["taken_ids"].add(wid)
+    store["registry_keys"] = [key for _, key in pairs]
+
+def assign_word_ids(keys: list[str]) -> list[int]:
+    """
+    jp_word → 고정 word_id. WORD_ID_PATH에 있으면 그 번호, 없으면 stable_word_id(키 해시).
+    파일은 읽기만 함 (실행 중 덧붙이면 프로세스마다/재배포 후 번호가 어긋남).
+    """
+    store = get_deck_store()
+    with store["lock"]:
+        _ensure_word_ids_loaded(store)
+        ids, taken = store["word_ids"], store["taken_ids"]
+        out = []
+        for key in keys:
+            wid = ids.get(key)
+            if wid is None:
+                salt = 0
+                wid = stable_word_id(key)
+                while wid in taken:  # 해시 충돌(사실상 없음) → 다음 salt
+                    salt += 1
+                    wid = stable_word_id(key, salt)
+                ids[key] = wid
+                taken.add(wid)
+            out.append(wid)
+    return out
+
+def _build_deck(path: str, digest: str, prev: dict | None = None) -> dict:
+    pool = load_pool(path, digest)
+    pool["word_id"] = assign_word_ids(pool["jp_word"].tolist())
+    # 이웃 인덱스(pos별 O(n²))는 요청 스레드를 붙잡지 않도록 백그라운드로
+    index = build_deck_index(pool, prev["index"] if prev else None, defer_neighbors=True)
+    start_neighbor_fill(pool, index)
+    return {
+        "path": path,
+        "version": digest[:12],
+        "content_hash": digest,
+        "loaded_at": time.time(),
+        "pool": pool,
+        "index": index,
+        "id_to_row": index["id_to_row"],
+    }
+
+def _deck_swap_delta(old: dict, new: dict) -> dict:
+    old_ids = set(old["id_to_row"])
+    new_ids = set(new["id_to_row"])
+    removed_ids = old_ids - new_ids
+    old_pool = old["pool"]
+    return {
+        "added_ids": frozenset(new_ids - old_ids),
+        "removed_ids": frozenset(removed_ids),
+        "removed_keys": frozenset(
+            str(old_pool.at[old["id_to_row"][w], "jp_word"]) for w in removed_ids
+        ),
+    }
+
+def current_deck(csv_path_str: str) -> dict:
+    """
+    경로의 최신 덱 버전. 파일이 바뀌었으면 새 버전을 만들어 교체.
+    다른 스레드가 이미 만드는 중이면 기다리지 않고 기존 버전을 돌려줌.
+    """
+    store = get_deck_store()
+    digest = deck_content_hash(csv_path_str)
+    with store["lock"]:
+        cur = store["decks"].get(csv_path_str)
+    if cur is not None and cur["version"] == digest[:12]:
+        cache_event("deck", True)
+        return cur
+    cache_event("deck", False)
+
+    blocking = cur is None
+    if not store["build_lock"].acquire(blocking=blocking):
+        return cur
+    try:
+        with store["lock"]:
+            cur = store["decks"].get(csv_path_str)
+        if cur is not None and cur["version"] == digest[:12]:
+            return cur
+
+        with store["lock"]:
+            new = store["by_hash"].get(digest)
+        if new is None:
+            new = _build_deck(csv_path_str, digest, prev=cur)  # 바뀐 pos 파티션만 다시 계산
+        delta = _deck_swap_delta(cur, new) if cur is not None else None
+        with store["lock"]:
+            store["decks"][csv_path_str] = new
+            store["by_hash"][digest] = new
+            if cur is not None and cur is not new and not any(d is cur for d in store["decks"].values()):
+                store["by_hash"].pop(cur["content_hash"], None)
+            if delta is not None:
+                store["swaps"][(cur["version"], new["version"])] = delta
+        return new
+    finally:
+        store["build_lock"].release()
+
+def deck_swap_delta(old_version: str, new_version: str) -> dict | None:
+    store = get_deck_store()
+    with store["lock"]:
+        return store["swaps"].get((old_version, new_version))
+
+def apply_deck_swap_to_session(old_version: str, new_version: str):
+    """교체 시 삭제된 단어를 출제 이력/정복/제외 세트에서 정리 (변경분은 교체 때 1번만 계산됨)."""
+    delta = deck_swap_delta(old_version, new_version)
+    if not delta or not delta["removed_keys"]:
+        return
+    for name in ("seen_words", "mastered_words", "excluded_wrong_words"):
+        d = st.session_state.get(name)
+        if isinstance(d, dict):
+            for k in d:
+                d[k] -= delta["removed_keys"]
+    queue_word_sets_save()
+
+# ============================================================
+# ✅ Deck Registry (DECK_SPECS)
+#   - 목록 표시는 stat만(파일 크기가 같은 것끼리만 해시 비교 → 중복 숨김)
+#   - 실제 로드는 current_deck()에서 처음 선택될 때
+# ============================================================
+def list_visible_decks() -> list[str]:
+    seen_sizes: dict[int, list[str]] = {}
+    out = []
+    for deck_id, spec in DECK_SPECS.items():
+        path = str(spec["path"])
+        try:
+            size = _file_sig(path)[1]
+        except OSError:
+            continue
+        dup = False
+        for other_id in seen_sizes.get(size, []):
+            try:
+                if deck_content_hash(path) == deck_content_hash(str(DECK_SPECS[other_id]["path"])):
+                    dup = True
+                    break
+            except OSError:
+                pass
+        if dup:
+            continue
+        seen_sizes.setdefault(size, []).append(deck_id)
+        out.append(deck_id)
+    return out
+
+def canonical_deck_id(deck_id: str) -> str:
+    """숨겨진 중복 덱이면 내용이 같은 보이는 덱 id (아니면 그대로)."""
+    visible = list_visible_decks()
+    if deck_id in visible or deck_id not in DECK_SPECS:
+        return deck_id
+    try:
+        digest = deck_content_hash(str(DECK_SPECS[deck_id]["path"]))
+        for other_id in visible:
+            if deck_content_hash(str(DECK_SPECS[other_id]["path"])) == digest:
+                return other_id
+    except OSError:
+        pass
+    return deck_id
+
+def _mastery_key_prefix(deck_id: str) -> str:
+    return "" if deck_id == DEFAULT_DECK_ID else f"{deck_id}:"
+
+def migrate_hidden_deck(user_id: str | None):
+    """
+    세션의 deck_id가 숨겨진 중복 덱(예: words_beginner)이면 보이는 덱으로 옮김.
+    mastery_key 접두어가 달라 기록이 따로 쌓이지 않게 출제 이력/정복/제외/SRS도 합쳐서 저장.
+    세션당 deck_id별 1번만 확인.
+    """
+    old = current_deck_id()
+    if st.session_state.get("_deck_canon_checked") == old:
+        return
+    new = canonical_deck_id(old)
+    st.session_state["_deck_canon_checked"] = new
+    if new == old:
+        return
+
+    old_p, new_p = _mastery_key_prefix(old), _mastery_key_prefix(new)
+
+    def _moved(d: dict) -> list[tuple[str, str]]:
+        return [
+            (k, new_p + k[len(old_p):]) for k in list(d)
+            if (k.startswith(old_p) if old_p else ":" not in k)
+        ]
+
+    for name in ("seen_words", "mastered_words", "excluded_wrong_words"):
+        d = st.session_state.get(name)
+        if isinstance(d, dict):
+            for k_old, k_new in _moved(d):
+                d[k_new] = set(d.get(k_new, set())) | set(d.pop(k_old))
+    for name in ("mastery_done", "mastery_banner_shown"):
+        d = st.session_state.get(name)
+        if isinstance(d, dict):
+            for k_old, _ in _moved(d):
+                d.pop(k_old)  # 새 키 기준으로 다시 계산
+    srs = st.session_state.get("srs")
+    if isinstance(srs, dict):
+        for k_old, k_new in _moved(srs):
+            items = dict(srs.pop(k_old).get("items") or {})
+            cur = srs.get(k_new)
+            if cur:
+                items.update(cur.get("items") or {})  # 같은 단어는 보이는 덱 쪽 일정 우선
+            srs[k_new] = {"items": items, "heap": [(it[0], w) for w, it in items.items()]}
+            heapq.heapify(srs[k_new]["heap"])
+
+    st.session_state.deck_id = new
+    st.session_state.pop("deck_select", None)
+    queue_word_sets_save()
+    sb_authed_local = get_authed_sb()
+    if user_id and sb_authed_local is not None and isinstance(st.session_state.get("quiz"), list):
+        seq = _progress_next_seq()
+        _progress_enqueue(user_id, sb_authed_local, "base", build_progress_payload(seq))
+        _progress_mark_base(seq, _progress_answer_indices())
+
+def current_deck_id() -> str:
+    deck_id = st.session_state.get("deck_id", DEFAULT_DECK_ID)
+    return deck_id if deck_id in DECK_SPECS else DEFAULT_DECK_ID
+
+def current_deck_spec() -> dict:
+    return DECK_SPECS[current_deck_id()]
+
+def ensure_pool_ready():
+    # ✅ 새 퀴즈를 만들 때만 호출됨 → 여기서 선택된 덱의 최신 버전으로 갈아탐
+    deck_id = current_deck_id()
+    deck_path = str(DECK_SPECS[deck_id]["path"])
+    same_deck = st.session_state.get("_deck_id") == deck_id
+    try:
+        deck = current_deck(deck_path)
+        pool = deck["pool"]
+    except Exception as e:
+        if same_deck and st.session_state.get("pool_ready") and isinstance(st.session_state.get("_pool"), pd.DataFrame):
+            return  # 새 파일이 깨졌으면 세션이 쓰던 버전 유지
+        st.error(f"단어 데이터 로드 실패: {e}")
+        st.stop()
+
+    prev_version = st.session_state.get("_deck_version") if same_deck else None
+    if (
+        st.session_state.get("pool_ready")
+        and same_deck
+        and prev_version == deck["version"]
+        and isinstance(st.session_state.get("_pool"), pd.DataFrame)
+        and isinstance(st.session_state.get("_pool_index"), dict)
+    ):
+        return
+
+    if len(pool) < N:
+        st.error(f"단어가 부족합니다: pool={len(pool)} (N={N})")
+        st.stop()
+
+    if prev_version and prev_version != deck["version"]:
+        apply_deck_swap_to_session(prev_version, deck["version"])
+
+    st.session_state["_pool"] = pool
+    st.session_state["_pool_index"] = deck["index"]
+    st.session_state["_deck_version"] = deck["version"]
+    st.session_state["_deck_id"] = deck_id
+    st.session_state["pool_ready"] = True
+
+    if is_admin():
+        with st.expander("🔎 디버그: 품사별 단어 수", expanded=False):
+            st.write(pool["pos"].value_counts(dropna=False))
+            st.write("deck =", deck_id, deck_path)
+            st.write("deck_version =", deck["version"])
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_patterns(csv_path_str: str, content_hash: str = "") -> dict[str, list[dict]]:
     df = pd.read_csv(csv_path_str, **READ_KW)
 
     required = {
@@ -1698,17 +3391,630 @@ def load_patterns(csv_path_str: str) -> dict[str, list[dict]]:
     return out
 
 def ensure_patterns_ready():
-    if st.session_state.get("_patterns_ready") and isinstance(st.session_state.get("_patterns"), dict):
+    try:
+        digest = deck_content_hash(str(PATTERN_CSV_PATH))
+    except Exception:
+        digest = ""
+    if (
+        st.session_state.get("_patterns_ready")
+        and st.session_state.get("_patterns_version") == digest
+        and isinstance(st.session_state.get("_patterns"), dict)
+    ):
         return
     try:
-        pats = load_patterns(str(PATTERN_CSV_PATH))
+        pats = load_patterns(str(PATTERN_CSV_PATH), digest)
     except Exception as e:
+        if isinstance(st.session_state.get("_patterns"), dict):
+            return
         st.error(f"필수패턴 CSV 로드 실패: {e}")
         st.stop()
 
     st.session_state["_patterns"] = pats
+    st.session_state["_patterns_version"] = digest
     st.session_state["_patterns_ready"] = True
 
+# ============================================================
+# ✅ 서버 워밍업 (프로세스당 1회)
+#   - 기본 덱/패턴 CSV 로드 + 파생 인덱스 생성 (다른 덱은 처음 선택될 때)
+#   - Supabase 클라이언트 생성 + 공용 커넥션 풀(TLS) 미리 열기
+#   - 백그라운드 스레드라 로그인 화면은 기다리지 않음
+#     (첫 퀴즈 생성이 워밍업과 겹치면 같은 캐시 락에서 완료를 기다림)
+# ============================================================
+def _warm_supabase_pool():
+    create_supabase_client()
+    get_shared_http_client().get(
+        f"{SUPABASE_URL.rstrip('/')}/auth/v1/health",
+        headers={"apikey": SUPABASE_ANON_KEY},
+    )
+
+@st.cache_resource(show_spinner=False)
+def start_server_warmup() -> dict:
+    status = {
+        "ready": False,
+        "started_at": time.time(),
+        "finished_at": None,
+        "steps_ms": {},
+        "errors": {},
+    }
+
+    def _step(name: str, fn):
+        t0 = time.perf_counter()
+        try:
+            fn()
+            status["steps_ms"][name] = round((time.perf_counter() - t0) * 1000, 1)
+        except Exception as e:
+            status["errors"][name] = str(e)
+
+    def _run():
+        _step("deck", lambda: current_deck(str(DECK_SPECS[DEFAULT_DECK_ID]["path"])))
+        _step("patterns", lambda: load_patterns(str(PATTERN_CSV_PATH), deck_content_hash(str(PATTERN_CSV_PATH))))
+        _step("supabase", _warm_supabase_pool)
+        status["finished_at"] = time.time()
+        status["ready"] = True
+
+    threading.Thread(target=_run, name="hotena-warmup", daemon=True).start()
+    return status
+
+def render_warmup_status():
+    status = start_server_warmup()
+    if status.get("ready"):
+        took = (status.get("finished_at") or 0) - (status.get("started_at") or 0)
+        st.caption(f"🔥 서버 워밍업 완료 ({took:.2f}s)")
+    else:
+        st.caption("⏳ 서버 워밍업 진행 중…")
+    st.json({"steps_ms": status.get("steps_ms", {}), "errors": status.get("errors", {})}, expanded=False)
+
+# ============================================================
+# ✅ rerun 프로파일링 (관리자 토글 / 환경변수)
+#   - 대상 user_id(또는 "*")의 "다음 N번 rerun"을 cProfile로 기록
+#   - 환경변수: HOTENA_PROFILE_RERUNS=N, HOTENA_PROFILE_USER=<user_id|*> (기본 *)
+#   - st.stop() 앞·스크립트 끝의 end_rerun()에서 마무리해서 저장
+#   - st.rerun() 등으로 end_rerun()을 못 거친 캡처는 버림(다음 rerun까지의 대기 시간이 섞임) → 횟수는 돌려줌
+#   - 꺼져 있을 때 비용: rerun당 dict 조회 1~2번
+# ============================================================
+PROFILE_KEEP = 20
+PROFILE_TOP_N = 30
+
+@st.cache_resource(show_spinner=False)
+def get_profile_registry() -> dict:
+    targets: dict[str, int] = {}
+    try:
+        n_env = int(os.environ.get("HOTENA_PROFILE_RERUNS", "0") or 0)
+    except ValueError:
+        n_env = 0
+    if n_env > 0:
+        targets[os.environ.get("HOTENA_PROFILE_USER", "*").strip() or "*"] = n_env
+    return {"lock": threading.Lock(), "targets": targets, "captures": deque(maxlen=PROFILE_KEEP), "seq": 0}
+
+def arm_rerun_profile(target_user: str, n: int):
+    reg = get_profile_registry()
+    with reg["lock"]:
+        reg["targets"][str(target_user).strip() or "*"] = int(n)
+
+def _take_profile_slot(user_id: str | None) -> str | None:
+    reg = get_profile_registry()
+    if not reg["targets"]:
+        return None
+    with reg["lock"]:
+        for key in (str(user_id or ""), "*"):
+            left = reg["targets"].get(key, 0)
+            if left > 0:
+                if left == 1:
+                    reg["targets"].pop(key, None)
+                else:
+                    reg["targets"][key] = left - 1
+                return key
+    return None
+
+def drop_rerun_profile():
+    """end_rerun()을 못 거친 캡처 버리기 (저장 X, 잡았던 횟수는 대상에 돌려줌)."""
+    cur = st.session_state.pop("_prof_active", None)
+    if not cur:
+        return
+    try:
+        cur["prof"].disable()
+    except Exception:
+        pass
+    reg = get_profile_registry()
+    with reg["lock"]:
+        reg["targets"][cur["slot"]] = reg["targets"].get(cur["slot"], 0) + 1
+    metric_inc("hotena_profile_dropped_total")
+
+def finish_rerun_profile():
+    """진행 중인 캡처가 있으면 멈추고 저장 (없으면 즉시 반환)."""
+    cur = st.session_state.pop("_prof_active", None)
+    if not cur:
+        return
+    prof = cur["prof"]
+    prof.disable()
+    try:
+        prof.create_stats()
+        buf = io.StringIO()
+        pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+        reg = get_profile_registry()
+        with reg["lock"]:
+            reg["seq"] += 1
+            reg["captures"].appendleft({
+                "id": reg["seq"],
+                "user_id": cur["user_id"],
+                "page": cur["page"],
+                "started_at": cur["started_at"],
+                "ms": round((time.perf_counter() - cur["t0"]) * 1000.0, 1),
+                "prof": marshal.dumps(prof.stats),
+                "top": buf.getvalue(),
+            })
+    except Exception:
+        pass
+
+def begin_rerun_profile(user_id: str | None):
+    drop_rerun_profile()
+    slot = _take_profile_slot(user_id)
+    if slot is None:
+        return
+    prof = cProfile.Profile()
+    st.session_state["_prof_active"] = {
+        "prof": prof,
+        "slot": slot,
+        "user_id": str(user_id or ""),
+        "page": str(st.session_state.get("page", "")),
+        "started_at": time.time(),
+        "t0": time.perf_counter(),
+    }
+    try:
+        prof.enable()
+    except ValueError:
+        # 다른 프로파일러가 이미 켜져 있음(파이썬 3.12+는 프로세스 전역) → 이번 rerun은 건너뜀
+        st.session_state.pop("_prof_active", None)
+
+def render_profile_admin(default_user_id: str | None):
+    reg = get_profile_registry()
+    c1, c2 = st.columns([3, 1])
+    with c1:
+        target = st.text_input("대상 user_id (* = 아무 세션)", value=str(default_user_id or "*"), key="prof_target")
+    with c2:
+        n = st.number_input("rerun 수", min_value=1, max_value=20, value=3, key="prof_n")
+    if st.button("▶ 다음 rerun부터 캡처", use_container_width=True, key="btn_prof_arm"):
+        arm_rerun_profile(target, int(n))
+        st.success(f"{target}: 다음 {int(n)}번 rerun을 기록합니다.")
+    if reg["targets"]:
+        st.caption(f"대기 중: {dict(reg['targets'])}")
+
+    captures = list(reg["captures"])
+    if not captures:
+        st.caption("저장된 캡처가 없습니다.")
+        return
+    for cap in captures:
+        when = datetime.fromtimestamp(cap["started_at"], KST).strftime("%m-%d %H:%M:%S")
+        with st.expander(f"#{cap['id']} · {cap['page'] or '-'} · {cap['ms']}ms · {cap['user_id'] or '-'} · {when}", expanded=False):
+            st.download_button(
+                "⬇️ .prof 다운로드 (snakeviz / pstats)",
+                data=cap["prof"],
+                file_name=f"rerun_{cap['id']}_{cap['page'] or 'page'}.prof",
+                mime="application/octet-stream",
+                key=f"btn_prof_dl_{cap['id']}",
+            )
+            st.code(cap["top"], language="text")
+
+# ============================================================
+# ✅ 세션 메모리 점검 (관리자)
+#   - rerun마다 session_id 등록 → 측정할 때 런타임의 AppSession에서 세션 상태를 찾음
+#     (ctx.session_state는 rerun마다 새로 만드는 SafeSessionState 래퍼라 rerun이 끝나면 사라짐)
+#   - 같은 객체는 1번만 셈: 덱 캐시(프로세스 공유)를 먼저 세고, 세션은 그 다음 순서대로
+#   - 오래 쉬고 있는 세션의 "다시 만들 수 있는" 큰 값만 비움(authed client / 지난 덱 버전의 _pool 등)
+#     지금 덱 캐시에 있는 객체는 공유라 비워도 줄지 않음 → 건너뜀
+#   - 프로세스 RSS는 SESSION_RSS_EVERY_S마다 기록
+# ============================================================
+SESSION_STALE_S = 30 * 60
+SESSION_RSS_EVERY_S = 60.0
+SESSION_RSS_KEEP = 24 * 60
+SESSION_SIZE_MAX_DEPTH = 6
+SESSION_HEAVY_KEYS = ("_pool", "_pool_index", "_sb_authed", "_sb_authed_token", "_prof_active")
+
+@st.cache_resource(show_spinner=False)
+def get_session_registry() -> dict:
+    return {
+        "lock": threading.Lock(),
+        "sessions": {},                          # session_id → {"ref", "user", "page", "last_seen"} (ref: 런타임 없을 때만)
+        "rss": deque(maxlen=SESSION_RSS_KEEP),   # (ts, rss_bytes)
+        "rss_at": 0.0,
+    }
+
+def process_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        import resource
+
+        return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024  # (최대 RSS)
+
+def _sample_rss(reg: dict, force: bool = False):
+    now = time.time()
+    with reg["lock"]:
+        if not force and now - reg["rss_at"] < SESSION_RSS_EVERY_S:
+            return
+        reg["rss_at"] = now
+    rss = process_rss_bytes()
+    with reg["lock"]:
+        reg["rss"].append((now, rss))
+
+def track_session(user_id: str | None):
+    """begin_rerun에서 호출: 이 세션 상태를 등록."""
+    import weakref
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    reg = get_session_registry()
+    u = st.session_state.get("user")
+    with reg["lock"]:
+        reg["sessions"][str(ctx.session_id)] = {
+            "ref": weakref.ref(ctx.session_state),
+            "user": str(getattr(u, "email", None) or user_id or "-"),
+            "page": str(st.session_state.get("page", "")),
+            "last_seen": time.time(),
+        }
+    _sample_rss(reg)
+
+def _session_state_of(session_id: str, info: dict):
+    """
+    등록된 세션의 상태 객체. 런타임이 있으면 AppSession의 SessionState(세션이 닫힐 때까지 같은 객체),
+    없으면(AppTest 등) 등록할 때의 rerun 상태. 세션이 이미 닫혔으면 None.
+    """
+    try:
+        from streamlit.runtime import Runtime
+
+        if Runtime.exists():
+            si = Runtime.instance()._session_mgr.get_session_info(session_id)
+            return si.session.session_state if si is not None else None
+    except Exception:
+        pass
+    return info["ref"]()
+
+def _shared_deck_ids() -> set[int]:
+    """덱 캐시가 들고 있는 pool/index 객체 id (세션이 같은 객체를 가리키면 공유 = 비워도 메모리 안 줄어듦)."""
+    store = get_deck_store()
+    with store["lock"]:
+        decks = list(store["by_hash"].values()) + list(store["decks"].values())
+    return {id(x) for d in decks for x in (d.get("pool"), d.get("index"))}
+
+def approx_size(obj, seen: set, depth: int = 0) -> int:
+    """대략적인 깊은 크기(바이트). seen에 있는 객체는 0 (공유 객체 중복 집계 방지)."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        try:
+            mem = obj.memory_usage(deep=True)
+            return int(mem.sum() if hasattr(mem, "sum") else mem)
+        except Exception:
+            return sys.getsizeof(obj)
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes) + 112
+    size = sys.getsizeof(obj, 0)
+    if depth >= SESSION_SIZE_MAX_DEPTH or isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        return size + sum(approx_size(k, seen, depth + 1) + approx_size(v, seen, depth + 1) for k, v in list(obj.items()))
+    if isinstance(obj, (list, tuple, set, frozenset, deque)):
+        return size + sum(approx_size(x, seen, depth + 1) for x in list(obj))
+    slots = getattr(type(obj), "__slots__", ())
+    if slots:
+        size += sum(approx_size(getattr(obj, a, None), seen, depth + 1) for a in slots)
+    if hasattr(obj, "__dict__"):
+        size += approx_size(vars(obj), seen, depth + 1)
+    return size
+
+def _widget_group(key: str) -> str:
+    return "q_* (문항 위젯)" if key.startswith("q_") else key
+
+def session_memory_report() -> dict:
+    """활성 세션별 키 크기 + 합계 + 큰 키 TOP + 덱 캐시(공유) 크기."""
+    reg = get_session_registry()
+    seen: set = set()
+    store = get_deck_store()
+    with store["lock"]:
+        decks = list(store["by_hash"].values())
+    shared = approx_size(decks, seen)
+
+    now = time.time()
+    with reg["lock"]:
+        sessions = [(sid, dict(info)) for sid, info in reg["sessions"].items()]
+
+    rows, top = [], Counter()
+    for sid, info in sorted(sessions, key=lambda x: x[1]["last_seen"], reverse=True):
+        state = _session_state_of(sid, info)
+        if state is None:
+            with reg["lock"]:
+                reg["sessions"].pop(sid, None)
+            continue
+        try:
+            items = list(state.filtered_state.items())
+        except Exception:
+            continue
+        per_key = Counter()
+        for k, v in items:
+            per_key[_widget_group(str(k))] += approx_size(v, seen)
+        total = int(sum(per_key.values()))
+        for k, b in per_key.items():
+            top[k] += b
+        rows.append({
+            "session": sid[:8],
+            "user": info["user"],
+            "page": info["page"],
+            "idle_s": int(now - info["last_seen"]),
+            "keys": len(items),
+            "total_kb": round(total / 1024, 1),
+            "largest": ", ".join(f"{k} {b / 1024:.0f}KB" for k, b in per_key.most_common(3)),
+        })
+
+    _sample_rss(reg, force=True)
+    with reg["lock"]:
+        rss = list(reg["rss"])
+    return {
+        "sessions": rows,
+        "sessions_total_kb": round(sum(r["total_kb"] for r in rows), 1),
+        "shared_deck_kb": round(shared / 1024, 1),
+        "top_keys": [(k, round(b / 1024, 1)) for k, b in top.most_common(15)],
+        "rss": rss,
+    }
+
+def evict_stale_sessions(idle_s: float = SESSION_STALE_S) -> tuple[int, int]:
+    """idle_s 이상 rerun이 없던 세션에서 다시 만들 수 있는 값만 삭제. 반환: (세션 수, 삭제한 키 수)."""
+    reg = get_session_registry()
+    now = time.time()
+    with reg["lock"]:
+        targets = [(sid, info) for sid, info in reg["sessions"].items() if now - info["last_seen"] >= idle_s]
+    shared = _shared_deck_ids()
+    sweep_export_files()
+    n_sessions = n_keys = 0
+    for sid, info in targets:
+        state = _session_state_of(sid, info)
+        if state is None:
+            with reg["lock"]:
+                reg["sessions"].pop(sid, None)
+            continue
+        try:
+            ver = state["quiz_version"] if "quiz_version" in state else None
+            kept = state.filtered_state
+            keys = [k for k in kept if k in SESSION_HEAVY_KEYS and id(kept[k]) not in shared]
+            # 지난 회차의 문항 위젯 값 (현재 회차는 남겨 둠)
+            keys += [k for k in kept if k.startswith("q_") and not k.startswith(f"q_{ver}_")]
+            if "_export_file" in kept:
+                Path(kept["_export_file"]["path"]).unlink(missing_ok=True)
+                keys.append("_export_file")
+            for k in keys:
+                del state[k]
+            if "_pool" in keys or "_pool_index" in keys:
+                state["pool_ready"] = False  # 다음 rerun에서 덱 캐시로 다시 연결
+        except Exception:
+            continue
+        if keys:
+            n_sessions += 1
+            n_keys += len(keys)
+    metric_inc("hotena_session_evicted_keys_total", value=n_keys)
+    return n_sessions, n_keys
+
+def render_session_memory_admin():
+    if st.button("📏 지금 측정", use_container_width=True, key="btn_admin_mem_measure"):
+        t0 = time.perf_counter()
+        st.session_state["_admin_mem_report"] = session_memory_report()
+        st.session_state["_admin_mem_report_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    rep = st.session_state.get("_admin_mem_report")
+    if rep:
+        rss_now = rep["rss"][-1][1] if rep["rss"] else process_rss_bytes()
+        st.write({
+            "세션 수": len(rep["sessions"]),
+            "세션 합계(KB)": rep["sessions_total_kb"],
+            "덱 캐시(공유, KB)": rep["shared_deck_kb"],
+            "프로세스 RSS(MB)": round(rss_now / 1024 / 1024, 1),
+            "측정 시간(ms)": st.session_state.get("_admin_mem_report_ms"),
+        })
+        if rep["sessions"]:
+            st.dataframe(pd.DataFrame(rep["sessions"]), use_container_width=True, hide_index=True)
+        if rep["top_keys"]:
+            st.caption("큰 키 TOP (전체 세션 합)")
+            st.dataframe(pd.DataFrame(rep["top_keys"], columns=["key", "KB"]), use_container_width=True, hide_index=True)
+        if len(rep["rss"]) >= 2:
+            rss_df = pd.DataFrame(rep["rss"], columns=["ts", "rss"])
+            rss_df["time"] = pd.to_datetime(rss_df["ts"], unit="s", utc=True).dt.tz_convert(KST)
+            rss_df["RSS(MB)"] = rss_df["rss"] / 1024 / 1024
+            st.line_chart(rss_df.set_index("time")[["RSS(MB)"]])
+        st.caption("같은 객체는 1번만 계산(덱 캐시 → 최근 세션 순). 크기는 대략값입니다.")
+
+    idle_min = st.number_input("쉬고 있는 시간(분) 이상", min_value=1, max_value=24 * 60, value=int(SESSION_STALE_S // 60), key="mem_evict_idle_min")
+    if st.button("🧹 오래된 세션의 큰 캐시 비우기", use_container_width=True, key="btn_admin_mem_evict"):
+        n_sess, n_keys = evict_stale_sessions(float(idle_min) * 60)
+        st.success(f"세션 {n_sess}개에서 {n_keys}개 키를 비웠습니다. ({', '.join(SESSION_HEAVY_KEYS)}, 지난 회차 문항 위젯)")
+
+# ============================================================
+# ✅ 메트릭 (Prometheus 텍스트 형식)
+#   - 카운터/히스토그램/게이지를 프로세스 전역 레지스트리에 누적
+#   - 노출: HOTENA_METRICS_PORT=9108 → http://127.0.0.1:9108/metrics
+#           HOTENA_METRICS_FILE=/path/metrics.prom → 15초마다 원자적 교체 저장
+#   - 주요 지표: DB 호출(이름별), build_quiz 시간, 제출→화면 완료, 캐시 적중, 활성 세션
+# ============================================================
+METRICS_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_FILE_INTERVAL_S = 15.0
+ACTIVE_SESSION_WINDOW_S = 300.0
+METRICS_HELP = {
+    "hotena_db_calls_total": ("counter", "Supabase calls through run_db by name and status"),
+    "hotena_db_seconds": ("histogram", "Supabase call latency through run_db"),
+    "hotena_build_quiz_seconds": ("histogram", "build_quiz duration by qtype and pos_group"),
+    "hotena_submit_to_render_seconds": ("histogram", "Submit click rerun until the result page finished rendering"),
+    "hotena_rerun_seconds": ("histogram", "Script rerun duration by page"),
+    "hotena_cache_requests_total": ("counter", "In-process cache lookups by cache and result"),
+    "hotena_active_sessions": ("gauge", "Sessions with a rerun in the last 5 minutes"),
+    "hotena_db_fastfail_total": ("counter", "Supabase calls failed fast by timeout budget or open circuit"),
+    "hotena_db_hedges_total": ("counter", "Hedged (duplicated) read requests"),
+    "hotena_db_stale_fallback_total": ("counter", "Reads answered from the stale cache after a failure"),
+    "hotena_db_circuit_open": ("gauge", "1 while the Supabase circuit breaker is open"),
+    "hotena_db_coalesced_total": ("counter", "Reads answered by an identical in-flight request"),
+    "hotena_db_inflight": ("gauge", "Supabase calls running or queued in the worker pool"),
+    "hotena_journal_sent_total": ("counter", "Journaled submissions delivered to Supabase"),
+    "hotena_journal_unconfirmed_total": ("counter", "Journaled word results not resent after an unanswered send (server has no attempt_id dedupe)"),
+    "hotena_session_evicted_keys_total": ("counter", "Session state keys dropped from idle sessions"),
+    "hotena_profile_dropped_total": ("counter", "Rerun profile captures discarded because end_rerun() was not reached"),
+}
+
+@st.cache_resource(show_spinner=False)
+def get_metrics() -> dict:
+    reg = {"lock": threading.Lock(), "counters": {}, "hists": {}, "sessions": {}}
+    port = os.environ.get("HOTENA_METRICS_PORT", "").strip()
+    if port.isdigit():
+        _start_metrics_http(int(port))
+    path = os.environ.get("HOTENA_METRICS_FILE", "").strip()
+    if path:
+        _start_metrics_file_writer(Path(path))
+    return reg
+
+def _labels_key(labels: dict | None) -> tuple:
+    return tuple(sorted((str(k), str(v)) for k, v in (labels or {}).items()))
+
+def metric_inc(name: str, labels: dict | None = None, value: float = 1.0):
+    reg = get_metrics()
+    key = (name, _labels_key(labels))
+    with reg["lock"]:
+        reg["counters"][key] = reg["counters"].get(key, 0.0) + value
+
+def metric_observe(name: str, seconds: float, labels: dict | None = None):
+    reg = get_metrics()
+    key = (name, _labels_key(labels))
+    with reg["lock"]:
+        h = reg["hists"].get(key)
+        if h is None:
+            h = reg["hists"][key] = [[0] * len(METRICS_BUCKETS_S), 0.0, 0]
+        for i, b in enumerate(METRICS_BUCKETS_S):
+            if seconds <= b:
+                h[0][i] += 1
+        h[1] += seconds
+        h[2] += 1
+
+def cache_event(cache: str, hit: bool):
+    metric_inc("hotena_cache_requests_total", {"cache": cache, "result": "hit" if hit else "miss"})
+
+def _session_id() -> str:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx()
+        if ctx is not None:
+            return str(ctx.session_id)
+    except Exception:
+        pass
+    return str(id(st.session_state))
+
+def _esc_label(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_labels(pairs: tuple, extra: tuple = ()) -> str:
+    items = list(pairs) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_esc_label(v)}"' for k, v in items) + "}"
+
+def render_prometheus_text() -> str:
+    reg = get_metrics()
+    now = time.time()
+    with reg["lock"]:
+        counters = dict(reg["counters"])
+        hists = {k: [list(v[0]), v[1], v[2]] for k, v in reg["hists"].items()}
+        for sid, seen in list(reg["sessions"].items()):
+            if now - seen > ACTIVE_SESSION_WINDOW_S:
+                reg["sessions"].pop(sid, None)
+        active = len(reg["sessions"])
+
+    lines: list[str] = []
+    def _head(name: str):
+        kind, help_text = METRICS_HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for name in sorted({k[0] for k in counters}):
+        _head(name)
+        for (n, labels), v in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{name}{_fmt_labels(labels)} {v:g}")
+    for name in sorted({k[0] for k in hists}):
+        _head(name)
+        for (n, labels), (buckets, total, count) in sorted(hists.items()):
+            if n != name:
+                continue
+            for b, c in zip(METRICS_BUCKETS_S, buckets):
+                lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', f'{b:g}'),))} {c}")
+            lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+    _head("hotena_active_sessions")
+    lines.append(f"hotena_active_sessions {active}")
+    _head("hotena_db_circuit_open")
+    lines.append(f"hotena_db_circuit_open {int(db_breaker_status()['open'])}")
+    _head("hotena_db_inflight")
+    lines.append(f"hotena_db_inflight {db_inflight()}")
+    return "\n".join(lines) + "\n"
+
+def _start_metrics_http(port: int):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    except OSError:
+        return  # 이미 다른 프로세스가 사용 중
+    threading.Thread(target=server.serve_forever, name="hotena-metrics-http", daemon=True).start()
+
+def _start_metrics_file_writer(path: Path):
+    def _loop():
+        while True:
+            time.sleep(METRICS_FILE_INTERVAL_S)
+            try:
+                tmp = path.with_suffix(path.suffix + ".tmp")
+                tmp.write_text(render_prometheus_text(), encoding="utf-8")
+                os.replace(tmp, path)
+            except Exception:
+                pass
+
+    threading.Thread(target=_loop, name="hotena-metrics-file", daemon=True).start()
+
+def begin_rerun(user_id: str | None):
+    """rerun 시작 (로그인 확인 직후): 활성 세션 갱신 + 시간 측정 + 프로파일 캡처."""
+    reg = get_metrics()
+    with reg["lock"]:
+        reg["sessions"][_session_id()] = time.time()
+    st.session_state["_rerun_t0"] = time.perf_counter()
+    journal_refresh_token(user_id, st.session_state.get("access_token"))
+    track_session(user_id)
+    page = st.session_state.get("page")
+    if st.session_state.get("_last_page") != page:
+        st.session_state["_last_page"] = page
+        progress_flush(user_id)
+    begin_rerun_profile(user_id)
+
+def end_rerun():
+    """페이지를 다 그린 지점(st.stop() 직전/스크립트 끝)에서 호출."""
+    t0 = st.session_state.pop("_rerun_t0", None)
+    if t0 is not None:
+        took = time.perf_counter() - t0
+        metric_observe("hotena_rerun_seconds", took, {"page": st.session_state.get("page", "")})
+        if st.session_state.pop("_submit_pending", False):
+            metric_observe("hotena_submit_to_render_seconds", took)
+    finish_rerun_profile()
+
 # ============================================================
 # ✅ Quiz Logic
 # ============================================================
@@ -1731,6 +4037,7 @@ def _has_kanji(s: str) -> bool:
             return True
     return False
 
+@functools.lru_cache(maxsize=1 << 16)
 def _to_hira(s: str) -> str:
     s = _nfkc_str(s)
     out = []
@@ -1779,13 +4086,402 @@ def _jp_okurigana_suffix(jp_word: str) -> str:
     tail = _to_hira(tail)
     return tail
 
+@functools.lru_cache(maxsize=1 << 16)
 def _safe_suffix_hira(x: str, n: int) -> str:
     xh = _to_hira(_nfkc_str(x))
     return xh[-n:] if len(xh) >= n else xh
 
+# ============================================================
+# ✅ 비슷한 단어 이웃 인덱스 (덱 로드 때 1번 계산)
+#   - 같은 pos 안에서 단어별 "닮은 단어" TOP-K 행 번호 → int32 배열 (n, K), 빈칸 -1
+#   - 점수 = 읽기 글자(1·2-gram) + 공유 한자 + 뜻(한글 자모 1·2-gram) 가중 코사인
+#     (해시 벡터 행렬곱으로 후보를 좁힌 뒤 읽기는 편집거리로 다시 정렬)
+#   - make_question은 배열 한 줄만 보면 됨 → 출제 시 O(1)
+# ============================================================
+NEIGHBOR_K = 8
+NEIGHBOR_MAX_DISTRACTORS = 2   # 혼동 행렬 보기와 합쳐 최대 2개(최소 1개는 무작위)
+NEIGHBOR_DIM = 256             # 특징별 해시 차원
+NEIGHBOR_BLOCK = 512           # 유사도 행렬을 이 행 수만큼씩 계산(메모리 제한)
+NEIGHBOR_WEIGHTS = {"reading": 0.4, "kanji": 0.3, "meaning": 0.3}
+
+_CHO = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_JUNG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+_JONG = " ㄱㄲㄳㄴㄵㄶㄷㄹㄺㄻㄼㄽㄾㄿㅀㅁㅂㅄㅅㅆㅇㅈㅊㅋㅌㅍㅎ"
+
+def hangul_jamo(s: str) -> str:
+    """'사과' → 'ㅅㅏㄱㅘ' (완성형 한글만 분해, 나머지 글자는 그대로)."""
+    out = []
+    for ch in str(s or ""):
+        code = ord(ch) - 0xAC00
+        if 0 <= code < 11172:
+            out.append(_CHO[code // 588])
+            out.append(_JUNG[(code // 28) % 21])
+            if code % 28:
+                out.append(_JONG[code % 28])
+        elif not ch.isspace():
+            out.append(ch)
+    return "".join(out)
+
+def _ngrams(s: str) -> list[str]:
+    return list(s) + [s[i:i + 2] for i in range(len(s) - 1)]
+
+def _hashed_vectors(texts: list[list[str]], dim: int) -> np.ndarray:
+    """토큰 목록 → L2 정규화된 해시 카운트 벡터 (n, dim) float32."""
+    mat = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, toks in enumerate(texts):
+        for t in toks:
+            mat[i, zlib.crc32(t.encode("utf-8")) % dim] += 1.0
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+def _levenshtein(a: str, b: str) -> int:
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+def _neighbor_features(g: pd.DataFrame) -> np.ndarray:
+    readings = g["reading"].astype(str).tolist()
+    kanji_src = g["jp_kanji"] if "jp_kanji" in g.columns else g["jp_word"]
+    kanji_src = [f"{k}{w}" for k, w in zip(kanji_src.astype(str), g["jp_word"].astype(str))]
+    kanji = [sorted({c for c in t if _has_kanji(c)}) for t in kanji_src]
+    meanings = [_ngrams(hangul_jamo(m)) for m in g["meaning"].astype(str)]
+    w = NEIGHBOR_WEIGHTS
+    return np.hstack([
+        _hashed_vectors([_ngrams(r) for r in readings], NEIGHBOR_DIM) * np.sqrt(w["reading"]),
+        _hashed_vectors(kanji, NEIGHBOR_DIM) * np.sqrt(w["kanji"]),
+        _hashed_vectors(meanings, NEIGHBOR_DIM) * np.sqrt(w["meaning"]),
+    ])
+
+def build_neighbor_index(pool: pd.DataFrame, pos_key: pd.Series, k: int = NEIGHBOR_K, only_pos=None) -> np.ndarray:
+    """
+    pool 행별 이웃 행 번호 (len(pool), k) int32. 같은 pos 안에서만 찾음.
+    해시 벡터 코사인으로 2k개 후보 → 읽기 편집거리 보정 점수로 k개.
+    only_pos가 있으면 그 pos만 계산(나머지는 -1 → 호출하는 쪽이 이전 결과로 채움).
+    """
+    out = np.full((len(pool), k), -1, dtype=np.int32)
+    readings = pool["reading"].astype(str).tolist()
+    jp_words = pool["jp_word"].astype(str).tolist()
+    wide = 2 * k
+    for pos, rows in pool.index.to_series().groupby(pos_key, sort=False):
+        rows = rows.to_numpy()
+        n = len(rows)
+        if n < 2 or (only_pos is not None and str(pos) not in only_pos):
+            continue
+        feats = _neighbor_features(pool.iloc[rows])
+        for start in range(0, n, NEIGHBOR_BLOCK):
+            sims = feats[start:start + NEIGHBOR_BLOCK] @ feats.T
+            for bi in range(sims.shape[0]):
+                sims[bi, start + bi] = -np.inf
+            m = min(wide, n - 1)
+            top = np.argpartition(-sims, m - 1, axis=1)[:, :m]
+            for bi in range(sims.shape[0]):
+                r = int(rows[start + bi])
+                scored = []
+                for j in top[bi]:
+                    o = int(rows[j])
+                    if jp_words[o] == jp_words[r]:
+                        continue
+                    a, b = readings[r], readings[o]
+                    edit_sim = 1.0 - _levenshtein(a, b) / max(len(a), len(b), 1)
+                    scored.append((float(sims[bi, j]) + NEIGHBOR_WEIGHTS["reading"] * edit_sim, o))
+                scored.sort(reverse=True)
+                picked = [o for _, o in scored[:k]]
+                out[r, :len(picked)] = picked
+    return out
+
+def neighbor_values(index: dict | None, row_no, column: str) -> list[str]:
+    """이웃 인덱스에서 해당 행의 이웃 값(뜻/단어)을 가까운 순으로."""
+    if not index or "neighbors" not in index or row_no is None:
+        return []
+    try:
+        nb = index["neighbors"][int(row_no)]
+    except (IndexError, ValueError, TypeError):
+        return []
+    values = index["neighbor_cols"][column]
+    return [values[o] for o in nb if o >= 0]
+
+def _pos_signature(pool: pd.DataFrame, rows: np.ndarray) -> str:
+    """pos 파티션 내용 지문 (by_pos / 이웃 인덱스가 보는 컬럼만, 행 순서 포함)."""
+    h = hashlib.blake2b(digest_size=16)
+    for c in ("jp_word", "reading", "meaning"):
+        h.update("\x1f".join(pool[c].iloc[rows].astype(str).tolist()).encode("utf-8"))
+        h.update(b"\x1e")
+    return h.hexdigest()
+
+def build_deck_index(pool: pd.DataFrame, prev: dict | None = None, defer_neighbors: bool = False) -> dict:
+    """
+    make_question/build_quiz가 매번 pool 전체를 훑지 않도록 미리 만드는 파생 인덱스.
+    - pos_key: 정규화된 pos 시리즈 (pool과 같은 index)
+    - has_kanji: 발음 문제 출제 가능 여부 마스크
+    - by_level_pos: (level, pos) → 행 번호 배열 (출제 후보 파티션)
+    - by_pos: 실제 pos별 오답 후보(중복 제거, 원래 순서 유지)
+    - id_to_row: word_id → 행 번호
+    - neighbors: 행별 닮은 단어 TOP-K (int32, 어려운 보기용)
+    - words: 행별 단어 튜플 (QuizQuestion이 글자를 복사하지 않고 공유)
+    - pos_rows / pos_sig: pos별 행 번호 / 내용 지문
+    prev(이전 버전 인덱스)를 주면 지문이 같은 pos는 by_pos를 그대로 쓰고
+    이웃 인덱스도 행 번호만 옮겨 담음 → 바뀐 pos 파티션만 다시 계산.
+    defer_neighbors=True면 다시 계산할 pos의 이웃은 비워 두고(-1) neighbors_pending에 적어 둠
+    → fill_deck_neighbors가 나중에(백그라운드) 채움. 그동안 어려운 보기는 무작위로 대신함.
+    """
+    pos_key = pool["pos"].astype(str).str.strip().str.lower()
+    level_key = pool["level"].astype(str).str.strip().str.upper()
+    by_level_pos = {
+        (str(lv), str(ps)): rows.to_numpy()
+        for (lv, ps), rows in pool.index.to_series().groupby([level_key, pos_key], sort=False)
+    }
+    pos_rows = {str(pos): rows.to_numpy() for pos, rows in pool.index.to_series().groupby(pos_key, sort=False)}
+    pos_sig = {pos: _pos_signature(pool, rows) for pos, rows in pos_rows.items()}
+    reuse = set()
+    if prev and "pos_sig" in prev:
+        reuse = {pos for pos, sig in pos_sig.items() if prev["pos_sig"].get(pos) == sig}
+
+    by_pos: dict[str, dict[str, list[str]]] = {}
+    for pos, g in pool.groupby(pos_key, sort=False):
+        if str(pos) in reuse:
+            by_pos[str(pos)] = prev["by_pos"][str(pos)]
+            continue
+        jp_words = g["jp_word"].dropna().astype(str).str.strip().tolist()
+        meanings = g["meaning"].dropna().drop_duplicates().tolist()
+        jp_uniq = [x for x in dict.fromkeys(jp_words) if x]
+        by_pos[str(pos)] = {
+            "reading": g["reading"].dropna().drop_duplicates().tolist(),
+            "meaning": meanings,
+            "jp_word": jp_uniq,
+            "meaning_set": frozenset(meanings),
+            "jp_word_set": frozenset(jp_uniq),
+        }
+    id_to_row = {}
+    if "word_id" in pool.columns:
+        id_to_row = {int(w): i for i, w in enumerate(pool["word_id"].tolist())}
+
+    nb_reuse = reuse - set(prev.get("neighbors_pending") or ()) if prev else set()  # 이전 버전도 아직 계산 중이면 다시
+    nb_todo = set(pos_rows) - nb_reuse
+    if defer_neighbors:
+        neighbors = np.full((len(pool), NEIGHBOR_K), -1, dtype=np.int32)
+    else:
+        neighbors = build_neighbor_index(pool, pos_key, only_pos=nb_todo)
+    if nb_reuse:
+        old_nb = prev["neighbors"]
+        lookup = np.full(len(old_nb), -1, dtype=np.int32)  # 이전 행 번호 → 새 행 번호
+        for pos in nb_reuse:
+            lookup[prev["pos_rows"][pos]] = pos_rows[pos]
+        for pos in nb_reuse:
+            nb = old_nb[prev["pos_rows"][pos]]
+            neighbors[pos_rows[pos]] = np.where(nb >= 0, lookup[nb], -1)
+    return {
+        "pos_key": pos_key,
+        "has_kanji": pool["jp_word"].apply(_has_kanji),
+        "by_level_pos": by_level_pos,
+        "by_pos": by_pos,
+        "id_to_row": id_to_row,
+        "words": list(zip(*(
+            (pos_key if c == "pos" else pool[c].fillna("").astype(str).str.strip()).tolist()
+            for c in QUESTION_WORD_FIELDS
+        ))),
+        "neighbors": neighbors,
+        "neighbors_pending": sorted(nb_todo) if defer_neighbors else [],
+        "pos_rows": pos_rows,
+        "pos_sig": pos_sig,
+        "rebuilt_pos": sorted(set(pos_rows) - reuse),
+        "neighbor_cols": {
+            "meaning": pool["meaning"].astype(str).str.strip().tolist(),
+            "jp_word": pool["jp_word"].astype(str).str.strip().tolist(),
+        },
+    }
+
+def fill_deck_neighbors(pool: pd.DataFrame, index: dict):
+    """neighbors_pending인 pos의 이웃을 계산해 새 배열로 한 번에 교체 (읽는 쪽은 옛 배열 또는 새 배열만 봄)."""
+    pending = set(index.get("neighbors_pending") or ())
+    store = get_deck_store()
+    try:
+        if pending:
+            nb = build_neighbor_index(pool, index["pos_key"], only_pos=pending)
+            merged = index["neighbors"].copy()
+            for pos in pending:
+                rows = index["pos_rows"][pos]
+                merged[rows] = nb[rows]
+            index["neighbors"] = merged
+    finally:
+        with store["neighbors_cv"]:
+            index["neighbors_pending"] = []
+            store["neighbors_cv"].notify_all()
+
+def start_neighbor_fill(pool: pd.DataFrame, index: dict):
+    if index.get("neighbors_pending"):
+        threading.Thread(target=fill_deck_neighbors, args=(pool, index), name="hotena-neighbors", daemon=True).start()
+
+def wait_deck_neighbors(index: dict, timeout: float | None = None) -> bool:
+    """이웃 인덱스가 다 채워질 때까지 대기 (seed 고정 출제는 이웃 유무에 따라 보기가 달라짐)."""
+    store = get_deck_store()
+    with store["neighbors_cv"]:
+        return store["neighbors_cv"].wait_for(lambda: not index.get("neighbors_pending"), timeout=timeout)
+
+def deck_rows_for(index: dict, pos_filters: list[str], levels: list[str] | None = None) -> list[int]:
+    """(level, pos) 파티션에서 후보 행 번호만 모음 (pool 전체 isin 스캔 X)."""
+    pos_set = set(pos_filters)
+    level_set = set(levels) if levels else None
+    rows: list[int] = []
+    for (lv, ps), part in index["by_level_pos"].items():
+        if ps in pos_set and (level_set is None or lv in level_set):
+            rows.extend(part.tolist())
+    rows.sort()
+    return rows
+
+def deck_candidate_rows(index: dict, pos_filters: list[str], kanji_only: bool = False) -> tuple[list[int], frozenset]:
+    """출제 후보 행 (목록, 집합). 덱 인덱스 안에 필터 조합별로 1번만 계산해 둠(읽기 전용)."""
+    key = (tuple(sorted(pos_filters)), bool(kanji_only))
+    cache = index.setdefault("_cand_cache", {})
+    hit = cache.get(key)
+    cache_event("candidate_rows", hit is not None)
+    if hit is not None:
+        return hit
+    rows = deck_rows_for(index, pos_filters)
+    if kanji_only:
+        has_kanji = index["has_kanji"].to_numpy()
+        rows = [r for r in rows if has_kanji[r]]
+    hit = (rows, frozenset(rows))
+    cache[key] = hit
+    return hit
+
+# ============================================================
+# ✅ 단어 검색 (접두어 인덱스: 정렬 배열 + bisect)
+#   - 읽기(히라가나) / jp_word / 뜻(NFKC, "/"·","로 나눈 조각 포함)
+#   - 덱 인덱스 안에 1번만 만들어 두고 세션끼리 공유(읽기 전용)
+# ============================================================
+SEARCH_MAX_RESULTS = 20
+SEARCH_FIELDS = ("jp_word", "reading", "meaning")
+
+_ROMAJI = {
+    "a": "あ", "i": "い", "u": "う", "e": "え", "o": "お",
+    "ka": "か", "ki": "き", "ku": "く", "ke": "け", "ko": "こ",
+    "ga": "が", "gi": "ぎ", "gu": "ぐ", "ge": "げ", "go": "ご",
+    "sa": "さ", "si": "し", "shi": "し", "su": "す", "se": "せ", "so": "そ",
+    "za": "ざ", "zi": "じ", "ji": "じ", "zu": "ず", "ze": "ぜ", "zo": "ぞ",
+    "ta": "た", "ti": "ち", "chi": "ち", "tu": "つ", "tsu": "つ", "te": "て", "to": "と",
+    "da": "だ", "di": "ぢ", "du": "づ", "de": "で", "do": "ど",
+    "na": "な", "ni": "に", "nu": "ぬ", "ne": "ね", "no": "の",
+    "ha": "は", "hi": "ひ", "hu": "ふ", "fu": "ふ", "he": "へ", "ho": "ほ",
+    "ba": "ば", "bi": "び", "bu": "ぶ", "be": "べ", "bo": "ぼ",
+    "pa": "ぱ", "pi": "ぴ", "pu": "ぷ", "pe": "ぺ", "po": "ぽ",
+    "ma": "ま", "mi": "み", "mu": "む", "me": "め", "mo": "も",
+    "ya": "や", "yu": "ゆ", "yo": "よ",
+    "ra": "ら", "ri": "り", "ru": "る", "re": "れ", "ro": "ろ",
+    "wa": "わ", "wo": "を", "nn": "ん", "n'": "ん",
+    "kya": "きゃ", "kyu": "きゅ", "kyo": "きょ", "gya": "ぎゃ", "gyu": "ぎゅ", "gyo": "ぎょ",
+    "sha": "しゃ", "shu": "しゅ", "she": "しぇ", "sho": "しょ", "sya": "しゃ", "syu": "しゅ", "syo": "しょ",
+    "ja": "じゃ", "ju": "じゅ", "je": "じぇ", "jo": "じょ", "jya": "じゃ", "jyu": "じゅ", "jyo": "じょ",
+    "cha": "ちゃ", "chu": "ちゅ", "che": "ちぇ", "cho": "ちょ", "tya": "ちゃ", "tyu": "ちゅ", "tyo": "ちょ",
+    "nya": "にゃ", "nyu": "にゅ", "nyo": "にょ", "hya": "ひゃ", "hyu": "ひゅ", "hyo": "ひょ",
+    "bya": "びゃ", "byu": "びゅ", "byo": "びょ", "pya": "ぴゃ", "pyu": "ぴゅ", "pyo": "ぴょ",
+    "mya": "みゃ", "myu": "みゅ", "myo": "みょ", "rya": "りゃ", "ryu": "りゅ", "ryo": "りょ",
+    "fa": "ふぁ", "fi": "ふぃ", "fe": "ふぇ", "fo": "ふぉ", "-": "ー",
+}
+
+def romaji_to_hira(s: str) -> str:
+    """'benkyou' → 'べんきょう' (헵번/훈령식 대충 둘 다). 못 바꾸는 글자는 그대로 둠."""
+    s = _nfkc_str(s).lower()
+    out, i = [], 0
+    while i < len(s):
+        ch = s[i]
+        nxt = s[i + 1] if i + 1 < len(s) else ""
+        # 촉음: 같은 자음 2번(kk, tt...) → っ
+        if ch == nxt and ch.isalpha() and ch not in "aiueon":
+            out.append("っ")
+            i += 1
+            continue
+        if ch == "t" and nxt == "c":  # matcha → まっちゃ
+            out.append("っ")
+            i += 1
+            continue
+        for n in (3, 2, 1):
+            kana = _ROMAJI.get(s[i:i + n])
+            if kana:
+                out.append(kana)
+                i += n
+                break
+        else:
+            # 모음/y 앞이 아닌 n → ん (끝의 n 포함)
+            if ch == "n" and (not nxt or nxt not in "aiueoy"):
+                out.append("ん")
+            else:
+                out.append(ch)
+            i += 1
+    return "".join(out)
+
+def _search_norm(s) -> str:
+    return _to_hira(_nfkc_str(s)).lower()
+
+def _meaning_keys(meaning: str) -> list[str]:
+    m = _search_norm(meaning)
+    keys = [m]
+    for part in re.split(r"[/,;·、]", m):
+        part = re.sub(r"^[(\[].*?[)\]]\s*", "", part.strip())  # "(동) 먹다" → "먹다"
+        if part and part != m:
+            keys.append(part)
+    return keys
+
+def build_search_index(pool: pd.DataFrame) -> dict:
+    """필드별 (정렬된 키 목록, 같은 순서의 행 번호 목록)."""
+    cols = {c: pool[c].fillna("").astype(str).tolist() for c in SEARCH_FIELDS}
+    out = {}
+    for field in SEARCH_FIELDS:
+        pairs = []
+        for row, value in enumerate(cols[field]):
+            keys = _meaning_keys(value) if field == "meaning" else [_search_norm(value)]
+            pairs.extend((k, row) for k in dict.fromkeys(keys) if k)
+        pairs.sort()
+        out[field] = ([k for k, _ in pairs], [r for _, r in pairs])
+    return out
+
+def deck_search_index(index: dict, pool: pd.DataFrame) -> dict:
+    """처음 검색할 때 1번만 만듦(덱 버전이 바뀌면 새 덱 인덱스에 새로 생김)."""
+    hit = index.get("_search")
+    cache_event("search_index", hit is not None)
+    if hit is None:
+        hit = build_search_index(pool)
+        index["_search"] = hit
+    return hit
+
+def _prefix_rows(keys: list[str], rows: list[int], prefix: str, limit: int) -> list[int]:
+    lo = bisect.bisect_left(keys, prefix)
+    hi = bisect.bisect_left(keys, prefix + "\uffff", lo)
+    return rows[lo:min(hi, lo + limit)]
+
+def search_words(search: dict, query: str, limit: int = SEARCH_MAX_RESULTS) -> list[int]:
+    """
+    접두어가 맞는 행 번호 (jp_word → 읽기 → 뜻 순, 중복 제거).
+    알파벳만 들어오면 로마자로 보고 히라가나로 바꿔서 읽기에서도 찾음.
+    """
+    q = _search_norm(query)
+    if not q:
+        return []
+    probes = [("jp_word", q), ("reading", q), ("meaning", q)]
+    if q.isascii() and any(c.isalpha() for c in q):
+        kana = romaji_to_hira(q)
+        if kana != q:
+            probes[1:1] = [("reading", kana), ("jp_word", kana)]
+    out: dict[int, None] = {}
+    for field, prefix in probes:
+        keys, rows = search[field]
+        for r in _prefix_rows(keys, rows, prefix, limit):
+            out.setdefault(r, None)
+        if len(out) >= limit:
+            break
+    return list(out)[:limit]
+
 def _pick_reading_wrongs(candidates: list[str], correct: str, pos: str, jp_word: str = "", k: int = 3) -> list[str]:
     correct_nf = _nfkc_str(correct)
-    cands = _uniq([_nfkc_str(c) for c in candidates if _nfkc_str(c) and _nfkc_str(c) != correct_nf])
+    cands = _uniq([c for c in map(_nfkc_str, candidates) if c and c != correct_nf])
     if len(cands) < k:
         return []
 
@@ -1845,7 +4541,307 @@ def _pick_reading_wrongs(candidates: list[str], correct: str, pos: str, jp_word:
 
     return out[:k]
 
-def make_question(row: pd.Series, qtype: str, pool: pd.DataFrame) -> dict:
+# ============================================================
+# ✅ 혼동 행렬 (학습자 오답 → 어려운 보기)
+#   - wrong_list의 (정답, 내 답) 쌍을 유형별로 집계한 sparse 행렬
+#   - (qtype, 정답) → 많이 헷갈린 순 TOP-K 목록을 미리 유지 → 조회 O(1)
+#   - 제출할 때마다 증분 반영(메모리 + 저널 SQLite의 confusions 테이블), 관리자 "재계산"은 quiz_attempts 전체를 다시 집계
+#     (재계산 중에 들어온 증분은 따로 모아 두었다가 교체할 때 새 집계에 더함 → 스캔 뒤 제출이 사라지지 않음)
+#   - 재시작하면 confusions 테이블에서 읽음 (비어 있으면 예전 스냅샷 CONFUSION_PATH를 1번 가져옴)
+# ============================================================
+CONFUSION_PATH = BASE_DIR / "data" / "confusions.csv"  # 예전 버전의 스냅샷 (읽기만)
+CONFUSION_QTYPES = ("meaning", "kr2jp")
+CONFUSION_TOP_K = 5
+CONFUSION_MIN_COUNT = 2        # 한 번 실수는 우연일 수 있어 2회 이상만 사용
+CONFUSION_MAX_DISTRACTORS = 2  # 보기 3개 중 최대 2개까지(나머지는 무작위)
+
+def confusion_pairs_from_wrong_list(wrong_list) -> list[tuple[str, str, str]]:
+    out = []
+    for w in (wrong_list or []):
+        if not isinstance(w, dict):
+            continue
+        qt = str(w.get("유형", "")).strip()
+        correct = _nfkc_str(w.get("정답", ""))
+        picked = _nfkc_str(w.get("내 답", ""))
+        if qt in CONFUSION_QTYPES and correct and picked and correct != picked:
+            out.append((qt, correct, picked))
+    return out
+
+def _confusion_new(counts: dict | None = None) -> dict:
+    idx = {"counts": counts or {}, "top": {}}
+    for key in idx["counts"]:
+        _confusion_refresh_top(idx, key)
+    return idx
+
+def _confusion_refresh_top(idx: dict, key: tuple[str, str]):
+    cnt = idx["counts"].get(key) or {}
+    top = sorted(cnt.items(), key=lambda kv: (-kv[1], kv[0]))[:CONFUSION_TOP_K]
+    idx["top"][key] = tuple(p for p, c in top if c >= CONFUSION_MIN_COUNT)
+
+def confusion_add_pairs(idx: dict, pairs: list[tuple[str, str, str]]):
+    touched = set()
+    for qt, correct, picked in pairs:
+        key = (qt, correct)
+        cnt = idx["counts"].setdefault(key, {})
+        cnt[picked] = cnt.get(picked, 0) + 1
+        touched.add(key)
+    for key in touched:
+        _confusion_refresh_top(idx, key)
+
+def confusion_top(idx: dict | None, qtype: str, correct: str) -> tuple[str, ...]:
+    if not idx:
+        return ()
+    return idx["top"].get((qtype, _nfkc_str(correct)), ())
+
+def _load_confusion_counts() -> dict:
+    j = get_journal()
+    with j["lock"]:
+        rows = j["conn"].execute("SELECT qtype, correct, picked, n FROM confusions").fetchall()
+    if not rows and CONFUSION_PATH.exists():
+        df = pd.read_csv(CONFUSION_PATH, **READ_KW)
+        rows = list(zip(df["qtype"], df["correct"], df["picked"], df["count"].astype(int)))
+        save_confusion_counts(rows)
+    counts: dict = {}
+    for qt, correct, picked, c in rows:
+        counts.setdefault((qt, correct), {})[picked] = int(c)
+    return counts
+
+def save_confusion_counts(rows: list[tuple[str, str, str, int]]):
+    """confusions 테이블을 rows로 통째로 교체 (재계산 결과 / 예전 스냅샷 가져오기)."""
+    j = get_journal()
+    with j["lock"]:
+        conn = j["conn"]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM confusions")
+            conn.executemany("INSERT INTO confusions(qtype, correct, picked, n) VALUES (?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+@st.cache_resource(show_spinner=False)
+def get_confusion_store() -> dict:
+    try:
+        counts = _load_confusion_counts()
+    except Exception:
+        counts = {}
+    return {
+        "lock": threading.Lock(),
+        "index": _confusion_new(counts),
+        "rebuilds": [],   # 진행 중인 재계산마다 그동안의 증분(pairs) 목록
+    }
+
+def get_confusion_index() -> dict:
+    return get_confusion_store()["index"]
+
+def record_confusions(wrong_list):
+    pairs = confusion_pairs_from_wrong_list(wrong_list)
+    if not pairs:
+        return
+    store = get_confusion_store()
+    with store["lock"]:
+        confusion_add_pairs(store["index"], pairs)
+        for pending in store["rebuilds"]:
+            pending.extend(pairs)
+    try:
+        j = get_journal()
+        with j["lock"]:
+            j["conn"].executemany(
+                "INSERT INTO confusions(qtype, correct, picked, n) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT(qtype, correct, picked) DO UPDATE SET n = n + 1",
+                pairs,
+            )
+    except Exception:
+        pass  # 메모리에는 반영됨 (다음 재계산 때 다시 맞춰짐)
+
+def rebuild_confusion_index(sb_authed, page_size: int = 1000, max_rows: int = 200_000) -> int:
+    """
+    quiz_attempts 전체를 id 기준 keyset 페이지로 훑어 다시 집계 → 한 번에 교체.
+    (created_at은 같은 값이 있을 수 있어 페이지 경계에서 행을 건너뜀 → 유일한 id로)
+    (관리자 RLS로 전체 조회 가능한 클라이언트 필요) 반환: 읽은 attempt 수
+    스캔은 최신 id부터라 시작한 뒤 들어온 제출은 못 봄 → 그동안 record_confusions가 모은 증분을 교체 직전에 더함.
+    """
+    store = get_confusion_store()
+    pending: list[tuple[str, str, str]] = []
+    with store["lock"]:
+        store["rebuilds"].append(pending)
+    try:
+        idx, total = _scan_confusions(sb_authed, page_size, max_rows)
+        with store["lock"]:
+            confusion_add_pairs(idx, pending)  # 같은 잠금 안에서 더하고 교체 → 사이에 끼는 증분 없음
+            store["index"] = idx
+            save_confusion_counts([
+                (qt, correct, picked, c)
+                for (qt, correct), cnt in idx["counts"].items()
+                for picked, c in cnt.items()
+            ])
+    finally:
+        with store["lock"]:
+            store["rebuilds"] = [p for p in store["rebuilds"] if p is not pending]
+    return total
+
+def _scan_confusions(sb_authed, page_size: int, max_rows: int) -> tuple[dict, int]:
+    idx = _confusion_new()
+    last = None
+    total = 0
+    while total < max_rows:
+        q = (
+            sb_authed.table("quiz_attempts")
+            .select("id, wrong_list")
+            .gt("wrong_count", 0)
+            .order("id", desc=True)
+            .limit(page_size)
+        )
+        if last is not None:
+            q = q.lt("id", last)
+        rows = run_db(lambda: q.execute(), name="quiz_attempts.confusion_scan").data or []
+        if not rows:
+            break
+        for r in rows:
+            confusion_add_pairs(idx, confusion_pairs_from_wrong_list(r.get("wrong_list")))
+        total += len(rows)
+        last = rows[-1].get("id")
+        if len(rows) < page_size:
+            break
+    return idx, total
+
+def pick_distractors(values: list[str], k: int, correct: str, hard=(), rng=random) -> list[str]:
+    """
+    hard(헷갈린/닮은 보기)를 먼저, 나머지는 values에서 무작위.
+    무작위 부분은 뽑고-버리기라 후보 목록 전체를 복사하지 않음.
+    rng: random.Random (seed 고정 출제용, 기본은 모듈 random)
+    """
+    out: list[str] = []
+    for h in hard:
+        if len(out) >= k:
+            return out
+        if h and h != correct and h not in out:
+            out.append(h)
+    for _ in range(8 * k):
+        if len(out) >= k:
+            return out
+        c = rng.choice(values)
+        if c != correct and c not in out:
+            out.append(c)
+    rest = [c for c in values if c != correct and c not in out]
+    return out + rng.sample(rest, k - len(out))
+
+def hard_distractors(index, confusion, qtype: str, correct: str, row_no, column: str, allowed, rng=random) -> list[str]:
+    """혼동 행렬 보기 먼저, 모자라면 이웃 인덱스에서 무작위로 채워 최대 NEIGHBOR_MAX_DISTRACTORS개."""
+    hard = [x for x in confusion_top(confusion, qtype, correct) if x in allowed and x != correct]
+    hard = hard[:CONFUSION_MAX_DISTRACTORS]
+    need = NEIGHBOR_MAX_DISTRACTORS - len(hard)
+    if need > 0:
+        near = [
+            x for x in dict.fromkeys(neighbor_values(index, row_no, column))
+            if x and x != correct and x in allowed and x not in hard
+        ]
+        hard += rng.sample(near, min(need, len(near)))
+    return hard[:NEIGHBOR_MAX_DISTRACTORS]
+
+# ============================================================
+# ✅ 문항 레코드 (슬롯)
+#   - word_id / qtype / 보기 튜플 / 정답 index + 덱 인덱스의 단어 튜플(공유, 복사 X)
+#   - prompt / correct_text / jp_word 등은 필요할 때 계산 → q["..."] / q.get("...")도 그대로 동작
+#   - answers는 보기 index(int | None), 채점은 grade_answers 1번
+# ============================================================
+QUESTION_WORD_FIELDS = ("jp_word", "reading", "meaning", "pos", "example_jp", "example_kr")
+_QUESTION_WORD_POS = {name: i for i, name in enumerate(QUESTION_WORD_FIELDS)}
+
+class QuizQuestion:
+    __slots__ = ("word_id", "qtype", "choices", "correct_idx", "word")
+
+    def __init__(self, word_id: int, qtype: str, choices: tuple, correct_idx: int, word: tuple):
+        self.word_id = int(word_id)
+        self.qtype = qtype
+        self.choices = tuple(choices)
+        self.correct_idx = int(correct_idx)
+        self.word = tuple(word)
+
+    @property
+    def correct_text(self) -> str:
+        return self.choices[self.correct_idx]
+
+    @property
+    def prompt(self) -> str:
+        jp, mn = self.word[0], self.word[2]
+        if self.qtype == "reading":
+            return f"{jp}의 발음은?"
+        if self.qtype == "kr2jp":
+            return f"'{mn}'의 일본어는?"
+        return f"{jp}의 뜻은?"
+
+    def __getattr__(self, name):
+        i = _QUESTION_WORD_POS.get(name)
+        if i is None:
+            raise AttributeError(name)
+        return self.word[i]
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            return default
+
+    def to_dict(self) -> dict:
+        """progress 저장용 (JSON)."""
+        return {
+            "word_id": self.word_id,
+            "qtype": self.qtype,
+            "choices": list(self.choices),
+            "correct_idx": self.correct_idx,
+            "word": list(self.word),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "QuizQuestion":
+        """to_dict 결과 또는 구버전 문항 dict(prompt/choices/correct_text/...)."""
+        if isinstance(d, cls):
+            return d
+        choices = tuple(str(c) for c in (d.get("choices") or []))
+        if "correct_idx" in d:
+            correct_idx = int(d["correct_idx"])
+            word = tuple(d.get("word") or ())
+        else:
+            correct = str(d.get("correct_text", ""))
+            correct_idx = choices.index(correct) if correct in choices else 0
+            word = tuple(str(d.get(f, "") or "") for f in QUESTION_WORD_FIELDS)
+        word = tuple(word) + ("",) * (len(QUESTION_WORD_FIELDS) - len(word))
+        return cls(int(d.get("word_id", -1) if d.get("word_id") is not None else -1), str(d.get("qtype", "")), choices, correct_idx, word)
+
+def answer_index(q: QuizQuestion, value) -> int | None:
+    """위젯 값(보기 글자) 또는 이미 index인 값 → 보기 index."""
+    if value is None:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value if 0 <= value < len(q.choices) else None
+    try:
+        return q.choices.index(value)
+    except ValueError:
+        return None
+
+def grade_answers(quiz: list, answers: list) -> bytes:
+    """문항별 1(정답)/0 — 제출 1번에 1번 계산해서 여러 곳에서 같이 씀."""
+    return bytes(
+        1 if (i < len(answers) and answers[i] is not None and answers[i] == q.correct_idx) else 0
+        for i, q in enumerate(quiz)
+    )
+
+def make_question(
+    row: pd.Series,
+    qtype: str,
+    pool: pd.DataFrame,
+    index: dict | None = None,
+    confusion: dict | None = None,
+    rng=random,
+) -> QuizQuestion:
     jp = str(row.get("jp_word", "")).strip()
     rd = str(row.get("reading", "")).strip()
     mn = str(row.get("meaning", "")).strip()
@@ -1853,69 +4849,306 @@ def make_question(row: pd.Series, qtype: str, pool: pd.DataFrame) -> dict:
     ex_jp = str(row.get("example_jp", "")).strip()
     ex_kr = str(row.get("example_kr", "")).strip()
 
-    # ✅ 같은 실제 pos 풀
-    pool_pos = pool[pool["pos"].astype(str).str.strip().str.lower() == pos].copy()
+    # ✅ 같은 실제 pos 풀 (인덱스가 없으면 그 자리에서 생성 = 느린 경로)
+    if index is None:
+        index = build_deck_index(pool)
+    pos_cands = index["by_pos"].get(pos, {})
 
     if qtype == "reading":
-        prompt = f"{jp}의 발음은?"
         correct = rd
-        candidates = (
-            pool_pos.loc[pool_pos["reading"] != correct, "reading"]
-            .dropna().drop_duplicates().tolist()
-        )
+        candidates = [x for x in pos_cands.get("reading", []) if x != correct]
         wrongs = _pick_reading_wrongs(candidates, correct, pos=pos, jp_word=jp, k=3)
         if len(wrongs) < 3:
             c2 = _uniq([str(x).strip() for x in candidates if str(x).strip()])
             if len(c2) < 3:
                 st.error(f"오답 후보 부족(발음): pos={pos}, 후보={len(c2)}개")
                 st.stop()
-            wrongs = random.sample(c2, 3)
+            wrongs = rng.sample(c2, 3)
 
     elif qtype == "meaning":
-        prompt = f"{jp}의 뜻은?"
         correct = mn
-        candidates = (
-            pool_pos.loc[pool_pos["meaning"] != correct, "meaning"]
-            .dropna().drop_duplicates().tolist()
-        )
-        if len(candidates) < 3:
-            st.error(f"오답 후보 부족(뜻): pos={pos}, 후보={len(candidates)}개")
+        values = pos_cands.get("meaning", [])
+        allowed = pos_cands.get("meaning_set", frozenset())
+        n_cands = len(values) - (correct in allowed)
+        if n_cands < 3:
+            st.error(f"오답 후보 부족(뜻): pos={pos}, 후보={n_cands}개")
             st.stop()
-        wrongs = random.sample(candidates, 3)
+        hard = hard_distractors(index, confusion, qtype, correct, row.name, "meaning", allowed, rng)
+        wrongs = pick_distractors(values, 3, correct, hard, rng)
 
     elif qtype == "kr2jp":
-        prompt = f"'{mn}'의 일본어는?"
         correct = jp
-        candidates = (
-            pool_pos.loc[pool_pos["jp_word"] != correct, "jp_word"]
-            .dropna().astype(str).str.strip().tolist()
-        )
-        candidates = [x for x in dict.fromkeys(candidates) if x]
-        if len(candidates) < 3:
-            st.error(f"오답 후보 부족(한→일): pos={pos}, 후보={len(candidates)}개")
+        values = pos_cands.get("jp_word", [])
+        allowed = pos_cands.get("jp_word_set", frozenset())
+        n_cands = len(values) - (correct in allowed)
+        if n_cands < 3:
+            st.error(f"오답 후보 부족(한→일): pos={pos}, 후보={n_cands}개")
             st.stop()
-        wrongs = random.sample(candidates, 3)
+        hard = hard_distractors(index, confusion, qtype, correct, row.name, "jp_word", allowed, rng)
+        wrongs = pick_distractors(values, 3, correct, hard, rng)
 
     else:
         raise ValueError(f"Unknown qtype: {qtype}")
 
     choices = wrongs + [correct]
-    random.shuffle(choices)
+    rng.shuffle(choices)
 
-    return {
-        "prompt": prompt,
-        "choices": choices,
-        "correct_text": correct,
-        "jp_word": jp,
-        "reading": rd,
-        "meaning": mn,
-        "pos": pos,
-        "qtype": qtype,
-        "example_jp": ex_jp,
-        "example_kr": ex_kr,
-    }
+    # 덱 인덱스의 단어 튜플 공유 (행 번호가 안 맞으면 이 행에서 만듦)
+    words = index.get("words") or ()
+    row_no = row.name
+    word = words[row_no] if isinstance(row_no, (int, np.integer)) and 0 <= row_no < len(words) else None
+    if word is None or word[0] != jp:
+        word = (jp, rd, mn, pos, ex_jp, ex_kr)
+
+    return QuizQuestion(int(row.get("word_id", -1)), qtype, tuple(choices), choices.index(correct), word)
 
-def build_quiz(qtype: str, pos_group: str) -> list[dict]:
+# ============================================================
+# ✅ 간격 반복(SRS) 스케줄러 (SM-2 방식)
+#   - mastery_key별: items {word_id: [due_ts, interval_h, ef_x100, reps]} + heap [(due_ts, word_id)]
+#   - 정답: 1일 → 6일 → interval × EF / 오답: 10분 뒤 다시, EF 감소
+#   - build_quiz는 heap에서 "가장 밀린" N개를 꺼냄 (pool 전체 필터링 X)
+#   - heap은 lazy delete: items의 due와 다른 항목은 꺼낼 때 버림
+#   - 정답으로 interval이 SRS_MASTERED_IV_H 이상이 되면 SRS에서 빼고 정복(mastered_words)으로 옮김
+#     (정복/제외 단어가 heap에서 나오면 그때 일정에서 지움)
+# ============================================================
+SRS_DAY_S = 86400
+SRS_RELEARN_S = 10 * 60
+SRS_EF_START = 250
+SRS_EF_MIN = 130
+SRS_MASTERED_IV_H = 21 * 24
+
+def srs_new_state() -> dict:
+    return {"items": {}, "heap": []}
+
+def srs_review(item: list | None, is_correct: bool, now: float) -> list[int]:
+    """SM-2 한 번 채점 반영. quality: 정답=4, 오답=2."""
+    due, iv_h, ef, reps = item if item else (0, 0, SRS_EF_START, 0)
+    q = 4 if is_correct else 2
+    ef = max(SRS_EF_MIN, int(round(ef + 100 * (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02)))))
+    if is_correct:
+        reps += 1
+        if reps == 1:
+            iv_h = 24
+        elif reps == 2:
+            iv_h = 6 * 24
+        else:
+            iv_h = int(round(iv_h * ef / 100))
+        due = int(now) + iv_h * 3600
+    else:
+        reps = 0
+        iv_h = 0
+        due = int(now) + SRS_RELEARN_S
+    return [int(due), int(iv_h), int(ef), int(reps)]
+
+def srs_record(state: dict, results: list[tuple[int, bool]], now: float | None = None):
+    now = time.time() if now is None else now
+    items = state["items"]
+    for wid, ok in results:
+        if wid is None or int(wid) < 0:
+            continue
+        wid = int(wid)
+        item = srs_review(items.get(wid), bool(ok), now)
+        items[wid] = item
+        heapq.heappush(state["heap"], (item[0], wid))
+    # stale 항목이 너무 쌓이면 한 번 정리
+    if len(state["heap"]) > 2 * len(items) + 64:
+        state["heap"] = [(it[0], w) for w, it in items.items()]
+        heapq.heapify(state["heap"])
+
+def srs_graduate(state: dict, wid: int) -> bool:
+    """interval이 SRS_MASTERED_IV_H 이상이면 일정에서 빼고 True (→ 호출하는 쪽이 정복으로)."""
+    item = state["items"].get(wid)
+    if item is None or item[1] < SRS_MASTERED_IV_H:
+        return False
+    del state["items"][wid]  # heap 항목은 lazy delete
+    return True
+
+def srs_pop_most_due(
+    state: dict, k: int, now: float | None = None, accept=None, ahead: bool = False, drop=None,
+) -> list[int]:
+    """
+    due가 지난 word_id를 가장 밀린 순으로 최대 k개. O(k log n)
+    - accept(wid) -> bool: 현재 필터(품사/한자) 통과 여부
+    - drop(wid) -> bool: 일정에서 아예 지울 단어(정복/제외) → 다시 넣지 않음
+    - ahead=True면 아직 due 전인 것도 due 순으로 채움(미리 복습)
+    - 꺼낸 항목은 다시 넣어 둠(채점 전까지 일정은 그대로)
+    """
+    now = time.time() if now is None else now
+    heap = state["heap"]
+    items = state["items"]
+    out, popped, seen_w = [], [], set()
+    while heap and len(out) < k:
+        due, wid = heap[0]
+        if not ahead and due > now:
+            break
+        heapq.heappop(heap)
+        item = items.get(wid)
+        if item is None or item[0] != due or wid in seen_w:
+            continue  # stale
+        seen_w.add(wid)
+        if drop is not None and drop(wid):
+            del items[wid]
+            continue
+        popped.append((due, wid))
+        if accept is None or accept(wid):
+            out.append(wid)
+    for entry in popped:
+        heapq.heappush(heap, entry)
+    return out
+
+def srs_dump(srs: dict) -> dict:
+    """progress 저장용 압축 형태: 키별 평행 int 배열."""
+    out = {}
+    for key, state in (srs or {}).items():
+        items = state.get("items") or {}
+        if not items:
+            continue
+        wids = sorted(items)
+        out[key] = {
+            "id": wids,
+            "due": [items[w][0] for w in wids],
+            "iv": [items[w][1] for w in wids],
+            "ef": [items[w][2] for w in wids],
+            "n": [items[w][3] for w in wids],
+        }
+    return out
+
+def srs_load(payload: dict | None) -> dict:
+    srs = {}
+    for key, cols in (payload or {}).items():
+        try:
+            items = {
+                int(w): [int(d), int(i), int(e), int(n)]
+                for w, d, i, e, n in zip(cols["id"], cols["due"], cols["iv"], cols["ef"], cols["n"])
+            }
+        except Exception:
+            continue
+        heap = [(it[0], w) for w, it in items.items()]
+        heapq.heapify(heap)
+        srs[key] = {"items": items, "heap": heap}
+    return srs
+
+def get_srs_state(k: str) -> dict:
+    srs = st.session_state.get("srs")
+    if not isinstance(srs, dict):
+        srs = {}
+        st.session_state.srs = srs
+    return srs.setdefault(k, srs_new_state())
+
+def lookup_word_id(word_key: str) -> int:
+    store = get_deck_store()
+    with store["lock"]:
+        return int(store["word_ids"].get(_nfkc_str(word_key), -1))
+
+def record_quiz_srs(quiz: list, graded: bytes, key_of, now: float | None = None):
+    """채점 결과 → key_of(문항)의 SRS 일정. 충분히 익은 단어(srs_graduate)는 그 키의 정복 세트로."""
+    now = time.time() if now is None else now
+    mastered = st.session_state.setdefault("mastered_words", {})
+    for q, (wid, ok) in zip(quiz, quiz_word_results(quiz, graded)):
+        k = key_of(q)
+        state = get_srs_state(k)
+        srs_record(state, [(wid, ok)], now)
+        word_key = str(q.get("jp_word", "")).strip()
+        if ok and word_key and srs_graduate(state, wid):
+            mastered.setdefault(k, set()).add(word_key)
+
+def quiz_word_results(quiz: list, graded: bytes) -> list[tuple[int, bool]]:
+    out = []
+    for idx, q in enumerate(quiz or []):
+        wid = q.get("word_id")
+        if wid is None or int(wid) < 0:
+            wid = lookup_word_id(q.get("jp_word", ""))
+        out.append((int(wid), bool(graded[idx]) if idx < len(graded) else False))
+    return out
+
+def _sample_new_rows(rows: list[int], is_blocked, k: int) -> list[int]:
+    """아직 안 나온 단어 k개: 무작위 뽑기 후 거절, 부족하면 그때만 전체 필터."""
+    picked, tried = [], set()
+    attempts = 0
+    while len(picked) < k and attempts < 8 * k and len(tried) < len(rows):
+        attempts += 1
+        r = rows[random.randrange(len(rows))]
+        if r in tried:
+            continue
+        tried.add(r)
+        if not is_blocked(r):
+            picked.append(r)
+    if len(picked) < k:
+        rest = [r for r in rows if r not in tried and not is_blocked(r)]
+        picked.extend(random.sample(rest, min(k - len(picked), len(rest))))
+    return picked
+
+def select_quiz_rows(
+    pool: pd.DataFrame,
+    index: dict,
+    cand: tuple[list[int], frozenset],
+    srs_state: dict,
+    seen: set,
+    mastered: set,
+    excluded: set,
+    n: int,
+    now: float | None = None,
+) -> list[int] | None:
+    """
+    출제할 행 번호 n개: ① due 지난 복습(가장 밀린 순) → ② 처음 보는 단어
+    → ③ 나오기만 하고 채점 안 된 단어(seen인데 SRS 일정 없음) → ④ 곧 due될 복습.
+    - cand: deck_candidate_rows() 결과 (행 목록, 행 집합) — 덱 버전별 캐시, 읽기 전용
+    - 정복/제외 단어는 복습으로도 안 나옴 (heap에서 만나면 일정에서 지움)
+    - 정복/제외를 빼고 n개가 안 되면 None (= 정복 상태). due 전인 복습만 남았으면 미리 복습으로 채움
+    """
+    rows, row_set = cand
+    id_to_row = index["id_to_row"]
+    wids = pool["word_id"].to_numpy()
+    jp_words = pool["jp_word"].to_numpy()
+    closed = set(mastered) | set(excluded)
+
+    def _accept(wid: int) -> bool:
+        r = id_to_row.get(wid)
+        return r is not None and r in row_set
+
+    def _closed(wid: int) -> bool:
+        r = id_to_row.get(wid)
+        return r is not None and jp_words[r] in closed
+
+    due_ids = srs_pop_most_due(srs_state, n, now=now, accept=_accept, drop=_closed)
+    picked = [id_to_row[w] for w in due_ids]
+
+    scheduled = srs_state["items"]
+    picked_set = set(picked)
+
+    def _is_blocked(r: int) -> bool:
+        return r in picked_set or int(wids[r]) in scheduled or jp_words[r] in closed
+
+    def _is_blocked_or_seen(r: int) -> bool:
+        return _is_blocked(r) or jp_words[r] in seen
+
+    for is_blocked in (_is_blocked_or_seen, _is_blocked):
+        if len(picked) >= n:
+            break
+        new = _sample_new_rows(rows, is_blocked, n - len(picked))
+        picked += new
+        picked_set.update(new)
+
+    if len(picked) < n:
+        ahead = srs_pop_most_due(
+            srs_state, n - len(picked), now=now, ahead=True,
+            accept=lambda w: _accept(w) and id_to_row[w] not in picked_set, drop=_closed,
+        )
+        picked += [id_to_row[w] for w in ahead]
+    return picked if len(picked) >= n else None
+
+def build_quiz(qtype: str, pos_group: str) -> list[QuizQuestion]:
+    t0 = time.perf_counter()
+    try:
+        return _build_quiz(qtype, pos_group)
+    finally:
+        metric_observe(
+            "hotena_build_quiz_seconds",
+            time.perf_counter() - t0,
+            {"qtype": str(qtype).strip(), "pos_group": str(pos_group).strip().lower()},
+        )
+
+def _build_quiz(qtype: str, pos_group: str) -> list[QuizQuestion]:
     # ✅ 안전장치: 제한 그룹에서는 reading 강제 금지
     pos_group = str(pos_group).strip().lower()
     qtype = str(qtype).strip()
@@ -1929,16 +5162,16 @@ def build_quiz(qtype: str, pos_group: str) -> list[dict]:
     ensure_seen_words_shape()
 
     pool = st.session_state["_pool"]
+    index = st.session_state["_pool_index"]
 
     pos_filters = get_pos_filters()
-    base_pos = pool[pool["pos"].astype(str).str.strip().str.lower().isin(pos_filters)].copy()
 
     # ✅ 발음(reading) 문제: jp_word에 한자가 없는(히라가나만 등) 단어는 제외
-    if qtype == "reading":
-        base_pos = base_pos[base_pos["jp_word"].apply(_has_kanji)].copy()
+    cand = deck_candidate_rows(index, pos_filters, kanji_only=(qtype == "reading"))
+    rows = cand[0]
 
-    if len(base_pos) < N:
-        st.warning(f"{POS_LABEL_MAP.get(pos_group,pos_group)} 단어가 부족합니다. (현재 {len(base_pos)}개 / 필요 {N}개)")
+    if len(rows) < N:
+        st.warning(f"{POS_LABEL_MAP.get(pos_group,pos_group)} 단어가 부족합니다. (현재 {len(rows)}개 / 필요 {N}개)")
         return []
 
     k = mastery_key(qtype=qtype, pos=pos_group)
@@ -1947,29 +5180,18 @@ def build_quiz(qtype: str, pos_group: str) -> list[dict]:
     mastered = st.session_state.get("mastered_words", {}).get(k, set())
     excluded = st.session_state.get("excluded_wrong_words", {}).get(k, set())
 
-    blocked = set()
-    if seen:
-        blocked |= set(seen)          # ✅ 한 번이라도 출제된 건 전부 제외
-    if mastered:
-        blocked |= set(mastered)      # (겹쳐도 무관)
-    if excluded:
-        blocked |= set(excluded)    
-
-    def _filter_blocked(df: pd.DataFrame) -> pd.DataFrame:
-        if not blocked:
-            return df
-        keys = df["jp_word"].astype(str).str.strip()
-        return df[~keys.isin(blocked)].copy()
+    # ✅ 채점된 단어는 SRS due가 되면 복습으로, 출제만 되고 채점 안 된 단어는 새 단어 다음 순서로 다시 나옴
+    picked = select_quiz_rows(pool, index, cand, get_srs_state(k), set(seen), set(mastered), set(excluded), N)
 
-    base = _filter_blocked(base_pos)
-
-    if len(base) < N:
-        st.session_state.setdefault("mastery_done", {})
+    st.session_state.setdefault("mastery_done", {})
+    if not picked:
         st.session_state.mastery_done[k] = True
         return []
+    st.session_state.mastery_done[k] = False
 
-    sampled = base.sample(n=N, replace=False).reset_index(drop=True)
-    return [make_question(sampled.iloc[i], qtype, pool) for i in range(N)]
+    random.shuffle(picked)
+    confusion = get_confusion_index()
+    return [make_question(pool.iloc[r], qtype, pool, index, confusion) for r in picked]
 
 
 # ============================================================
@@ -1977,7 +5199,12 @@ def build_quiz(qtype: str, pos_group: str) -> list[dict]:
 # ✅ 반드시 Admin/My pages(마이페이지) 보다 위에 있어야 합니다.
 # ============================================================
 
-def build_quiz_from_word_keys(word_keys: list[str], qtype: str, pos_group: str) -> list[dict]:
+def build_quiz_from_word_keys(
+    word_keys: list[str],
+    qtype: str,
+    pos_group: str,
+    pos_filters: list[str] | None = None,
+) -> list[QuizQuestion]:
     # ✅ 안전장치
     pos_group = str(pos_group).strip().lower()
     qtype = str(qtype).strip()
@@ -1986,6 +5213,7 @@ def build_quiz_from_word_keys(word_keys: list[str], qtype: str, pos_group: str)
 
     ensure_pool_ready()
     pool = st.session_state["_pool"]
+    index = st.session_state["_pool_index"]
 
     keys = [str(x).strip() for x in (word_keys or []) if str(x).strip()]
     keys = list(dict.fromkeys(keys))
@@ -1993,23 +5221,20 @@ def build_quiz_from_word_keys(word_keys: list[str], qtype: str, pos_group: str)
         st.warning("TOP10 단어가 비어 있어요.")
         return []
 
-    pos_filters = get_pos_filters()
-    df = pool[
-        (pool["pos"].astype(str).str.strip().str.lower().isin(pos_filters))
-        & (pool["jp_word"].astype(str).str.strip().isin(keys))
-    ].copy()
-
+    pos_filters = pos_filters or get_pos_filters()  # 단어 검색 드릴은 그 단어의 pos를 넘김
+    mask = index["pos_key"].isin(pos_filters) & pool["jp_word"].isin(keys)
     if qtype == "reading":
-        df = df[df["jp_word"].apply(_has_kanji)].copy()
+        mask = mask & index["has_kanji"]
+    df = pool[mask]
 
     if df.empty:
         st.warning("TOP10 단어를 현재 풀(품사/기타 선택)에서 찾지 못했어요. (필터 조건 확인)")
         return []
 
-    df = df.sample(frac=1).reset_index(drop=True)
-    return [make_question(df.iloc[i], qtype, pool) for i in range(len(df))]
+    df = df.sample(frac=1)  # ✅ index 유지: row.name = pool 행 번호(닮은 단어 보기용)
+    return [make_question(df.iloc[i], qtype, pool, index, get_confusion_index()) for i in range(len(df))]
 
-def build_quiz_from_wrongs(wrong_list: list, qtype: str, pos_group: str) -> list[dict]:
+def build_quiz_from_wrongs(wrong_list: list, qtype: str, pos_group: str) -> list[QuizQuestion]:
     # ✅ 안전장치
     pos_group = str(pos_group).strip().lower()
     qtype = str(qtype).strip()
@@ -2018,6 +5243,7 @@ def build_quiz_from_wrongs(wrong_list: list, qtype: str, pos_group: str) -> list
 
     ensure_pool_ready()
     pool = st.session_state["_pool"]
+    index = st.session_state["_pool_index"]
 
     # ✅ wrong_list에서 jp_word 키 뽑기
     wrong_words = []
@@ -2034,30 +5260,400 @@ def build_quiz_from_wrongs(wrong_list: list, qtype: str, pos_group: str) -> list
     # ✅ 현재 화면의 pos 필터(기타면 체크된 세부 품사들)
     pos_filters = get_pos_filters()
 
-    # ✅ pool에서 오답 단어 + 현재 pos필터로 매칭
-    retry_df = pool[
-        (pool["pos"].astype(str).str.strip().str.lower().isin(pos_filters))
-        & (pool["jp_word"].astype(str).str.strip().isin(wrong_words))
-    ].copy()
+    # ✅ pool에서 오답 단어 + 현재 pos필터로 매칭
+    in_filter = index["pos_key"].isin(pos_filters) & pool["jp_word"].isin(wrong_words)
+    retry_df = pool[in_filter]
+
+    if retry_df.empty:
+        st.error("오답 단어를 현재 풀(품사/기타 선택)에서 찾지 못했습니다. (jp_word 매칭/필터 확인)")
+        return []
+
+    # ✅ reading이면 ‘한자 포함 jp_word’만
+    if qtype == "reading":
+        retry_df = pool[in_filter & index["has_kanji"]]
+        if retry_df.empty:
+            st.warning("오답 중 ‘한자 포함 단어’가 없어 발음 문제로는 복습할 수 없어요. (뜻/한→일로 복습 추천)")
+            return []
+
+    retry_df = retry_df.sample(frac=1)  # ✅ index 유지(row.name = pool 행 번호)
+
+    # ✅ 오답 전체를 문제로 만들되, 최대 N개까지만 (원하면 삭제 가능)
+    if len(retry_df) > N:
+        retry_df = retry_df.head(N).copy()
+
+    return [make_question(retry_df.iloc[i], qtype, pool, index, get_confusion_index()) for i in range(len(retry_df))]
+
+# ============================================================
+# ✅ 단어 난이도 분석 (관리자)
+#   - 원본 이벤트를 훑지 않고 저널 DB의 롤업(word_stats / word_stats_daily)만 읽음
+#   - 전체 롤업은 DataFrame 스냅샷으로 TTL 동안 캐시 → 필터/정렬은 메모리에서
+# ============================================================
+WORD_STATS_TTL_S = 60
+WORD_STATS_TREND_DAYS = 30
+
+def _word_stats_read(sql: str, params: tuple = ()) -> pd.DataFrame:
+    j = get_journal()
+    with j["lock"]:
+        cur = j["conn"].execute(sql, params)
+        cols = [d[0] for d in cur.description]
+        return pd.DataFrame(cur.fetchall(), columns=cols)
+
+@st.cache_data(show_spinner=False, ttl=WORD_STATS_TTL_S)
+def word_stats_snapshot(level: str) -> pd.DataFrame:
+    df = _word_stats_read(
+        "SELECT word_key, pos, qtype, n, correct FROM word_stats WHERE level = ?", (level,)
+    )
+    df["pos"] = df["pos"].astype("category")
+    df["qtype"] = df["qtype"].astype("category")
+    return df
+
+@st.cache_data(show_spinner=False, ttl=WORD_STATS_TTL_S)
+def word_stats_trend(level: str, since_day: str, word_key: str = "") -> pd.DataFrame:
+    sql = "SELECT day, qtype, SUM(n) AS n, SUM(correct) AS correct FROM word_stats_daily WHERE level = ? AND day >= ?"
+    params: tuple = (level, since_day)
+    if word_key:
+        sql += " AND word_key = ?"
+        params += (word_key,)
+    return _word_stats_read(sql + " GROUP BY day, qtype ORDER BY day", params)
+
+def _with_accuracy(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["정답률(%)"] = (100 * df["correct"] / df["n"].clip(lower=1)).round(1)
+    return df
+
+def render_word_stats_admin():
+    level = current_deck_spec().get("stats_level", "BEGINNER")
+    df = word_stats_snapshot(level)
+    if df.empty:
+        st.caption("아직 집계된 답안이 없어요. (이 서버에서 제출된 것부터 누적)")
+        return
+    st.caption(f"{level} · 답안 {int(df['n'].sum()):,}건 · 단어 {df['word_key'].nunique():,}개 (최대 {WORD_STATS_TTL_S}초 전 스냅샷)")
+
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        qtypes = st.multiselect("유형", sorted(df["qtype"].unique()), key="ws_stats_qtypes",
+                                format_func=lambda x: quiz_label_map.get(x, x))
+    with c2:
+        groups = st.multiselect("품사", sorted(df["pos"].unique()), key="ws_stats_pos",
+                                format_func=lambda x: POS_LABEL_MAP.get(x, x))
+    with c3:
+        min_n = st.number_input("최소 응답 수", 1, 10_000, 5, key="ws_stats_min_n")
+    if qtypes:
+        df = df[df["qtype"].isin(qtypes)]
+    if groups:
+        df = df[df["pos"].isin(groups)]
+
+    g1, g2 = st.columns(2)
+    with g1:
+        st.markdown("**유형별**")
+        st.dataframe(_with_accuracy(df.groupby("qtype", observed=True)[["n", "correct"]].sum().reset_index()),
+                     hide_index=True, use_container_width=True)
+    with g2:
+        st.markdown("**품사별**")
+        st.dataframe(_with_accuracy(df.groupby("pos", observed=True)[["n", "correct"]].sum().reset_index()),
+                     hide_index=True, use_container_width=True)
+
+    st.markdown("**어려운 단어 TOP 30**")
+    words = df.groupby("word_key", observed=True)[["n", "correct"]].sum()
+    words = _with_accuracy(words[words["n"] >= int(min_n)].reset_index())
+    hardest = words.nsmallest(30, "정답률(%)")
+    st.dataframe(hardest, hide_index=True, use_container_width=True)
+
+    st.markdown(f"**최근 {WORD_STATS_TREND_DAYS}일 추이**")
+    word = st.selectbox("단어(비우면 전체)", [""] + hardest["word_key"].tolist(), key="ws_stats_word")
+    since = (datetime.now(KST) - timedelta(days=WORD_STATS_TREND_DAYS - 1)).strftime("%Y-%m-%d")
+    trend = word_stats_trend(level, since, word)
+    if qtypes:
+        trend = trend[trend["qtype"].isin(qtypes)]
+    if trend.empty:
+        st.caption("기간 안에 기록이 없어요.")
+        return
+    daily = _with_accuracy(trend.groupby("day")[["n", "correct"]].sum().reset_index())
+    st.line_chart(daily.set_index("day")["정답률(%)"])
+    st.download_button("CSV (단어별 전체)", words.to_csv(index=False).encode("utf-8-sig"),
+                       f"word_stats_{level}.csv", "text/csv", key="btn_word_stats_csv")
+
+# ============================================================
+# ✅ 학습지 일괄 생성 (세션 상태 X → 관리자 화면 / tools/make_worksheets.py 공용)
+#   - plan: (품사 그룹 × 유형)별로 행을 뽑아 작은 job으로 나눔 (job마다 seed)
+#   - job → 행 목록은 make_question 그대로 (같은 seed = 같은 학습지)
+#   - 쓰기는 job 결과가 나오는 대로 CSV/HTML에 이어 씀(전체를 모으지 않음)
+# ============================================================
+WORKSHEET_CHUNK = 100          # job 1개 문항 수(프로세스 풀 작업 단위)
+WORKSHEET_INLINE_MAX = 2000    # 관리자 화면에서 바로 만드는 최대 문항 수(그 이상은 CLI)
+WORKSHEET_COLS = (
+    "no", "pos_group", "qtype", "level", "jp_word", "reading", "prompt",
+    "choice_1", "choice_2", "choice_3", "choice_4", "answer", "answer_text",
+    "example_jp", "example_kr",
+)
+_CIRCLED = "①②③④"
+
+def worksheet_plan(
+    index: dict,
+    pos_groups: list[str],
+    qtypes: list[str],
+    per_combo: int,
+    seed: int,
+    chunk: int = WORKSHEET_CHUNK,
+) -> list[dict]:
+    rng = random.Random(seed)
+    jobs = []
+    for g in pos_groups:
+        for qt in qtypes:
+            if qt == "reading" and g in POS_ONLY_2TYPES:
+                continue
+            rows, _ = deck_candidate_rows(index, pos_group_filters(g), kanji_only=(qt == "reading"))
+            picked = rng.sample(rows, min(int(per_combo), len(rows)))
+            for i in range(0, len(picked), chunk):
+                jobs.append({
+                    "pos_group": g,
+                    "qtype": qt,
+                    "rows": picked[i:i + chunk],
+                    "seed": rng.randrange(1 << 31),
+                })
+    return jobs
+
+def seeded_questions(pool: pd.DataFrame, index: dict, rows: list[int], qtype: str, seed: int) -> list[tuple[int, QuizQuestion]]:
+    """
+    세션 없이 (행 번호, 문항) 목록. 이 호출만의 random.Random(seed)로 출제
+    (전역 random은 안 건드림 → 다른 세션 스레드와 섞이지 않음) → 같은 seed = 같은 보기/순서.
+    오답 후보가 모자란 단어는 건너뜀. 혼동 행렬은 안 씀, 이웃 인덱스는 다 채워진 뒤에(재현성).
+    """
+    wait_deck_neighbors(index)
+    rng = random.Random(seed)
+    out = []
+    for r in rows:
+        try:
+            q = make_question(pool.iloc[r], qtype, pool, index, None, rng=rng)
+        except Exception:
+            continue
+        if len(q.choices) == 4:
+            out.append((r, q))
+    return out
+
+def worksheet_rows(pool: pd.DataFrame, index: dict, job: dict) -> list[dict]:
+    """job 1개 → 학습지 행."""
+    level = pool["level"].astype(str).to_numpy()
+    out = []
+    for r, q in seeded_questions(pool, index, job["rows"], job["qtype"], job["seed"]):
+        jp, rd, _, _, ex_jp, ex_kr = q.word
+        row = {
+            "no": 0,
+            "pos_group": job["pos_group"],
+            "qtype": job["qtype"],
+            "level": level[r],
+            "jp_word": jp,
+            "reading": rd,
+            "prompt": q.prompt,
+            "answer": q.correct_idx + 1,
+            "answer_text": q.correct_text,
+            "example_jp": ex_jp,
+            "example_kr": ex_kr,
+        }
+        for i, c in enumerate(q.choices):
+            row[f"choice_{i + 1}"] = c
+        out.append(row)
+    return out
+
+def iter_worksheet_chunks(pool: pd.DataFrame, index: dict, jobs: list[dict]):
+    for job in jobs:
+        yield worksheet_rows(pool, index, job)
+
+def _worksheet_html_question(row: dict) -> str:
+    e = html.escape
+    choices = "".join(
+        f"<li>{_CIRCLED[i]} {e(str(row[f'choice_{i + 1}']))}</li>" for i in range(4)
+    )
+    return (
+        f"<div class='q'><b>{row['no']}.</b> {e(str(row['prompt']))} "
+        f"<span class='t'>[{e(quiz_label_map.get(row['qtype'], row['qtype']))}]</span>"
+        f"<ol>{choices}</ol></div>\n"
+    )
 
-    if retry_df.empty:
-        st.error("오답 단어를 현재 풀(품사/기타 선택)에서 찾지 못했습니다. (jp_word 매칭/필터 확인)")
-        return []
+def write_worksheets(chunks, csv_f=None, html_f=None, title: str = "학습지") -> int:
+    """
+    job 결과(행 목록)를 나오는 대로 번호 붙여 씀. 반환: 문항 수.
+    HTML은 문제 → (페이지 나눔) → 정답표. 정답표용으로는 (번호, 정답)만 들고 있음.
+    """
+    writer = None
+    if csv_f is not None:
+        writer = csv.DictWriter(csv_f, fieldnames=WORKSHEET_COLS)
+        writer.writeheader()
+    if html_f is not None:
+        html_f.write(
+            "<!doctype html><html><head><meta charset='utf-8'>"
+            f"<title>{html.escape(title)}</title><style>"
+            "body{font-family:sans-serif;margin:24px}"
+            ".q{break-inside:avoid;margin:10px 0}.q ol{list-style:none;padding-left:18px;margin:4px 0}"
+            ".q li{display:inline-block;margin-right:18px}.t{color:#888;font-size:12px}"
+            ".key{break-before:page}.key td{padding:2px 10px;border-bottom:1px solid #ddd}"
+            f"</style></head><body><h1>{html.escape(title)}</h1>\n"
+        )
+    key: list[tuple[int, int, str]] = []
+    n = 0
+    for rows in chunks:
+        for row in rows:
+            n += 1
+            row["no"] = n
+            if writer is not None:
+                writer.writerow(row)
+            if html_f is not None:
+                html_f.write(_worksheet_html_question(row))
+                key.append((n, int(row["answer"]), str(row["answer_text"])))
+    if html_f is not None:
+        html_f.write("<div class='key'><h2>정답</h2><table>\n")
+        for no, ans, text in key:
+            html_f.write(f"<tr><td>{no}</td><td>{_CIRCLED[ans - 1]}</td><td>{html.escape(text)}</td></tr>\n")
+        html_f.write("</table></div></body></html>\n")
+    return n
+
+def render_worksheet_admin():
+    st.caption(f"덱 전체에서 품사×유형별로 뽑아 정답표가 붙은 학습지를 만듭니다. {WORKSHEET_INLINE_MAX}문항이 넘으면 `python tools/make_worksheets.py`를 쓰세요.")
+    c1, c2 = st.columns(2)
+    with c1:
+        groups = st.multiselect(
+            "품사", POS_GROUP_OPTIONS, default=POS_GROUP_OPTIONS,
+            format_func=lambda x: POS_LABEL_MAP.get(x, x), key="ws_groups",
+        )
+        per_combo = st.number_input("품사×유형별 문항 수", 1, 5000, 50, key="ws_per_combo")
+    with c2:
+        qtypes = st.multiselect(
+            "유형", QUIZ_TYPES_ADMIN, default=QUIZ_TYPES_ADMIN,
+            format_func=lambda x: quiz_label_map.get(x, x), key="ws_qtypes",
+        )
+        seed = st.number_input("seed (같은 값 = 같은 학습지)", 0, 2**31 - 1, 1, key="ws_seed")
 
-    # ✅ reading이면 ‘한자 포함 jp_word’만
-    if qtype == "reading":
-        retry_df = retry_df[retry_df["jp_word"].apply(_has_kanji)].copy()
-        if retry_df.empty:
-            st.warning("오답 중 ‘한자 포함 단어’가 없어 발음 문제로는 복습할 수 없어요. (뜻/한→일로 복습 추천)")
-            return []
+    if not st.button("🖨️ 학습지 만들기", key="btn_ws_make", use_container_width=True):
+        return
+    deck = current_deck(str(current_deck_spec()["path"]))
+    pool, index = deck["pool"], deck["index"]
+    jobs = worksheet_plan(index, groups, qtypes, int(per_combo), int(seed))
+    total = sum(len(j["rows"]) for j in jobs)
+    if total > WORKSHEET_INLINE_MAX:
+        st.warning(f"{total}문항은 여기서 만들기엔 많아요. tools/make_worksheets.py로 만들어 주세요.")
+        return
+    csv_buf, html_buf = io.StringIO(), io.StringIO()
+    title = f"{current_deck_spec().get('label', current_deck_id())} 학습지 (seed {int(seed)})"
+    n = write_worksheets(iter_worksheet_chunks(pool, index, jobs), csv_buf, html_buf, title=title)
+    st.success(f"{n}문항 생성")
+    d1, d2 = st.columns(2)
+    with d1:
+        st.download_button("CSV", csv_buf.getvalue().encode("utf-8-sig"), "worksheet.csv", "text/csv",
+                           use_container_width=True, key="btn_ws_csv")
+    with d2:
+        st.download_button("HTML (인쇄용)", html_buf.getvalue().encode("utf-8"), "worksheet.html", "text/html",
+                           use_container_width=True, key="btn_ws_html")
 
-    retry_df = retry_df.sample(frac=1).reset_index(drop=True)
+# ============================================================
+# ✅ 덱 업로드 (청크 검증 → 파일 교체 → 바뀐 pos 파티션만 인덱스 재계산)
+# ============================================================
+DECK_UPLOAD_CHUNK = 1000       # 검증 시 한 번에 읽는 행 수
+DECK_UPLOAD_MAX_ERRORS = 200   # 화면/리포트에 담는 오류 행 수 (개수는 전부 셈)
+DECK_KNOWN_POS = {"noun", "adj_i", "adj_na", "verb", "phrase", *OTHER_POS_OPTIONS}
 
-    # ✅ 오답 전체를 문제로 만들되, 최대 N개까지만 (원하면 삭제 가능)
-    if len(retry_df) > N:
-        retry_df = retry_df.head(N).copy()
+def validate_deck_csv(f) -> dict:
+    """
+    업로드된 덱 CSV를 청크로 읽으며 행 단위 검증 (load_pool과 같은 스키마/정규화).
+    - 필수 컬럼 누락 → ValueError (load_pool과 같은 메시지)
+    - 행 오류: jp_word 중복 / reading·jp_word·meaning 비어 있음 / 모르는 pos
+    - 네 칸이 모두 빈 줄은 load_pool처럼 건너뜀
+    line은 CSV 줄 번호(헤더 = 1). 빈 줄도 행으로 읽고(skip_blank_lines=False)
+    따옴표 안 줄바꿈만큼 다음 행 번호를 밀어서 편집기의 줄 번호와 맞춤
+    """
+    schema = require_deck_schema(pd.read_csv(f, nrows=0, **READ_KW).columns)
+    f.seek(0)
+    seen: dict[str, int] = {}
+    errors: list[tuple[int, str, str]] = []
+    n_errors = 0
+    rows = 0
+    next_line = 2
+    pos_counts: Counter = Counter()
+    for chunk in pd.read_csv(f, chunksize=DECK_UPLOAD_CHUNK, skip_blank_lines=False, **READ_KW):
+        spans = 1 + chunk.apply(lambda c: c.fillna("").astype(str).str.count("\n")).sum(axis=1).to_numpy()
+        starts = next_line + np.cumsum(spans) - spans
+        next_line += int(spans.sum())
+        chunk = normalize_deck_frame(chunk, schema)
+        for line, pos, jp, reading, meaning in zip(
+            starts.tolist(), chunk["pos"], chunk["jp_word"], chunk["reading"], chunk["meaning"]
+        ):
+            if not (pos or jp or reading or meaning):
+                continue
+            rows += 1
+            msgs = []
+            if not jp:
+                msgs.append("jp_word 비어 있음")
+            elif jp in seen:
+                msgs.append(f"jp_word 중복 ({seen[jp]}행)")
+            else:
+                seen[jp] = line
+            if not reading:
+                msgs.append("reading 비어 있음")
+            if not meaning:
+                msgs.append("meaning 비어 있음")
+            if pos not in DECK_KNOWN_POS:
+                msgs.append(f"모르는 pos: {pos or '(빈칸)'}")
+            else:
+                pos_counts[pos] += 1
+            if msgs:
+                n_errors += 1
+                if len(errors) < DECK_UPLOAD_MAX_ERRORS:
+                    errors.append((line, jp, ", ".join(msgs)))
+    return {"schema": schema, "rows": rows, "errors": errors, "n_errors": n_errors, "pos_counts": dict(pos_counts)}
+
+def replace_deck_file(path: Path, data: bytes) -> Path:
+    """같은 폴더 임시 파일 → os.replace (읽는 쪽은 항상 옛 파일 또는 새 파일 전체만 봄). 이전 파일은 .bak"""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.stem}_", suffix=".csv", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+            out.flush()
+            os.fsync(out.fileno())
+        backup = path.with_suffix(path.suffix + ".bak")
+        if path.exists():
+            shutil.copy2(path, backup)
+        os.replace(tmp, path)
+    except Exception:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return backup
+
+def render_deck_upload_admin():
+    st.caption("CSV를 검증한 뒤 덱 파일을 교체합니다. 진행 중인 퀴즈는 그대로, 새 퀴즈부터 새 덱을 씁니다.")
+    deck_id = st.selectbox("덱", list(DECK_SPECS), format_func=lambda d: f"{DECK_SPECS[d]['label']} ({d})",
+                           key="deck_upload_id")
+    up = st.file_uploader("덱 CSV", type=["csv"], key="deck_upload_file")
+    if up is None:
+        return
+    try:
+        report = validate_deck_csv(up)
+    except Exception as e:
+        st.error(f"CSV를 읽을 수 없습니다: {e}")
+        return
+
+    st.write({"schema": report["schema"], "rows": report["rows"], "pos": report["pos_counts"]})
+    if report["n_errors"]:
+        st.error(f"오류 {report['n_errors']}행 — 고친 뒤 다시 올려 주세요.")
+        st.dataframe(pd.DataFrame(report["errors"], columns=["줄", "jp_word", "오류"]),
+                     use_container_width=True, hide_index=True)
+        return
+    if report["rows"] < N:
+        st.error(f"단어가 부족합니다: {report['rows']}개 (최소 {N}개)")
+        return
 
-    return [make_question(retry_df.iloc[i], qtype, pool) for i in range(len(retry_df))]
+    if not st.button("📤 이 덱으로 교체", key="btn_deck_upload", use_container_width=True):
+        return
+    path = DECK_SPECS[deck_id]["path"]
+    try:
+        backup = replace_deck_file(path, up.getvalue())
+        deck_content_hash(str(path), force=True)
+        deck = current_deck(str(path))
+    except Exception as e:
+        st.error("덱 교체 실패")
+        st.write(str(e))
+        return
+    st.success(f"교체 완료: version {deck['version']} · {len(deck['pool'])}단어 (이전 파일: {backup.name})")
+    st.caption(f"다시 계산한 pos: {', '.join(deck['index'].get('rebuilt_pos') or []) or '없음'}")
 
 # ============================================================
 # ✅ Admin/My pages
@@ -2079,16 +5675,62 @@ def render_admin_dashboard():
         st.warning("세션 토큰이 없습니다. 다시 로그인해 주세요.")
         return
 
+    with st.expander("🔥 서버 워밍업 상태", expanded=False):
+        render_warmup_status()
+
+    with st.expander("📮 제출 저널 (로컬 → Supabase 재전송)", expanded=False):
+        js = journal_status()
+        st.write({k: js[k] for k in ("pending", "oldest_age_s", "sent_total", "attempt_id_supported", "word_results_dedupe", "unconfirmed_total")})
+        if js["last_error"]:
+            st.caption(f"마지막 오류: {js['last_error']}")
+        if st.button("📤 지금 재전송", use_container_width=True, key="btn_admin_journal_drain"):
+            get_journal()["wake"].set()  # 드레이너 스레드가 보냄 (여기서 직접 보내면 같은 배치를 두 번 보낼 수 있음)
+            st.success("재전송을 요청했습니다. 잠시 후 다시 열어 확인하세요.")
+
+    with st.expander("📈 메트릭 (Prometheus)", expanded=False):
+        st.caption("HOTENA_METRICS_PORT / HOTENA_METRICS_FILE 로 외부 수집 가능")
+        st.code(render_prometheus_text(), language="text")
+
+    with st.expander("🧠 세션 메모리", expanded=False):
+        render_session_memory_admin()
+
+    with st.expander("🖨️ 학습지 일괄 생성", expanded=False):
+        render_worksheet_admin()
+
+    with st.expander("🏫 반 과제", expanded=False):
+        render_classroom_admin()
+
+    with st.expander("📥 덱 업로드", expanded=False):
+        render_deck_upload_admin()
+
+    with st.expander("📉 단어 난이도 분석", expanded=False):
+        render_word_stats_admin()
+
+    with st.expander("🧪 rerun 프로파일링", expanded=False):
+        u_admin = st.session_state.get("user")
+        render_profile_admin(getattr(u_admin, "id", None) if u_admin else None)
+
+    with st.expander("🧩 헷갈린 보기(혼동 행렬)", expanded=False):
+        cidx = get_confusion_index()
+        st.caption(f"집계된 (유형, 정답) 쌍: {len(cidx['counts'])}개 · 제출할 때마다 자동 반영")
+        if st.button("🔄 quiz_attempts 전체로 재계산", use_container_width=True, key="btn_admin_rebuild_confusion"):
+            try:
+                n_rows = rebuild_confusion_index(sb_authed_local)
+                st.success(f"재계산 완료: attempt {n_rows}건")
+            except Exception as e:
+                st.error("재계산 실패")
+                st.write(str(e))
+
     st.caption("※ 확장 가능: 전체 기록 조회 등")
     if st.button("최근 전체 기록 100개 보기", use_container_width=True, key="btn_admin_fetch100"):
         try:
-            res = run_db(lambda: fetch_all_attempts_admin(sb_authed_local, limit=100))
+            res = run_db(lambda: fetch_all_attempts_admin(sb_authed_local, limit=100), name="fetch_all_attempts_admin", hedge=True)
             if not res.data:
                 st.info("기록이 없습니다.")
             else:
                 df = pd.DataFrame(res.data)
                 df["created_at"] = to_kst_naive(df["created_at"])
-                df["품사"] = df["level"].map(lambda x: POS_LABEL_MAP.get(str(x), str(x)))
+                df["품사"] = df["level"].map(lambda x: ATTEMPT_LEVEL_LABEL_MAP.get(str(x), str(x)))
                 df["유형"] = df["pos_mode"].map(lambda x: quiz_label_map.get(str(x), str(x)))
                 st.dataframe(df, use_container_width=True, hide_index=True)
         except Exception as e:
@@ -2128,7 +5770,9 @@ def render_my_dashboard():
                 st.stop()
 
             try:
-                run_db(lambda: delete_all_learning_records(sb_authed_local, user_id_local))
+                reset_at = mark_word_sets_reset()  # 세션 쪽 기록은 스크립트 스레드에서 (다음 세트 저장에 실림)
+                run_db(lambda: delete_all_learning_records(sb_authed_local, user_id_local, reset_at), name="delete_all_learning_records")
+                attempt_cache_invalidate(user_id_local)
 
                 clear_question_widget_keys()
                 for k in [
@@ -2139,7 +5783,7 @@ def render_my_dashboard():
                     "quiz_version",
                     "mastered_words", "mastery_banner_shown", "mastery_done",
                     "progress_restored", "pool_ready",
-                    "excluded_wrong_words",
+                    "excluded_wrong_words", "srs",
                 ]:
                     st.session_state.pop(k, None)
 
@@ -2151,20 +5795,23 @@ def render_my_dashboard():
                 st.error("초기화 실패: RLS 정책(삭제 권한) 또는 테이블/컬럼 확인이 필요합니다.")
                 st.exception(e)
 
+    with st.expander("📦 전체 학습 기록 내보내기", expanded=False):
+        render_history_export(sb_authed_local, user_id_local)
+
     try:
-        res = run_db(lambda: fetch_recent_attempts(sb_authed_local, user_id_local, limit=50))
+        recent_rows = cached_latest_attempts(sb_authed_local, user_id_local, 50)
     except Exception as e:
         st.info("기록을 불러오지 못했습니다.")
         st.write(str(e))
         return
 
-    if not res.data:
+    if not recent_rows:
         st.info("아직 저장된 기록이 없습니다. 문제를 풀고 제출하면 기록이 쌓여요.")
         return
 
-    hist = pd.DataFrame(res.data).copy()
+    hist = pd.DataFrame(recent_rows).copy()
     hist["created_at"] = to_kst_naive(hist["created_at"])
-    hist["품사"] = hist["level"].map(lambda x: POS_LABEL_MAP.get(str(x), str(x)))
+    hist["품사"] = hist["level"].map(lambda x: ATTEMPT_LEVEL_LABEL_MAP.get(str(x), str(x)))
     hist["유형"] = hist["pos_mode"].map(lambda x: quiz_label_map.get(str(x), str(x)))
     hist["정답률"] = (hist["score"] / hist["quiz_len"]).fillna(0.0)
 
@@ -2238,7 +5885,7 @@ def render_my_dashboard():
     st.markdown("### ❌ 자주 틀린 단어 TOP10 (최근 50회)")
 
     counter = Counter()
-    for row in (res.data or []):
+    for row in (recent_rows or []):
         wl = row.get("wrong_list") or []
         if isinstance(wl, list):
             for w in wl:
@@ -2429,6 +6076,12 @@ def render_home():
         st.button("🚪 로그아웃", use_container_width=True,
                   key="btn_home_logout", on_click=nav_logout)
 
+    st.button("🏆 오늘의 챌린지", use_container_width=True,
+              key="btn_home_challenge", on_click=nav_to, args=("challenge",))
+
+    with st.expander("🏫 과제 코드로 풀기", expanded=False):
+        render_assignment_join()
+
 
 # ============================================================
 # ✅ 오늘의 학습 리포트 (DB only / quiz_attempts 기반)
@@ -2462,21 +6115,160 @@ def _parse_dt_any(x) -> datetime | None:
         dt = dt.replace(tzinfo=timezone.utc)
     return dt
 
-def fetch_attempts_between(supabase, user_id: str, start_utc: datetime, end_utc: datetime) -> list[dict]:
-    """기간 내 attempts 가져오기 (created_at은 보통 UTC timestamptz)."""
-    try:
-        res = (
-            supabase.table("quiz_attempts")
-            .select("created_at, quiz_len, score, wrong_count, pos_mode")
+# ============================================================
+# ✅ 학습 기록 조회 캐시 (유저별 read-through, TTL + 용량 제한)
+#   - 조회 모양(shape)별로 저장: ("since", 시작시각) = 그 시각 이후 전부 / ("latest", N) = 최근 N개
+#   - 요청 범위를 덮는 항목이 있으면 DB 없이 잘라서 응답
+#     (홈 리포트 60일 → 오늘 리포트 · 오늘 푼 문항 수 / 마이페이지 최근 50개 → 범위가 겹치면 공유)
+#   - 제출/초기화/저널 전송 때 그 유저 항목 전부 무효화
+#   - DB 실패 시: TTL이 지났어도 DB_STALE_MAX_AGE_S 안의 항목이면 그걸로 응답
+# ============================================================
+ATTEMPT_CACHE_TTL_S = 120.0
+ATTEMPT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+ATTEMPT_WINDOW_COLS = ("created_at", "quiz_len", "score", "wrong_count", "pos_mode")
+ATTEMPT_RECENT_COLS = ("created_at", "level", "pos_mode", "quiz_len", "score", "wrong_count", "wrong_list")
+
+@st.cache_resource(show_spinner=False)
+def get_attempt_cache() -> dict:
+    from collections import OrderedDict
+
+    return {"lock": threading.Lock(), "users": OrderedDict(), "bytes": 0}
+
+def attempt_cache_invalidate(user_id: str | None):
+    if not user_id:
+        return
+    cache = get_attempt_cache()
+    with cache["lock"]:
+        entries = cache["users"].pop(str(user_id), None) or []
+        cache["bytes"] -= sum(e["nbytes"] for e in entries)
+
+def _attempt_cache_put(user_id: str, entry: dict):
+    cache = get_attempt_cache()
+    uid = str(user_id)
+    with cache["lock"]:
+        old = cache["users"].pop(uid, [])
+        cache["bytes"] -= sum(e["nbytes"] for e in old)
+        entries = [e for e in old if e["shape"] != entry["shape"]] + [entry]
+        cache["users"][uid] = entries
+        cache["bytes"] += sum(e["nbytes"] for e in entries)
+        while cache["bytes"] > ATTEMPT_CACHE_MAX_BYTES and len(cache["users"]) > 1:
+            _, dropped = cache["users"].popitem(last=False)
+            cache["bytes"] -= sum(e["nbytes"] for e in dropped)
+
+def _attempt_cache_entries(user_id: str, cols: tuple, max_age_s: float) -> list[dict]:
+    cache = get_attempt_cache()
+    uid = str(user_id)
+    now = time.time()
+    need = set(cols)
+    with cache["lock"]:
+        entries = cache["users"].get(uid)
+        if not entries:
+            return []
+        cache["users"].move_to_end(uid)
+        return [e for e in entries if now - e["ts"] <= max_age_s and need <= e["cols"]]
+
+def _attempt_entry(shape: tuple, cols: tuple, rows: list[dict], since: datetime | None, limit: int | None) -> dict:
+    rows = sorted(rows, key=lambda r: _parse_dt_any(r.get("created_at")) or datetime.min.replace(tzinfo=timezone.utc))
+    ts = [_parse_dt_any(r.get("created_at")) or datetime.min.replace(tzinfo=timezone.utc) for r in rows]
+    return {
+        "shape": shape,
+        "cols": frozenset(cols),
+        "since": since,
+        "limit": limit,
+        "rows": rows,            # created_at 오름차순
+        "row_ts": ts,
+        "ts": time.time(),
+        "nbytes": len(json.dumps(rows, ensure_ascii=False, default=str)) + 64 * len(rows),
+    }
+
+def _slice_since(entry: dict, since_utc: datetime) -> list[dict] | None:
+    """entry가 [since_utc, 지금)을 전부 담고 있으면 그 부분, 아니면 None."""
+    rows, ts = entry["rows"], entry["row_ts"]
+    if entry["since"] is not None:
+        covers = entry["since"] <= since_utc
+    else:  # latest N: 잘리지 않았거나(전체 기록) 가장 오래된 행이 요청 시작보다 앞
+        covers = len(rows) < entry["limit"] or (bool(ts) and ts[0] < since_utc)
+    if not covers:
+        return None
+    return rows[bisect.bisect_left(ts, since_utc):]
+
+def _slice_latest(entry: dict, n: int) -> list[dict] | None:
+    rows = entry["rows"]
+    if entry["limit"] is not None and entry["limit"] >= n:
+        return rows[-n:] if n else []
+    if entry["since"] is not None and len(rows) >= n:
+        return rows[-n:] if n else []
+    if entry["limit"] is not None and len(rows) < entry["limit"]:
+        return list(rows)  # 전체 기록이 n보다 적음
+    return None
+
+def cached_attempts_since(sb_authed, user_id: str, since_utc: datetime, cols: tuple = ATTEMPT_WINDOW_COLS) -> list[dict]:
+    """since_utc 이후 attempts (created_at 오름차순)."""
+    for e in _attempt_cache_entries(user_id, cols, ATTEMPT_CACHE_TTL_S):
+        hit = _slice_since(e, since_utc)
+        if hit is not None:
+            cache_event("attempts", True)
+            return hit
+    cache_event("attempts", False)
+
+    since_iso = since_utc.isoformat()
+    def _fetch():
+        return (
+            sb_authed.table("quiz_attempts")
+            .select(", ".join(cols))
             .eq("user_id", user_id)
-            .gte("created_at", start_utc.isoformat())
-            .lt("created_at", end_utc.isoformat())
+            .gte("created_at", since_iso)
             .order("created_at", desc=False)
             .execute()
+        ).data or []
+
+    shape = ("since", since_iso)
+    try:
+        rows = run_db(_fetch, name="quiz_attempts.since", hedge=True, key=("attempts", str(user_id)) + shape + (cols,))
+    except Exception:
+        for e in _attempt_cache_entries(user_id, cols, DB_STALE_MAX_AGE_S):
+            hit = _slice_since(e, since_utc)
+            if hit is not None:
+                metric_inc("hotena_db_stale_fallback_total", {"name": "quiz_attempts.since"})
+                return hit
+        raise
+    entry = _attempt_entry(shape, cols, rows, since_utc, None)
+    _attempt_cache_put(user_id, entry)
+    return entry["rows"]
+
+def cached_latest_attempts(sb_authed, user_id: str, n: int, cols: tuple = ATTEMPT_RECENT_COLS) -> list[dict]:
+    """최근 n개 attempts (created_at 내림차순, fetch_recent_attempts와 같은 모양)."""
+    for e in _attempt_cache_entries(user_id, cols, ATTEMPT_CACHE_TTL_S):
+        hit = _slice_latest(e, n)
+        if hit is not None:
+            cache_event("attempts", True)
+            return hit[::-1]
+    cache_event("attempts", False)
+
+    shape = ("latest", int(n))
+    try:
+        rows = run_db(
+            lambda: fetch_recent_attempts(sb_authed, user_id, limit=n).data or [],
+            name="fetch_recent_attempts", hedge=True, key=("attempts", str(user_id)) + shape + (cols,),
         )
-        return res.data or []
+    except Exception:
+        for e in _attempt_cache_entries(user_id, cols, DB_STALE_MAX_AGE_S):
+            hit = _slice_latest(e, n)
+            if hit is not None:
+                metric_inc("hotena_db_stale_fallback_total", {"name": "fetch_recent_attempts"})
+                return hit[::-1]
+        raise
+    entry = _attempt_entry(shape, cols, rows, None, int(n))
+    _attempt_cache_put(user_id, entry)
+    return entry["rows"][::-1]
+
+def fetch_attempts_between(supabase, user_id: str, start_utc: datetime, end_utc: datetime) -> list[dict]:
+    """기간 내 attempts 가져오기 (created_at은 보통 UTC timestamptz). 학습 기록 캐시 경유, 실패 시 []."""
+    try:
+        rows = cached_attempts_since(supabase, user_id, start_utc)
     except Exception:
         return []
+    return [r for r in rows if (_parse_dt_any(r.get("created_at")) or end_utc) < end_utc]
 
 def _kst_day_key(dt_utc: datetime) -> str:
     """UTC dt -> KST 날짜키(YYYY-MM-DD)."""
@@ -2555,12 +6347,12 @@ def render_today_report_db_only(sb_authed, user_id: str):
         start_utc = start_kst.astimezone(timezone.utc)
         end_utc = end_kst.astimezone(timezone.utc)
 
-        today_rows = fetch_attempts_between(sb_authed, user_id, start_utc, end_utc)
-
-        # streak 계산용 최근 60일
+        # streak 계산용 최근 60일 (먼저 조회 → 오늘 범위는 캐시에서 잘라 씀)
         recent_start_utc = (start_kst - timedelta(days=60)).astimezone(timezone.utc)
         recent_rows = fetch_attempts_between(sb_authed, user_id, recent_start_utc, end_utc)
 
+        today_rows = fetch_attempts_between(sb_authed, user_id, start_utc, end_utc)
+
         rep = build_today_report_from_rows(today_rows, recent_rows)
 
         is_pro_user = is_pro()
@@ -2632,8 +6424,574 @@ def render_today_report_db_only(sb_authed, user_id: str):
         # 리포트가 실패해도 앱이 멈추면 안 됨
         st.caption("오늘 리포트를 불러오지 못했어요.")
 # ============================================================
-# ✅ App Start: refresh → login → routing
+# ✅ 오늘의 챌린지 (KST 하루 1세트, 모든 학습자 같은 문제)
+#   - 문제: 그날 처음 만들 때 (날짜, 덱 버전)으로 seed → 뽑은 word_id·유형·seed를 SQLite에 고정
+#     (하루 중간에 덱이 바뀌어도 같은 단어 = 같은 순위표. 문항은 덱 버전별로 1번 만들어 모든 세션이 공유)
+#   - 시작 시각: (날짜, 유저)별 첫 시작만 기록 → 다시 시작해도 elapsed_ms가 줄지 않음
+#   - 순위: 하루 첫 제출만 반영. 제출 때 top-k(정렬 리스트)·점수 분포만 갱신 (quiz_attempts 재조회 X)
+#   - 재시작 대비로 점수는 로컬 SQLite에도 1줄씩 (프로세스 시작 때 오늘/어제분만 다시 읽음)
+# ============================================================
+CHALLENGE_PATH = Path(os.environ.get("HOTENA_CHALLENGE_PATH", "") or (BASE_DIR / "data" / "challenge.sqlite3"))
+CHALLENGE_TOP_K = 50
+CHALLENGE_KEEP_DAYS = 2
+CHALLENGE_QTYPES = ("meaning", "kr2jp", "reading")  # 날짜마다 돌아가며
+
+def kst_today() -> str:
+    return datetime.now(KST).strftime("%Y-%m-%d")
+
+def _challenge_connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=10.0, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS challenge_scores (
+            day          TEXT NOT NULL,
+            user_id      TEXT NOT NULL,
+            name         TEXT NOT NULL,
+            score        INTEGER NOT NULL,
+            total        INTEGER NOT NULL,
+            elapsed_ms   INTEGER NOT NULL,
+            submitted_at REAL NOT NULL,
+            PRIMARY KEY (day, user_id)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS challenge_days (
+            day          TEXT PRIMARY KEY,
+            deck_version TEXT NOT NULL,   -- 그날 처음 본 덱 버전
+            qtype        TEXT NOT NULL,
+            seed         INTEGER NOT NULL,
+            word_ids     TEXT NOT NULL    -- JSON
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS challenge_starts (
+            day        TEXT NOT NULL,
+            user_id    TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            PRIMARY KEY (day, user_id)
+        )
+        """
+    )
+    return conn
+
+def _new_board(total: int = N) -> dict:
+    return {
+        "top": [],            # (-score, elapsed_ms, submitted_at, user_id, name) 오름차순, 최대 TOP_K
+        "users": {},          # user_id -> 같은 튜플 (첫 제출)
+        "hist": Counter(),    # score -> 인원
+        "total": int(total),
+        "version": 0,
+    }
+
+def _board_add(board: dict, entry: tuple) -> bool:
+    """첫 제출만. top-k는 bisect로 끼워 넣고 넘치면 꼬리만 자름."""
+    uid = entry[3]
+    if uid in board["users"]:
+        return False
+    board["users"][uid] = entry
+    board["hist"][-entry[0]] += 1
+    top = board["top"]
+    if len(top) < CHALLENGE_TOP_K or entry < top[-1]:
+        bisect.insort(top, entry)
+        del top[CHALLENGE_TOP_K:]
+    board["version"] += 1
+    return True
+
+@st.cache_resource(show_spinner=False)
+def get_challenge_store() -> dict:
+    conn = _challenge_connect(CHALLENGE_PATH)
+    since = (datetime.now(KST) - timedelta(days=CHALLENGE_KEEP_DAYS - 1)).strftime("%Y-%m-%d")
+    boards: dict[str, dict] = {}
+    for day, uid, name, score, total, elapsed, ts in conn.execute(
+        "SELECT day, user_id, name, score, total, elapsed_ms, submitted_at FROM challenge_scores WHERE day >= ?",
+        (since,),
+    ):
+        board = boards.setdefault(day, _new_board(total))
+        _board_add(board, (-int(score), int(elapsed), float(ts), uid, name))
+    plans = {
+        day: {"deck_version": ver, "qtype": qtype, "seed": int(seed), "word_ids": json.loads(wids)}
+        for day, ver, qtype, seed, wids in conn.execute(
+            "SELECT day, deck_version, qtype, seed, word_ids FROM challenge_days WHERE day >= ?", (since,)
+        )
+    }
+    starts = {
+        (day, uid): float(ts)
+        for day, uid, ts in conn.execute("SELECT day, user_id, started_at FROM challenge_starts WHERE day >= ?", (since,))
+    }
+    return {
+        "lock": threading.Lock(),
+        "conn": conn,
+        "plans": plans,   # day -> {"deck_version", "qtype", "seed", "word_ids"} (그날 고정)
+        "starts": starts, # (day, user_id) -> 첫 시작 시각
+        "quizzes": {},    # (day, deck_version) -> (qtype, [QuizQuestion])
+        "boards": boards,
+    }
+
+def _challenge_plan(day: str, deck: dict) -> dict:
+    """그날 고정된 문제 목록. 없으면 지금 덱으로 뽑아서 고정 (동시에 만들면 먼저 쓴 쪽이 이김)."""
+    store = get_challenge_store()
+    with store["lock"]:
+        plan = store["plans"].get(day)
+    if plan is not None:
+        return plan
+
+    seed = int(hashlib.sha256(f"{day}:{deck['version']}".encode()).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    qtype = CHALLENGE_QTYPES[datetime.strptime(day, "%Y-%m-%d").toordinal() % len(CHALLENGE_QTYPES)]
+    groups = [g for g in POS_GROUP_OPTIONS if not (qtype == "reading" and g in POS_ONLY_2TYPES)]
+    pos_filters = [p for g in groups for p in pos_group_filters(g)]
+    rows, _ = deck_candidate_rows(deck["index"], pos_filters, kanji_only=(qtype == "reading"))
+    picked = rng.sample(rows, min(N + 5, len(rows)))  # 몇 개 건너뛰어도 N문항 되게 여유분
+    picked = [r for r, _ in seeded_questions(deck["pool"], deck["index"], picked, qtype, seed)][:N]
+    plan = {
+        "deck_version": deck["version"], "qtype": qtype, "seed": seed,
+        "word_ids": [int(deck["pool"].at[r, "word_id"]) for r in picked],
+    }
+    with store["lock"]:
+        if day in store["plans"]:
+            return store["plans"][day]
+        store["plans"] = {d: p for d, p in store["plans"].items() if d >= day}  # 지난 날짜 정리
+        store["plans"][day] = plan
+        try:
+            store["conn"].execute(
+                "INSERT OR IGNORE INTO challenge_days(day, deck_version, qtype, seed, word_ids) VALUES (?, ?, ?, ?, ?)",
+                (day, plan["deck_version"], qtype, seed, json.dumps(plan["word_ids"])),
+            )
+        except Exception:
+            pass  # 로컬 기록 실패해도 이 프로세스 안에서는 고정
+    return plan
+
+def challenge_start_time(day: str, user_id: str) -> float:
+    """(날짜, 유저)의 첫 시작 시각. 처음이면 지금을 기록."""
+    store = get_challenge_store()
+    key = (day, str(user_id))
+    with store["lock"]:
+        ts = store["starts"].get(key)
+        if ts is not None:
+            return ts
+        ts = store["starts"][key] = time.time()
+        try:
+            store["conn"].execute(
+                "INSERT OR IGNORE INTO challenge_starts(day, user_id, started_at) VALUES (?, ?, ?)", (day, key[1], ts)
+            )
+        except Exception:
+            pass
+    return ts
+
+def challenge_quiz(day: str) -> tuple[str, list]:
+    """그날의 문제 (공유 객체: 세션에는 리스트만 복사해서 넣을 것)."""
+    deck = current_deck(str(DECK_SPECS[DEFAULT_DECK_ID]["path"]))
+    key = (day, deck["version"])
+    store = get_challenge_store()
+    with store["lock"]:
+        hit = store["quizzes"].get(key)
+    cache_event("challenge_quiz", hit is not None)
+    if hit is not None:
+        return hit
+
+    plan = _challenge_plan(day, deck)
+    id_to_row = deck["id_to_row"]
+    rows = [id_to_row[w] for w in plan["word_ids"] if w in id_to_row]  # 덱이 바뀌어 없어진 단어는 빠짐
+    quiz = [q for _, q in seeded_questions(deck["pool"], deck["index"], rows, plan["qtype"], plan["seed"])]
+    hit = (plan["qtype"], quiz)
+    with store["lock"]:
+        # 지난 날짜·이전 덱 버전 정리
+        store["quizzes"] = {k: v for k, v in store["quizzes"].items() if k[0] > day or k == key}
+        store["starts"] = {k: v for k, v in store["starts"].items() if k[0] >= day}
+        hit = store["quizzes"].setdefault(key, hit)
+    return hit
+
+def challenge_board(day: str) -> dict:
+    store = get_challenge_store()
+    with store["lock"]:
+        board = store["boards"].get(day)
+        if board is None:
+            board = store["boards"][day] = _new_board()
+            for old in sorted(store["boards"])[:-CHALLENGE_KEEP_DAYS]:
+                store["boards"].pop(old, None)
+        return board
+
+def challenge_display_name(email: str | None) -> str:
+    local = str(email or "").split("@", 1)[0]
+    return (local[:2] + "***") if local else "익명"
+
+def challenge_record(day: str, user_id: str, email: str | None, score: int, total: int, elapsed_ms: int) -> dict:
+    """제출 1번 → 보드 갱신(첫 제출만) + SQLite 1줄. 반환: 내 순위 정보."""
+    board = challenge_board(day)
+    store = get_challenge_store()
+    entry = (-int(score), int(elapsed_ms), time.time(), str(user_id), challenge_display_name(email))
+    with store["lock"]:
+        added = _board_add(board, entry)
+        if added:
+            board["total"] = int(total)
+            try:
+                store["conn"].execute(
+                    "INSERT OR IGNORE INTO challenge_scores(day, user_id, name, score, total, elapsed_ms, submitted_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (day, entry[3], entry[4], int(score), int(total), int(elapsed_ms), entry[2]),
+                )
+            except Exception:
+                pass  # 로컬 기록 실패해도 메모리 보드는 유지
+    info = challenge_my_rank(day, user_id)
+    info["counted"] = added
+    return info
+
+def challenge_my_rank(day: str, user_id: str) -> dict:
+    """점수 분포로 계산 (같은 점수는 같은 등수). O(점수 종류 수)."""
+    board = challenge_board(day)
+    store = get_challenge_store()
+    with store["lock"]:
+        mine = board["users"].get(str(user_id))
+        players = len(board["users"])
+        if mine is None:
+            return {"rank": None, "players": players}
+        better = sum(n for s, n in board["hist"].items() if s > -mine[0])
+    return {"rank": better + 1, "players": players, "score": -mine[0], "elapsed_ms": mine[1]}
+
+def challenge_top(day: str) -> tuple[int, list[tuple], int]:
+    """(version, top-k 복사본, 총 참가자) — 화면은 이 스냅샷만 읽음."""
+    board = challenge_board(day)
+    store = get_challenge_store()
+    with store["lock"]:
+        return board["version"], list(board["top"]), len(board["users"])
+
+def start_challenge():
+    day = kst_today()
+    qtype, quiz = challenge_quiz(day)
+    if not quiz:
+        st.warning("오늘의 챌린지를 만들지 못했어요.")
+        return
+    clear_question_widget_keys()
+    st.session_state["_counted_today"] = False
+    start_quiz_state(list(quiz), qtype, clear_wrongs=True)
+    uid = getattr(st.session_state.get("user"), "id", None)
+    st.session_state["challenge"] = {
+        "day": day,
+        "quiz_version": st.session_state.quiz_version,
+        "started_at": challenge_start_time(day, uid) if uid else time.time(),  # 다시 시작해도 그날 첫 시작 기준
+    }
+    st.session_state.page = "quiz"
+    st.session_state["_scroll_top_once"] = True
+
+def active_challenge() -> dict | None:
+    """지금 풀고 있는 퀴즈가 챌린지면 그 정보 (다른 퀴즈로 바꾸면 자동으로 무효)."""
+    ch = st.session_state.get("challenge")
+    if isinstance(ch, dict) and ch.get("quiz_version") == st.session_state.get("quiz_version"):
+        return ch
+    return None
+
+def render_challenge_page():
+    day = kst_today()
+    st.markdown(f"## 🏆 오늘의 챌린지 ({day})")
+    qtype, quiz = challenge_quiz(day)
+    st.caption(f"모든 학습자가 같은 {len(quiz)}문항({quiz_label_map.get(qtype, qtype)})을 풉니다. 하루 첫 제출만 순위에 반영돼요.")
+
+    u = st.session_state.get("user")
+    uid = getattr(u, "id", None) if u else None
+    mine = challenge_my_rank(day, uid) if uid else {"rank": None}
+    if mine.get("rank"):
+        st.success(f"내 기록: {mine['score']}점 · {mine['elapsed_ms'] / 1000:.1f}초 · {mine['rank']}위 / {mine['players']}명")
+
+    c1, c2 = st.columns(2)
+    with c1:
+        st.button("▶ 챌린지 시작", type="primary", use_container_width=True,
+                  key="btn_challenge_start", on_click=start_challenge, disabled=not quiz)
+    with c2:
+        st.button("🏠 홈", use_container_width=True, key="btn_challenge_home", on_click=nav_to, args=("home",))
+
+    _, top, players = challenge_top(day)
+    st.markdown(f"### 순위 (참가 {players}명)")
+    if not top:
+        st.caption("아직 참가자가 없어요. 첫 번째로 도전해 보세요!")
+        return
+    ranks, prev, rank = [], None, 0
+    for i, e in enumerate(top, start=1):
+        if e[0] != prev:
+            rank, prev = i, e[0]
+        ranks.append({"순위": rank, "이름": e[4], "점수": -e[0], "시간(초)": round(e[1] / 1000, 1)})
+    st.dataframe(pd.DataFrame(ranks), hide_index=True, use_container_width=True)
+
+# ============================================================
+# ✅ 반 과제 (선생님이 문제 세트를 얼려 두고 코드로 공유)
+#   - 저장은 (word_id 목록, seed, 유형)만 1번 → 문제는 코드별로 프로세스에서 1번만 만들어 공유
+#   - 결과: 학생별 첫 제출만. 제출 때 점수 분포 / 문항별 정답 수를 누적 (quiz_attempts 스캔 X)
+#   - 로컬 SQLite에 과제 + 학생별 채점 결과(bytes) → 재시작 때 누적값 다시 계산
+# ============================================================
+CLASSROOM_PATH = Path(os.environ.get("HOTENA_CLASSROOM_PATH", "") or (BASE_DIR / "data" / "classroom.sqlite3"))
+ASSIGNMENT_CODE_LEN = 6
+ASSIGNMENT_MAX_QUESTIONS = 50
+
+def _classroom_connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=10.0, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS assignments (
+            code       TEXT PRIMARY KEY,
+            title      TEXT NOT NULL,
+            owner_id   TEXT NOT NULL,
+            deck_id    TEXT NOT NULL,
+            qtype      TEXT NOT NULL,
+            seed       INTEGER NOT NULL,
+            word_ids   TEXT NOT NULL,   -- JSON [int]
+            created_at REAL NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS assignment_results (
+            code         TEXT NOT NULL,
+            user_id      TEXT NOT NULL,
+            name         TEXT NOT NULL,
+            graded       BLOB NOT NULL,  -- 문항별 1/0 (grade_answers)
+            submitted_at REAL NOT NULL,
+            word_ids     TEXT,           -- JSON [int]: 이 학생이 푼 문항 순서 (graded와 같은 길이)
+            PRIMARY KEY (code, user_id)
+        )
+        """
+    )
+    if "word_ids" not in {r[1] for r in conn.execute("PRAGMA table_info(assignment_results)")}:
+        conn.execute("ALTER TABLE assignment_results ADD COLUMN word_ids TEXT")
+    return conn
+
+def _new_assignment_stats() -> dict:
+    # 문항별 집계는 word_id 기준: 덱이 바뀌어 빠진 단어가 있으면 학생마다 문항 위치가 달라짐
+    return {
+        "users": {},                     # user_id -> (name, score, submitted_at)
+        "hist": Counter(),               # score -> 인원
+        "asked": Counter(),              # word_id -> 푼 인원
+        "correct": Counter(),            # word_id -> 정답 인원
+    }
+
+def _assignment_stats_add(stats: dict, user_id: str, name: str, graded: bytes, word_ids: list[int], ts: float) -> bool:
+    if user_id in stats["users"]:
+        return False
+    score = sum(graded)
+    stats["users"][user_id] = (name, score, ts)
+    stats["hist"][score] += 1
+    for wid, ok in zip(word_ids, graded):
+        stats["asked"][wid] += 1
+        stats["correct"][wid] += ok
+    return True
+
+@st.cache_resource(show_spinner=False)
+def get_classroom_store() -> dict:
+    conn = _classroom_connect(CLASSROOM_PATH)
+    assignments, stats = {}, {}
+    for code, title, owner, deck_id, qtype, seed, word_ids, created in conn.execute(
+        "SELECT code, title, owner_id, deck_id, qtype, seed, word_ids, created_at FROM assignments"
+    ):
+        ids = json.loads(word_ids)
+        assignments[code] = {
+            "code": code, "title": title, "owner_id": owner, "deck_id": deck_id,
+            "qtype": qtype, "seed": int(seed), "word_ids": ids, "created_at": created,
+        }
+        stats[code] = _new_assignment_stats()
+    for code, uid, name, graded, ts, word_ids in conn.execute(
+        "SELECT code, user_id, name, graded, submitted_at, word_ids FROM assignment_results ORDER BY submitted_at"
+    ):
+        if code in stats:
+            # word_ids가 없는 예전 행: 얼린 목록 순서 그대로 풀었다고 봄
+            ids = json.loads(word_ids) if word_ids else assignments[code]["word_ids"]
+            _assignment_stats_add(stats[code], uid, name, bytes(graded), ids, ts)
+    return {
+        "lock": threading.Lock(),
+        "conn": conn,
+        "assignments": assignments,   # code -> 얼린 스펙
+        "quizzes": {},                # (code, deck_version) -> [QuizQuestion]
+        "stats": stats,               # code -> 누적 결과
+    }
+
+def normalize_assignment_code(code: str) -> str:
+    return _nfkc_str(code).upper().replace(" ", "")
+
+def create_assignment(owner_id: str, title: str, deck_id: str, pos_group: str, qtype: str, n: int) -> dict:
+    """지금 덱에서 word_id를 뽑아 얼림 (이후 학생들은 이 목록만 씀)."""
+    if pos_group in POS_ONLY_2TYPES and qtype == "reading":
+        qtype = "meaning"
+    deck = current_deck(str(DECK_SPECS[deck_id]["path"]))
+    rows, _ = deck_candidate_rows(deck["index"], pos_group_filters(pos_group), kanji_only=(qtype == "reading"))
+    seed = random.randrange(1 << 31)
+    picked = random.Random(seed).sample(rows, min(int(n), len(rows)))
+    # 오답 후보가 모자란 단어는 여기서 걸러서 학생마다 문항 수가 달라지지 않게
+    picked = [r for r, _ in seeded_questions(deck["pool"], deck["index"], picked, qtype, seed)]
+    word_ids = [int(deck["pool"].at[r, "word_id"]) for r in picked]
+
+    store = get_classroom_store()
+    with store["lock"]:
+        while True:
+            code = uuid.uuid4().hex[:ASSIGNMENT_CODE_LEN].upper()
+            if code not in store["assignments"]:
+                break
+        a = {
+            "code": code, "title": str(title or "").strip() or code, "owner_id": str(owner_id),
+            "deck_id": deck_id, "qtype": qtype, "seed": seed, "word_ids": word_ids, "created_at": time.time(),
+        }
+        store["conn"].execute(
+            "INSERT INTO assignments(code, title, owner_id, deck_id, qtype, seed, word_ids, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (code, a["title"], a["owner_id"], deck_id, qtype, seed, json.dumps(word_ids), a["created_at"]),
+        )
+        store["assignments"][code] = a
+        store["stats"][code] = _new_assignment_stats()
+    return a
+
+def get_assignment(code: str) -> dict | None:
+    store = get_classroom_store()
+    with store["lock"]:
+        return store["assignments"].get(normalize_assignment_code(code))
+
+def assignment_quiz(a: dict) -> list:
+    """코드별 문제 (공유 객체). 덱이 바뀌어 없어진 단어는 빠짐."""
+    deck = current_deck(str(DECK_SPECS.get(a["deck_id"], DECK_SPECS[DEFAULT_DECK_ID])["path"]))
+    key = (a["code"], deck["version"])
+    store = get_classroom_store()
+    with store["lock"]:
+        hit = store["quizzes"].get(key)
+    cache_event("assignment_quiz", hit is not None)
+    if hit is not None:
+        return hit
+    id_to_row = deck["id_to_row"]
+    rows = [id_to_row[w] for w in a["word_ids"] if w in id_to_row]
+    quiz = [q for _, q in seeded_questions(deck["pool"], deck["index"], rows, a["qtype"], a["seed"])]
+    with store["lock"]:
+        # 같은 코드의 이전 덱 버전 문제는 버림 (덱을 올릴 때마다 쌓이지 않게)
+        for k in [k for k in store["quizzes"] if k[0] == key[0] and k != key]:
+            del store["quizzes"][k]
+        return store["quizzes"].setdefault(key, quiz)
+
+def start_assignment(code: str) -> bool:
+    a = get_assignment(code)
+    if a is None:
+        st.warning("과제 코드를 찾지 못했어요.")
+        return False
+    quiz = assignment_quiz(a)
+    if not quiz:
+        st.warning("이 과제의 단어가 지금 단어장에 없어요.")
+        return False
+    clear_question_widget_keys()
+    st.session_state["_counted_today"] = False
+    start_quiz_state(list(quiz), a["qtype"], clear_wrongs=True)
+    st.session_state["assignment"] = {"code": a["code"], "quiz_version": st.session_state.quiz_version}
+    st.session_state.page = "quiz"
+    st.session_state["_scroll_top_once"] = True
+    return True
+
+def active_assignment() -> dict | None:
+    cur = st.session_state.get("assignment")
+    if isinstance(cur, dict) and cur.get("quiz_version") == st.session_state.get("quiz_version"):
+        return cur
+    return None
+
+def assignment_record(code: str, user_id: str, email: str | None, graded: bytes, word_ids: list[int]) -> bool:
+    """학생 첫 제출만 누적 + SQLite 1줄. word_ids = 이 학생 문항의 word_id 순서. 이미 냈으면 False."""
+    store = get_classroom_store()
+    name = challenge_display_name(email)
+    now = time.time()
+    word_ids = [int(w) for w in word_ids]
+    with store["lock"]:
+        stats = store["stats"].get(code)
+        if stats is None or not _assignment_stats_add(stats, str(user_id), name, bytes(graded), word_ids, now):
+            return False
+        try:
+            store["conn"].execute(
+                "INSERT OR IGNORE INTO assignment_results(code, user_id, name, graded, submitted_at, word_ids) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (code, str(user_id), name, bytes(graded), now, json.dumps(word_ids)),
+            )
+        except Exception:
+            pass
+    return True
+
+def assignment_summary(code: str) -> dict:
+    """선생님 화면용 스냅샷 (누적값 복사만, 계산 X)."""
+    store = get_classroom_store()
+    with store["lock"]:
+        stats = store["stats"].get(code) or _new_assignment_stats()
+        return {
+            "students": len(stats["users"]),
+            "hist": dict(stats["hist"]),
+            "asked": dict(stats["asked"]),
+            "correct": dict(stats["correct"]),
+            "users": sorted(stats["users"].values(), key=lambda x: (-x[1], x[2])),
+        }
+
+def render_assignment_join():
+    c1, c2 = st.columns([3, 2])
+    with c1:
+        code = st.text_input("과제 코드", key="assignment_code_in", placeholder="예) 3FA9C1", label_visibility="collapsed")
+    with c2:
+        if st.button("📝 과제 풀기", use_container_width=True, key="btn_assignment_join", disabled=not str(code or "").strip()):
+            if start_assignment(code):
+                st.rerun()
+
+def render_classroom_admin():
+    u = st.session_state.get("user")
+    owner_id = getattr(u, "id", "") if u else ""
+    with st.form("form_assignment_new"):
+        title = st.text_input("과제 이름", key="asg_title")
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            pos_group = st.selectbox("품사", POS_GROUP_OPTIONS, format_func=lambda x: POS_LABEL_MAP.get(x, x), key="asg_pos")
+        with c2:
+            qtype = st.selectbox("유형", QUIZ_TYPES_ADMIN, format_func=lambda x: quiz_label_map.get(x, x), key="asg_qtype")
+        with c3:
+            n = st.number_input("문항 수", 1, ASSIGNMENT_MAX_QUESTIONS, N, key="asg_n")
+        if st.form_submit_button("과제 만들기", use_container_width=True):
+            a = create_assignment(owner_id, title, current_deck_id(), pos_group, qtype, int(n))
+            st.success(f"과제 코드: **{a['code']}** ({len(a['word_ids'])}문항) — 학생들에게 알려 주세요.")
+
+    store = get_classroom_store()
+    with store["lock"]:
+        mine = sorted(
+            (a for a in store["assignments"].values() if a["owner_id"] == owner_id),
+            key=lambda a: -a["created_at"],
+        )
+    if not mine:
+        st.caption("만든 과제가 없어요.")
+        return
+    code = st.selectbox(
+        "결과 보기", [a["code"] for a in mine], key="asg_view",
+        format_func=lambda c: f"{c} · {next(a['title'] for a in mine if a['code'] == c)}",
+    )
+    a = next(a for a in mine if a["code"] == code)
+    summary = assignment_summary(code)
+    n_students = summary["students"]
+    st.caption(f"제출 {n_students}명 · {len(a['word_ids'])}문항 · {quiz_label_map.get(a['qtype'], a['qtype'])}")
+    if not n_students:
+        return
+    st.markdown("**점수 분포**")
+    st.bar_chart(pd.Series(summary["hist"]).sort_index())
+    deck = current_deck(str(DECK_SPECS.get(a["deck_id"], DECK_SPECS[DEFAULT_DECK_ID])["path"]))
+    words = deck["index"]["words"]
+    st.markdown("**문항별 정답률**")
+    st.dataframe(pd.DataFrame([
+        {
+            "No": i + 1,
+            "단어": words[deck["id_to_row"][wid]][0] if wid in deck["id_to_row"] else f"#{wid} (단어장에서 빠짐)",
+            "푼 인원": summary["asked"].get(wid, 0),
+            "정답률(%)": round(100 * summary["correct"].get(wid, 0) / summary["asked"][wid], 1) if summary["asked"].get(wid) else None,
+        }
+        for i, wid in enumerate(a["word_ids"])
+    ]), hide_index=True, use_container_width=True)
+    st.markdown("**학생별**")
+    st.dataframe(pd.DataFrame(
+        [{"이름": name, "점수": score} for name, score, _ in summary["users"]]
+    ), hide_index=True, use_container_width=True)
+
+# ============================================================
+# ✅ App Start: warm-up → refresh → login → routing
 # ============================================================
+start_server_warmup()  # ✅ 프로세스당 1회만 실제 실행(이후 rerun은 캐시 hit)
+
 ok = refresh_session_from_cookie_if_needed(force=False)
 if not ok and (cookies.get("refresh_token") or cookies.get("access_token")):
     clear_auth_everywhere()
@@ -2641,7 +6999,7 @@ if not ok and (cookies.get("refresh_token") or cookies.get("access_token")):
 
 require_login()
 
-ALLOWED_PAGES = {"home", "quiz", "my", "admin"}
+ALLOWED_PAGES = {"home", "quiz", "my", "admin", "challenge"}
 if "page" not in st.session_state:
     st.session_state.page = "home"
 if st.session_state.get("page") not in ALLOWED_PAGES:
@@ -2652,6 +7010,8 @@ user_id = getattr(user, "id", None) if user else None
 user_email = getattr(user, "email", None) if user else None
 user_email = user_email or st.session_state.get("login_email")
 
+begin_rerun(user_id)  # ✅ 메트릭 + (대상일 때만) 프로파일 캡처
+
 sb_authed = get_authed_sb()
 
 # ✅ PRO 캐시가 다른 유저에게 넘어가는 것 방지 (먼저!)
@@ -2686,6 +7046,8 @@ if sb_authed is not None and not st.session_state.get("progress_restored"):
     except Exception:
         pass
     st.session_state.progress_restored = True
+take_stale_word_sets(user_id)
+migrate_hidden_deck(user_id)
 
 # ✅ 복원 후에도 pos_group/available_types 재동기화
 try:
@@ -2720,6 +7082,7 @@ if sb_authed is not None:
 # ============================================================
 if st.session_state.page == "home":
     render_home()
+    end_rerun()
     st.stop()
 
 if st.session_state.page == "admin":
@@ -2728,6 +7091,12 @@ if st.session_state.page == "admin":
         st.warning("관리자 권한이 없습니다.")
         st.rerun()
     render_admin_dashboard()
+    end_rerun()
+    st.stop()
+
+if st.session_state.page == "challenge":
+    render_challenge_page()
+    end_rerun()
     st.stop()
 
 if st.session_state.page == "my":
@@ -2736,6 +7105,7 @@ if st.session_state.page == "my":
     except Exception:
         st.error("마이페이지에서 예외가 발생했습니다. 아래 Traceback을 확인해 주세요.")
         st.code(traceback.format_exc())
+    end_rerun()
     st.stop()
 
 # ============================================================
@@ -2760,17 +7130,12 @@ def get_daily_solved_from_db(sb_authed_local, user_id: str) -> int:
     now = datetime.now(KST)
     start = now.replace(hour=0, minute=0, second=0, microsecond=0)
 
-    # created_at이 timestamptz라면, KST start를 ISO로 넣어도 대부분 정상 필터됩니다.
-    start_iso = start.isoformat()
-
-    res = (
-        sb_authed_local.table("quiz_attempts")
-        .select("quiz_len")
-        .eq("user_id", user_id)
-        .gte("created_at", start_iso)
-        .execute()
-    )
-    rows = res.data or []
+    # ✅ 학습 기록 캐시 경유 (홈 리포트의 60일 조회와 공유)
+    # 장애 때: 캐시에 남은 값 → 없으면 0 (잠금 판단 때문에 퀴즈가 막히지 않게)
+    try:
+        rows = cached_attempts_since(sb_authed_local, user_id, start.astimezone(timezone.utc), cols=("created_at", "quiz_len"))
+    except Exception:
+        return 0
     return int(sum(int(r.get("quiz_len") or 0) for r in rows))
 
 # ✅ 잠금 판단
@@ -2998,6 +7363,21 @@ def on_pick_pos_group(ps: str):
     mark_quiz_as_seen(new_quiz, st.session_state.quiz_type, st.session_state.pos_group)
     st.session_state["_scroll_top_once"] = True
 
+def on_pick_deck():
+    deck_id = st.session_state.get("deck_select")
+    if deck_id not in DECK_SPECS or deck_id == current_deck_id():
+        return
+    st.session_state.deck_id = deck_id
+    ensure_mastered_words_shape()
+    ensure_excluded_wrong_words_shape()
+    ensure_mastery_banner_shape()
+    ensure_seen_words_shape()
+    clear_question_widget_keys()
+    new_quiz = build_quiz(st.session_state.quiz_type, st.session_state.pos_group)
+    start_quiz_state(new_quiz, st.session_state.quiz_type, clear_wrongs=True)
+    mark_quiz_as_seen(new_quiz, st.session_state.quiz_type, st.session_state.pos_group)
+    st.session_state["_scroll_top_once"] = True
+
 def on_pick_qtype(qt: str):
     qt = str(qt).strip()
     if qt == st.session_state.quiz_type:
@@ -3027,6 +7407,21 @@ if st.session_state.get("quiz_type") not in available_types:
 
 st.markdown('<div class="qtypewrap">', unsafe_allow_html=True)
 
+# ✅ 단어장 선택 (덱이 2개 이상일 때만)
+visible_decks = list_visible_decks()
+if len(visible_decks) > 1:
+    deck_now = current_deck_id()
+    if deck_now not in visible_decks:
+        deck_now = visible_decks[0]
+    st.selectbox(
+        "📚 단어장",
+        options=visible_decks,
+        index=visible_decks.index(deck_now),
+        format_func=lambda d: DECK_SPECS[d]["label"],
+        key="deck_select",
+        on_change=on_pick_deck,
+    )
+
 st.markdown('<div class="qtype_hint jp">✨품사를 선택하세요</div>', unsafe_allow_html=True)
 
 # ✅ 품사 그룹 버튼(5개)
@@ -3094,6 +7489,78 @@ with st.expander("📌 필수패턴 (카드로 빠르게 익히기)", expanded=F
         # 무료 체험: 1장만
         render_pattern_cards()
 
+# ============================================================
+# ✅ 단어 검색 → 예문 보기 / 그 단어 1문항 드릴
+# ============================================================
+def session_deck_view() -> tuple[pd.DataFrame, dict]:
+    """읽기 전용 (pool, index): 세션이 고정해 둔 덱 버전, 없으면 덱 캐시. 세션의 덱은 바꾸지 않음."""
+    deck_id = current_deck_id()
+    if (
+        st.session_state.get("pool_ready")
+        and st.session_state.get("_deck_id") == deck_id
+        and isinstance(st.session_state.get("_pool"), pd.DataFrame)
+        and isinstance(st.session_state.get("_pool_index"), dict)
+    ):
+        return st.session_state["_pool"], st.session_state["_pool_index"]
+    deck = current_deck(str(DECK_SPECS[deck_id]["path"]))
+    return deck["pool"], deck["index"]
+
+def start_word_drill(jp: str, pos: str, has_kanji: bool):
+    qtype = st.session_state.get("quiz_type", "meaning")
+    if qtype == "reading" and (pos in POS_ONLY_2TYPES or not has_kanji):
+        qtype = "meaning"  # 히라가나만 있는 단어는 발음 문제 불가
+
+    clear_question_widget_keys()
+    quiz = build_quiz_from_word_keys(
+        word_keys=[jp],
+        qtype=qtype,
+        pos_group=st.session_state.get("pos_group", "noun"),
+        pos_filters=[pos],
+    )
+    if not quiz:
+        return
+    st.session_state["combo_last_notice"] = 0
+    start_quiz_state(quiz, qtype, clear_wrongs=True)
+    st.session_state["_scroll_top_once"] = True
+    st.rerun()
+
+def render_word_search():
+    q = st.text_input(
+        "단어 검색",
+        key="word_search_q",
+        placeholder="예) 勉強 / べんきょう / benkyou / 공부",
+        label_visibility="collapsed",
+    )
+    if not str(q or "").strip():
+        st.caption("일본어·읽기·뜻·로마자 앞부분으로 찾을 수 있어요.")
+        return
+
+    try:
+        pool, index = session_deck_view()  # 진행 중인 퀴즈의 덱 버전은 그대로 (드릴을 시작할 때만 갈아탐)
+    except Exception as e:
+        st.caption(f"단어 데이터를 읽지 못했어요: {e}")
+        return
+    search = deck_search_index(index, pool)
+    rows = search_words(search, q)
+    if not rows:
+        st.caption("찾는 단어가 없어요.")
+        return
+
+    for row in rows:
+        jp, rd, mn, pos, ex_jp, ex_kr = index["words"][row]
+        c1, c2 = st.columns([5, 1])
+        with c1:
+            head = f"**{jp}**" + (f" ({rd})" if rd and rd != jp else "")
+            st.markdown(f"{head} — {mn} · `{pos}`")
+            if ex_jp:
+                st.caption(f"{ex_jp}  \n{ex_kr}")
+        with c2:
+            if st.button("🧪 드릴", key=f"btn_word_drill_{row}", use_container_width=True):
+                start_word_drill(jp, pos, bool(index["has_kanji"].iat[row]))
+
+with st.expander("🔎 단어 검색", expanded=False):
+    render_word_search()
+
 st.markdown('<div class="tight-divider">', unsafe_allow_html=True)
 st.divider()
 st.markdown("</div>", unsafe_allow_html=True)
@@ -3147,6 +7614,9 @@ def reset_mastery_current():
     st.session_state.setdefault("seen_words", {}).setdefault(k, set()).clear()
     st.session_state.setdefault("mastered_words", {}).setdefault(k, set()).clear()
     st.session_state.setdefault("excluded_wrong_words", {}).setdefault(k, set()).clear()
+    st.session_state.setdefault("srs", {}).pop(k, None)
+    mark_word_sets_reset()  # 다른 기기의 예전 세트가 이 초기화를 되돌리지 못하게
+    queue_word_sets_save()
     st.session_state.setdefault("mastery_done", {})[k] = False
     st.session_state.setdefault("mastery_banner_shown", {})[k] = False
 
@@ -3318,19 +7788,17 @@ for idx, q in enumerate(st.session_state.quiz):
     widget_key = f"q_{st.session_state.quiz_version}_{idx}"
 
     prev = st.session_state.answers[idx]
-    default_index = None
-    if prev is not None and prev in q["choices"]:
-        default_index = q["choices"].index(prev)
+    default_index = prev if isinstance(prev, int) and 0 <= prev < len(q.choices) else None
 
     choice = st.radio(
         label="보기",
-        options=q["choices"],
+        options=q.choices,
         index=default_index,
         key=widget_key,
         label_visibility="collapsed",
         on_change=mark_progress_dirty,
     )
-    st.session_state.answers[idx] = choice
+    st.session_state.answers[idx] = answer_index(q, choice)
 
 sync_answers_from_widgets()
 
@@ -3357,9 +7825,10 @@ if st.button(
 ):
     st.session_state.submitted = True
     st.session_state.session_stats_applied_this_attempt = False
+    st.session_state["_submit_pending"] = True  # ✅ 이번 rerun 끝에서 제출→화면 시간 기록
 
-    # ✅ 제출 시점에만 answers에 확정 반영
-    st.session_state.answers = selected_now
+    # ✅ 제출 시점에만 answers에 확정 반영 (보기 index)
+    st.session_state.answers = [answer_index(q, v) for q, v in zip(st.session_state.quiz, selected_now)]
 
     # ✅ 중복 카운트 방지
     if not st.session_state.get("_counted_today", False):
@@ -3380,31 +7849,27 @@ if st.session_state.submitted:
     ensure_excluded_wrong_words_shape()
 
     current_type = st.session_state.quiz_type
-    current_pos_group = st.session_state.pos_group
-    k_now = mastery_key()
+    quiz_kind, _ = quiz_source()
+    current_pos_group = quiz_kind or st.session_state.pos_group  # 챌린지/과제는 quiz_attempts.level에 그 표시
+    key_of = quiz_mastery_key_of(current_type)
 
-    score = 0
+    # ✅ 채점은 여기서 1번 → 단어 통계 / SRS / 콤보가 같은 결과를 씀
+    graded = grade_answers(st.session_state.quiz, st.session_state.answers)
+    score = sum(graded)
     wrong_list = []
 
     for idx, q in enumerate(st.session_state.quiz):
-        picked = st.session_state.answers[idx]
-        correct = q["correct_text"]
-        word_key = str(q.get("jp_word", "")).strip()
-
-        if picked == correct:
-            score += 1
-            if word_key:
-                st.session_state.mastered_words.setdefault(k_now, set()).add(word_key)
-        else:
+        if not graded[idx]:
+            picked = st.session_state.answers[idx]
             wrong_list.append({
                 "No": idx + 1,
-                "문제": str(q.get("prompt", "")),
-                "내 답": "" if picked is None else str(picked),
-                "정답": str(correct),
+                "문제": q.prompt,
+                "내 답": "" if picked is None else str(q.choices[picked]),
+                "정답": q.correct_text,
                 "단어": str(q.get("jp_word", "")).strip(),
                 "읽기": str(q.get("reading", "")).strip(),
                 "뜻": str(q.get("meaning", "")).strip(),
-                "품사": current_pos_group,   # ✅ 그룹 저장
+                "품사": pos_group_of(q.pos) if quiz_kind else current_pos_group,   # ✅ 그룹 저장
                 "유형": current_type,
             })
 
@@ -3421,6 +7886,38 @@ if st.session_state.submitted:
         add_free_used(quiz_len)  # 보통 10
         st.session_state.free_limit_applied_this_attempt = True
 
+    # ✅ SRS 일정 + 혼동 행렬 반영 (제출 1회당 1번만; SRS 저장은 아래 save_progress_to_db에서 함께)
+    if not st.session_state.get("srs_applied_this_attempt", False):
+        record_quiz_srs(st.session_state.quiz, graded, key_of)
+        record_confusions(wrong_list)
+        st.session_state.srs_applied_this_attempt = True
+
+        ch = active_challenge()
+        if ch and user_id:
+            elapsed_ms = int((time.time() - float(ch.get("started_at", time.time()))) * 1000)
+            ch["result"] = challenge_record(ch["day"], user_id, user_email, score, quiz_len, elapsed_ms)
+
+        asg = active_assignment()
+        if asg and user_id:
+            asg["counted"] = assignment_record(
+                asg["code"], user_id, user_email, graded, [q.word_id for q in st.session_state.quiz]
+            )
+
+    ch = active_challenge()
+    if ch and ch.get("result"):
+        res = ch["result"]
+        if res.get("counted"):
+            st.info(f"🏆 오늘의 챌린지: {res['rank']}위 / {res['players']}명")
+        else:
+            st.caption(f"🏆 오늘의 챌린지는 첫 제출만 순위에 반영돼요. (내 순위 {res.get('rank')}위)")
+
+    asg = active_assignment()
+    if asg and "counted" in asg:
+        if asg["counted"]:
+            st.info(f"🏫 과제 {asg['code']} 제출 완료")
+        else:
+            st.caption(f"🏫 과제 {asg['code']}는 첫 제출만 선생님께 전달돼요.")
+
     ratio = score / quiz_len if quiz_len else 0
 
     if ratio == 1:
@@ -3439,6 +7936,37 @@ if st.session_state.submitted:
         st.warning("💪 괜찮아요! 틀린 문제는 성장의 재료예요. 다시 한 번 도전해봐요.")
 
     sb_authed_local = get_authed_sb()
+
+    # ✅ 제출 기록은 먼저 로컬 저널에 (백엔드 장애/재시작에도 유실 X) → 전송은 드레이너가
+    if user_id and not (st.session_state.saved_this_attempt and st.session_state.stats_saved_this_attempt):
+        try:
+            sync_answers_from_widgets()
+            attempt_id = st.session_state.get("attempt_id") or new_attempt_id()
+            st.session_state["attempt_id"] = attempt_id
+            entries = [(
+                "attempt",
+                build_attempt_payload(
+                    user_id, user_email, current_pos_group, current_type, quiz_len, score, wrong_list,
+                    attempt_id=attempt_id,
+                ),
+            )]
+            items = build_word_results_bulk_payload(
+                quiz=st.session_state.quiz,
+                graded=graded,
+                quiz_type=current_type,
+                level=quiz_stats_level(),
+            )
+            if items:
+                entries.append(("word_results", [dict(it, attempt_id=attempt_id) for it in items]))
+            journal_append(attempt_id, user_id, st.session_state.get("access_token"), entries)
+            attempt_cache_invalidate(user_id)
+            st.session_state.saved_this_attempt = True
+            st.session_state.stats_saved_this_attempt = True
+        except Exception as e:
+            if show_post_ui and is_admin():
+                st.warning("로컬 저널 기록 실패 → Supabase로 바로 저장합니다.")
+                st.write(str(e))
+
     if sb_authed_local is None:
         if show_post_ui:
             st.warning("DB 저장/조회용 토큰이 없습니다. 다시 로그인해 주세요.")
@@ -3454,7 +7982,8 @@ if st.session_state.submitted:
                     quiz_len=quiz_len,
                     score=score,
                     wrong_list=wrong_list,
-                ))
+                ), name="save_attempt_to_db")
+                attempt_cache_invalidate(user_id)
                 st.session_state.saved_this_attempt = True
             except Exception as e:
                 if show_post_ui:
@@ -3466,12 +7995,12 @@ if st.session_state.submitted:
                 sync_answers_from_widgets()
                 items = build_word_results_bulk_payload(
                     quiz=st.session_state.quiz,
-                    answers=st.session_state.answers,
+                    graded=graded,
                     quiz_type=current_type,
-                    pos=current_pos_group,  # ✅ 그룹 기준
+                    level=quiz_stats_level(),
                 )
                 if items:
-                    run_db(lambda: sb_authed_local.rpc("record_word_results_bulk", {"p_items": items}).execute())
+                    run_db(lambda: sb_authed_local.rpc("record_word_results_bulk", {"p_items": items}).execute(), name="rpc.record_word_results_bulk")
                 st.session_state.stats_saved_this_attempt = True
             except Exception as e:
                 if show_post_ui and is_admin():
@@ -3486,11 +8015,7 @@ if st.session_state.submitted:
     # ============================================================
     # ✅ 콤보 계산 (⚠️ 반드시 제출 후에만)
     # ============================================================
-    correct_flags = []
-    for idx, q in enumerate(st.session_state.quiz):
-        picked = st.session_state.answers[idx]
-        correct = q["correct_text"]
-        correct_flags.append(picked == correct)
+    correct_flags = [bool(x) for x in graded]
 
     max_combo = compute_max_combo(correct_flags)
     render_combo_celebration(max_combo)
@@ -3680,3 +8205,5 @@ if st.session_state.get("submitted", False):
     show_naver_talk = (SHOW_NAVER_TALK == "N") or is_admin()
     if show_naver_talk:
         render_naver_talk()
+
+end_rerun()
@@ -0,0 +1,383 @@
+"""
+덱/퀴즈 핫패스 마이크로벤치마크
+
+    python bench/bench_hot_paths.py                       # 500 / 10k / 100k 단어
+    python bench/bench_hot_paths.py --sizes 500,10000 --out bench/results/mine.json
+    python bench/bench_hot_paths.py --compare bench/results/<이전>.json
+
+- app.py를 "실행"하지 않고 함수/상수 정의만 읽어서 사용 (UI·쿠키·Supabase 연결 X)
+- 합성 덱은 --seed로 재현 가능 (같은 seed = 같은 CSV)
+- 결과는 JSON (커밋 해시 포함) → 커밋 간 비교(--compare)로 회귀 확인
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_PATH = ROOT / "app.py"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+DEFAULT_SIZES = (500, 10_000, 100_000)
+REPORT_ROWS = 10_000
+COMBO_FLAGS = 10_000
+CHALLENGE_PLAYERS = 10_000
+
+# 값 계산에 이 호출만 있는 모듈 상수는 안전하게 실행 (나머지 호출은 UI/네트워크일 수 있음)
+SAFE_CALLS = {"Path", "dict", "set", "frozenset", "list", "tuple", "object", "ZoneInfo", "timezone", "timedelta"}
+
+# ============================================================
+# ✅ app.py 정의만 로드
+# ============================================================
+def _is_safe_assign(node: ast.stmt) -> bool:
+    if isinstance(node, ast.Assign):
+        targets, value = node.targets, node.value
+    elif isinstance(node, ast.AnnAssign) and node.value is not None:
+        targets, value = [node.target], node.value
+    else:
+        return False
+    if not all(isinstance(t, ast.Name) for t in targets):
+        return False
+    for sub in ast.walk(value):
+        if isinstance(sub, ast.Name) and sub.id == "st":
+            return False  # st.secrets / st.session_state 등 런타임 값
+        if isinstance(sub, ast.Call):
+            fn = sub.func
+            name = fn.id if isinstance(fn, ast.Name) else getattr(fn, "attr", "")
+            if name not in SAFE_CALLS and not (isinstance(fn, ast.Attribute) and name in {"resolve", "parent"}):
+                return False
+    return True
+
+def load_app_namespace(app_path: Path = APP_PATH) -> dict:
+    """app.py의 import/함수/클래스/단순 상수만 실행한 네임스페이스."""
+    tree = ast.parse(app_path.read_text(encoding="utf-8"), filename=str(app_path))
+    ns: dict = {"__file__": str(app_path), "__name__": "hotena_app_bench"}
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            try:
+                exec(compile(ast.Module([node], []), str(app_path), "exec"), ns)
+            except Exception:
+                pass  # 런타임 전용 의존성(쿠키 매니저 등)은 벤치에 불필요
+        elif isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            exec(compile(ast.Module([node], []), str(app_path), "exec"), ns)
+        elif _is_safe_assign(node):
+            try:
+                exec(compile(ast.Module([node], []), str(app_path), "exec"), ns)
+            except NameError:
+                pass  # 화면 렌더링 중 계산되는 값(today_total 등)
+    return ns
+
+# ============================================================
+# ✅ 합성 데이터 (seed 고정)
+# ============================================================
+KANA = list("あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわん"
+            "がぎぐげござじずぜぞだでどばびぶべぼぱぴぷぺぽ")
+KANJI = list("日月火水木金土山川田人口目耳手足心体学校先生年時分半今朝昼夜午前後上下左右中外内大小高安新古"
+             "長短早遅多少近遠明暗強弱重軽広狭深浅白黒赤青春夏秋冬東西南北国語話読書聞見行来帰出入立休食飲買売"
+             "作使待持習教働住知思言考開閉始終走歩泳乗降着脱貸借送届同違便利元気静親切有名暇好嫌上手下手")
+HANGUL = [chr(0xAC00 + i) for i in range(0, 11172, 37)]
+POS_WEIGHTS = {
+    "noun": 35, "adj_i": 18, "adj_na": 15, "verb": 20,
+    "adv": 4, "particle": 3, "conj": 2, "interj": 1, "phrase": 2,
+}
+LEVELS = ["N5", "N5", "N5", "N4", "N4", "N3"]
+VERB_ENDS = ["る", "う", "く", "す", "つ", "む", "ぶ", "ぐ", "する"]
+
+def _kana(rng: random.Random, lo: int, hi: int) -> str:
+    return "".join(rng.choice(KANA) for _ in range(rng.randint(lo, hi)))
+
+def make_synthetic_deck(size: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    pos_names = list(POS_WEIGHTS)
+    pos_w = [POS_WEIGHTS[p] for p in pos_names]
+    rows, seen = [], set()
+    while len(rows) < size:
+        pos = rng.choices(pos_names, pos_w)[0]
+        suffix = {"adj_i": "い", "verb": rng.choice(VERB_ENDS)}.get(pos, "")
+        stem = _kana(rng, 1, 4)
+        if rng.random() < 0.65 and pos not in {"particle", "conj", "interj"}:
+            jp_word = "".join(rng.choice(KANJI) for _ in range(rng.randint(1, 3))) + suffix
+        else:
+            jp_word = stem + suffix
+        if jp_word in seen:
+            continue
+        seen.add(jp_word)
+        meaning = "".join(rng.choice(HANGUL) for _ in range(rng.randint(1, 3)))
+        if pos in {"adj_i", "verb"}:
+            meaning += "다"
+        rows.append({
+            "level": rng.choice(LEVELS),
+            "pos": pos,
+            "jp_word": jp_word,
+            "reading": stem + suffix,
+            "meaning": meaning,
+            "example_jp": f"{jp_word}です。",
+            "example_kr": f"{meaning}입니다.",
+        })
+    return rows
+
+def make_synthetic_patterns(size: int, seed: int) -> list[dict]:
+    rng = random.Random(seed + 1)
+    groups = ["noun", "adj_i", "adj_na", "verb", "other"]
+    return [
+        {
+            "pos_group": rng.choice(groups),
+            "title": f"N+{_kana(rng, 1, 3)} #{i}",
+            "jp": f"Xは{_kana(rng, 2, 5)}。",
+            "kr": "X는 Y입니다.",
+            "ex1_jp": f"{_kana(rng, 3, 8)}。", "ex1_kr": "예문 1",
+            "ex2_jp": f"{_kana(rng, 3, 8)}。" if rng.random() < 0.8 else "", "ex2_kr": "예문 2",
+        }
+        for i in range(size)
+    ]
+
+def make_attempt_rows(n: int, seed: int) -> list[dict]:
+    """quiz_attempts 형태 (created_at은 최근 90일에 분산, 오늘 몫 포함)."""
+    rng = random.Random(seed + 2)
+    now = datetime.now(timezone.utc)
+    modes = ["명사", "い형용사", "な형용사", "동사", "기타"]
+    out = []
+    for _ in range(n):
+        qlen = 10
+        score = rng.randint(0, qlen)
+        out.append({
+            "created_at": (now - timedelta(minutes=rng.randint(0, 90 * 24 * 60))).isoformat(),
+            "quiz_len": qlen,
+            "score": score,
+            "wrong_count": qlen - score if rng.random() < 0.9 else None,
+            "pos_mode": rng.choice(modes),
+        })
+    return out
+
+def write_csv(path: Path, rows: list[dict]):
+    import pandas as pd
+
+    pd.DataFrame(rows).to_csv(path, index=False, encoding="utf-8-sig")
+
+# ============================================================
+# ✅ 측정
+# ============================================================
+def measure(fn, repeat: int = 5, number: int = 1, setup=None) -> dict:
+    """number번 호출 × repeat회. 호출 1번 기준 ms 통계."""
+    if setup:
+        setup()
+    fn()  # 워밍업
+    per_call = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - t0) * 1000.0 / number)
+    per_call.sort()
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min_ms": round(per_call[0], 4),
+        "median_ms": round(statistics.median(per_call), 4),
+        "mean_ms": round(statistics.fmean(per_call), 4),
+        "max_ms": round(per_call[-1], 4),
+    }
+
+def _repeat_for(size: int) -> int:
+    return 3 if size >= 100_000 else 5
+
+def _calls_for(size: int) -> int:
+    """문항 단위 벤치의 호출 수 (큰 덱은 1회가 길어서 줄임)."""
+    return 200 if size <= 10_000 else 20
+
+def bench_size(ns: dict, size: int, seed: int, workdir: Path) -> dict:
+    st = ns["st"]
+    rng = random.Random(seed)
+    repeat = _repeat_for(size)
+    deck_csv = workdir / f"deck_{size}.csv"
+    pat_csv = workdir / f"patterns_{size}.csv"
+    write_csv(deck_csv, make_synthetic_deck(size, seed))
+    write_csv(pat_csv, make_synthetic_patterns(max(50, size // 10), seed))
+
+    out: dict[str, dict] = {}
+    load_pool, load_patterns = ns["load_pool"], ns["load_patterns"]
+    out["load_pool"] = measure(lambda: load_pool(str(deck_csv)), repeat=repeat, setup=load_pool.clear)
+    out["load_patterns"] = measure(lambda: load_patterns(str(pat_csv)), repeat=repeat, setup=load_patterns.clear)
+
+    pool = load_pool(str(deck_csv))
+    pool["word_id"] = list(range(1, len(pool) + 1))
+    out["build_deck_index"] = measure(lambda: ns["build_deck_index"](pool), repeat=max(1, repeat - 2))
+    # 업로드로 한 단어만 바뀐 경우: 바뀐 pos 파티션만 다시 계산
+    prev_index = ns["build_deck_index"](pool)
+    edited = pool.copy()
+    edited.loc[int(edited.index[edited["pos"] == edited["pos"].iloc[0]][0]), "meaning"] += "*"
+    out["build_deck_index_incremental"] = measure(
+        lambda: ns["build_deck_index"](edited, prev_index), repeat=max(1, repeat - 2)
+    )
+
+    # ✅ 세션 상태: 이 덱을 기본 덱으로 가리키게 하고 ensure_pool_ready로 평소처럼 준비
+    ns["DECK_SPECS"][ns["DEFAULT_DECK_ID"]]["path"] = deck_csv
+    st.session_state.clear()
+    st.session_state["is_admin_cached"] = False
+    st.session_state["pos_group"] = "noun"
+    st.session_state["quiz_type"] = "meaning"
+    ns["ensure_pool_ready"]()
+    pool = st.session_state["_pool"]
+    index = st.session_state["_pool_index"]
+
+    make_question = ns["make_question"]
+    sample_rows = [int(r) for r in rng.sample(range(len(pool)), min(_calls_for(size), len(pool)))]
+    kanji_rows = [r for r in sample_rows if bool(index["has_kanji"].iat[r])]
+    for qtype in ("reading", "meaning", "kr2jp"):
+        rows = kanji_rows if qtype == "reading" else sample_rows
+        it = iter(rows * 1000)
+        out[f"make_question[{qtype}]"] = measure(
+            lambda: make_question(pool.iloc[next(it)], qtype, pool, index, None),
+            repeat=repeat, number=len(rows),
+        )
+
+    verb_readings = index["by_pos"].get("verb", {}).get("reading", [])
+    verb_rows = pool.index[index["pos_key"] == "verb"].tolist()[: _calls_for(size)]
+    it_v = iter(verb_rows * 1000)
+
+    def _reading_wrongs():
+        r = next(it_v)
+        ns["_pick_reading_wrongs"](verb_readings, pool.at[r, "reading"], pos="verb", jp_word=pool.at[r, "jp_word"], k=3)
+
+    out["_pick_reading_wrongs"] = measure(_reading_wrongs, repeat=repeat, number=max(1, len(verb_rows)))
+
+    # ✅ build_quiz: 명사 후보의 절반은 이미 출제, 1/4은 정복한 상태
+    k = ns["mastery_key"]("meaning", "noun")
+    nouns = pool.loc[index["pos_key"] == "noun", "jp_word"].tolist()
+    rng.shuffle(nouns)
+    st.session_state["seen_words"] = {k: set(nouns[: len(nouns) // 2])}
+    st.session_state["mastered_words"] = {k: set(nouns[: len(nouns) // 4])}
+    st.session_state["excluded_wrong_words"] = {k: set()}
+    out["build_quiz[seen=50%,mastered=25%]"] = measure(lambda: ns["build_quiz"]("meaning", "noun"), repeat=repeat, number=5)
+
+    wrong_list = [{"단어": w} for w in nouns[: min(50, len(nouns))]]
+    out["build_quiz_from_wrongs"] = measure(
+        lambda: ns["build_quiz_from_wrongs"](wrong_list, "meaning", "noun"), repeat=repeat, number=5,
+    )
+
+    # ✅ 단어 검색: 인덱스 생성 1회 + 접두어 조회(읽기/로마자/뜻 섞어서)
+    out["build_search_index"] = measure(lambda: ns["build_search_index"](pool), repeat=max(1, repeat - 2))
+    search = ns["build_search_index"](pool)
+    queries = []
+    for r in sample_rows:
+        queries += [pool.at[r, "reading"][:2], pool.at[r, "jp_word"][:1], pool.at[r, "meaning"][:1]]
+    queries.append("benkyou")
+    it_q = iter(queries * 1000)
+    out["search_words"] = measure(lambda: ns["search_words"](search, next(it_q)), repeat=repeat, number=len(queries))
+    return out
+
+def bench_fixed(ns: dict, seed: int) -> dict:
+    rows = make_attempt_rows(REPORT_ROWS, seed)
+    kst = ns["KST"]
+    today = datetime.now(kst).date()
+    today_rows = [r for r in rows if datetime.fromisoformat(r["created_at"]).astimezone(kst).date() == today]
+    rng = random.Random(seed + 3)
+    flags = [rng.random() < 0.7 for _ in range(COMBO_FLAGS)]
+
+    # ✅ 챌린지 보드: 참가자 CHALLENGE_PLAYERS명이 1번씩 제출(top-k + 점수 분포 갱신)
+    entries = [
+        (-rng.randint(0, 10), rng.randint(5_000, 120_000), float(i), f"u{i}", f"u{i}"[:2] + "***")
+        for i in range(CHALLENGE_PLAYERS)
+    ]
+
+    def _fill_board():
+        board = ns["_new_board"]()
+        for e in entries:
+            ns["_board_add"](board, e)
+
+    return {
+        f"challenge_board_add[{CHALLENGE_PLAYERS}]": measure(_fill_board, repeat=5),
+        f"build_today_report_from_rows[{REPORT_ROWS}]": measure(
+            lambda: ns["build_today_report_from_rows"](today_rows or rows, rows), repeat=5,
+        ),
+        f"compute_max_combo[{COMBO_FLAGS}]": measure(lambda: ns["compute_max_combo"](flags), repeat=5, number=20),
+    }
+
+# ============================================================
+# ✅ 결과 저장/비교
+# ============================================================
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def compare(cur: dict, base: dict):
+    print(f"\n비교: {base['meta'].get('commit')} → {cur['meta'].get('commit')} (median_ms, 배수)")
+    for group, benches in cur["results"].items():
+        for name, r in benches.items():
+            b = base.get("results", {}).get(group, {}).get(name)
+            if not b:
+                continue
+            ratio = r["median_ms"] / b["median_ms"] if b["median_ms"] else float("inf")
+            flag = "  ⚠️" if ratio > 1.2 else ""
+            print(f"  [{group}] {name:<40} {b['median_ms']:>10.3f} → {r['median_ms']:>10.3f}  x{ratio:.2f}{flag}")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES))
+    ap.add_argument("--seed", type=int, default=20240601)
+    ap.add_argument("--out", type=Path, default=None)
+    ap.add_argument("--compare", type=Path, default=None)
+    args = ap.parse_args(argv)
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    ns = load_app_namespace()
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    commit = git_commit()
+    result = {
+        "meta": {
+            "commit": commit,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "seed": args.seed,
+            "sizes": sizes,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="hotena_bench_") as tmp:
+        workdir = Path(tmp)
+        # ✅ 단어 ID 파일은 임시 폴더로 (저장소의 data/word_ids.csv 건드리지 않음)
+        ns["WORD_ID_PATH"] = workdir / "word_ids.csv"
+        for size in sizes:
+            t0 = time.perf_counter()
+            result["results"][f"deck_{size}"] = bench_size(ns, size, args.seed, workdir)
+            print(f"deck_{size}: {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+        result["results"]["fixed"] = bench_fixed(ns, args.seed)
+
+    for group, benches in result["results"].items():
+        print(f"[{group}]")
+        for name, r in benches.items():
+            print(f"  {name:<40} median {r['median_ms']:>10.3f} ms  (min {r['min_ms']:.3f})")
+
+    out = args.out or RESULTS_DIR / f"bench-{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n저장: {out}")
+
+    if args.compare:
+        compare(result, json.loads(args.compare.read_text(encoding="utf-8")))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""
+부하 테스트용 Supabase 대역 (메모리 테이블 + 지연 시간 흉내)
+
+- app.py가 쓰는 만큼만 구현: table().select/insert/upsert/delete + eq/gt/gte/lt/lte/in_/order/limit/single,
+  rpc(), auth.refresh_session/get_user/sign_in_with_password, postgrest.auth(token)
+- 모든 execute()/auth 호출은 latency_ms ± jitter_ms 만큼 sleep 후 응답
+- 호출은 (user_id, 대상, op)별로 세어 둠 → 동작(action)별 DB 호출 수 계산용
+- install()은 supabase.create_client / streamlit_cookies_manager를 대역으로 바꿈
+  (쿠키는 세션 상태의 "_load_user"로 사용자 구분)
+"""
+from __future__ import annotations
+
+import random
+import sys
+import threading
+import time
+import types
+from collections import Counter
+from datetime import datetime, timezone
+
+class Response:
+    def __init__(self, data):
+        self.data = data
+
+class FakeDB:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, plan: str = "pro", seed: int = 0):
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.plan = plan
+        self.tables: dict[str, list[dict]] = {"profiles": [], "quiz_attempts": []}
+        self.calls: Counter = Counter()       # (user_id, target, op) → 횟수
+        self.user_calls: Counter = Counter()  # user_id → 횟수
+        self.lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._next_id = 1
+
+    # ---------- 공통 ----------
+    def wait(self):
+        if self.latency_ms <= 0 and self.jitter_ms <= 0:
+            return
+        with self.lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000.0)
+
+    def record(self, user_id: str | None, target: str, op: str):
+        uid = user_id or "anon"
+        with self.lock:
+            self.calls[(uid, target, op)] += 1
+            self.user_calls[uid] += 1
+
+    def calls_for(self, user_id: str) -> int:
+        with self.lock:
+            return self.user_calls.get(user_id, 0)
+
+    def ensure_profile(self, user_id: str):
+        with self.lock:
+            if not any(r.get("id") == user_id for r in self.tables["profiles"]):
+                self.tables["profiles"].append({"id": user_id, "is_admin": False, "plan": self.plan})
+
+    # ---------- 테이블 ----------
+    def run_query(self, q: "Query"):
+        self.wait()
+        self.record(q.user_id, q.table, q.op)
+        with self.lock:
+            rows = self.tables.setdefault(q.table, [])
+            if q.op in ("insert", "upsert"):
+                payload = q.payload if isinstance(q.payload, list) else [q.payload]
+                out = []
+                for p in payload:
+                    p = dict(p)
+                    target = None
+                    if q.op == "upsert":
+                        key = q.on_conflict or "id"
+                        target = next((r for r in rows if key in p and r.get(key) == p.get(key)), None)
+                    if target is not None:
+                        target.update(p)
+                        out.append(dict(target))
+                        continue
+                    p.setdefault("id", self._next_id)
+                    p.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+                    self._next_id += 1
+                    rows.append(p)
+                    out.append(dict(p))
+                return Response(out)
+            if q.op == "delete":
+                self.tables[q.table] = [r for r in rows if not q.match(r)]
+                return Response([])
+            out = [dict(r) for r in rows if q.match(r)]
+        if q.order_by:
+            col, desc = q.order_by
+            out.sort(key=lambda r: (0, r[col], "") if isinstance(r.get(col), (int, float)) else (1, 0, str(r.get(col) or "")),
+                     reverse=desc)
+        if q.limit_n is not None:
+            out = out[: q.limit_n]
+        if q.single_row:
+            return Response(out[0] if out else None)
+        return Response(out)
+
+    def run_rpc(self, user_id: str | None, name: str, params: dict):
+        self.wait()
+        self.record(user_id, "rpc", name)
+        if name == "mark_attendance_kst":
+            return Response([{"streak_count": 1, "did_attend": True}])
+        return Response([])
+
+class Query:
+    def __init__(self, db: FakeDB, table: str, user_id: str | None):
+        self.db = db
+        self.table = table
+        self.user_id = user_id
+        self.op = "select"
+        self.payload = None
+        self.on_conflict = None
+        self.filters: list[tuple[str, str, object]] = []
+        self.order_by = None
+        self.limit_n = None
+        self.single_row = False
+
+    def select(self, *_a, **_k):
+        self.op = "select"
+        return self
+
+    def insert(self, payload, **_k):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict: str | None = None, **_k):
+        self.op, self.payload, self.on_conflict = "upsert", payload, on_conflict
+        return self
+
+    def delete(self, **_k):
+        self.op = "delete"
+        return self
+
+    def _f(self, col, op, val):
+        self.filters.append((col, op, val))
+        return self
+
+    def eq(self, c, v): return self._f(c, "eq", v)
+    def gt(self, c, v): return self._f(c, "gt", v)
+    def gte(self, c, v): return self._f(c, "gte", v)
+    def lt(self, c, v): return self._f(c, "lt", v)
+    def lte(self, c, v): return self._f(c, "lte", v)
+    def in_(self, c, v): return self._f(c, "in", list(v))
+
+    def order(self, col, desc: bool = False, **_k):
+        self.order_by = (col, bool(desc))
+        return self
+
+    def limit(self, n):
+        self.limit_n = int(n)
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    maybe_single = single
+
+    def match(self, r: dict) -> bool:
+        for col, op, v in self.filters:
+            x = r.get(col)
+            if op == "eq" and x != v:
+                return False
+            if op == "in" and x not in v:
+                return False
+            if op in ("gt", "gte", "lt", "lte"):
+                if x is None:
+                    return False
+                # 숫자끼리는 숫자로(id keyset), 나머지는 문자열(ISO 시각)로 비교
+                num = isinstance(x, (int, float)) and isinstance(v, (int, float))
+                a, b = (x, v) if num else (str(x), str(v))
+                if (op == "gt" and not a > b) or (op == "gte" and not a >= b) \
+                        or (op == "lt" and not a < b) or (op == "lte" and not a <= b):
+                    return False
+        return True
+
+    def execute(self):
+        return self.db.run_query(self)
+
+class _RPC:
+    def __init__(self, db, user_id, name, params):
+        self.db, self.user_id, self.name, self.params = db, user_id, name, params
+
+    def execute(self):
+        return self.db.run_rpc(self.user_id, self.name, self.params)
+
+def _user_from_token(token) -> str | None:
+    if isinstance(token, dict):
+        token = token.get("refresh_token")
+    token = str(token or "")
+    return token.split(":", 1)[1] if ":" in token else None
+
+class _Auth:
+    def __init__(self, client: "FakeClient"):
+        self.client = client
+
+    def _session(self, user_id: str):
+        self.client.db.ensure_profile(user_id)
+        self.client.user_id = user_id
+        user = types.SimpleNamespace(id=user_id, email=f"{user_id}@load.test")
+        sess = types.SimpleNamespace(access_token=f"at:{user_id}", refresh_token=f"rt:{user_id}")
+        return types.SimpleNamespace(user=user, session=sess)
+
+    def refresh_session(self, refresh_token):
+        uid = _user_from_token(refresh_token)
+        self.client.db.wait()
+        self.client.db.record(uid, "auth", "refresh_session")
+        if not uid:
+            raise ValueError("invalid refresh token")
+        return self._session(uid)
+
+    def get_user(self, access_token):
+        uid = _user_from_token(access_token)
+        self.client.db.wait()
+        self.client.db.record(uid, "auth", "get_user")
+        return types.SimpleNamespace(user=self._session(uid).user if uid else None)
+
+    def sign_in_with_password(self, creds: dict):
+        uid = str(creds.get("email", "anon")).split("@", 1)[0]
+        self.client.db.wait()
+        self.client.db.record(uid, "auth", "sign_in")
+        return self._session(uid)
+
+    def sign_up(self, *_a, **_k):
+        return types.SimpleNamespace(user=None, session=None)
+
+    def sign_out(self, *_a, **_k):
+        return None
+
+class _Postgrest:
+    def __init__(self, client: "FakeClient"):
+        self.client = client
+
+    def auth(self, token):
+        self.client.user_id = _user_from_token(token)
+
+class FakeClient:
+    def __init__(self, db: FakeDB):
+        self.db = db
+        self.user_id: str | None = None
+        self.auth = _Auth(self)
+        self.postgrest = _Postgrest(self)
+
+    def table(self, name: str) -> Query:
+        return Query(self.db, name, self.user_id)
+
+    def rpc(self, name: str, params: dict | None = None) -> _RPC:
+        return _RPC(self.db, self.user_id, name, params or {})
+
+# ============================================================
+# ✅ 쿠키 대역 (세션마다 "_load_user"로 구분)
+# ============================================================
+_COOKIE_JARS: dict[str, dict] = {}
+_COOKIE_LOCK = threading.Lock()
+
+class FakeCookieManager(dict):
+    def __init__(self, *_a, **_k):
+        import streamlit as st
+
+        self._user = str(st.session_state.get("_load_user") or "")
+        with _COOKIE_LOCK:
+            jar = _COOKIE_JARS.setdefault(self._user, {
+                "refresh_token": f"rt:{self._user}" if self._user else "",
+                "access_token": f"at:{self._user}" if self._user else "",
+                "onboarding_seen_v1": "1",
+            })
+            super().__init__(jar)
+
+    def ready(self) -> bool:
+        return True
+
+    def save(self):
+        with _COOKIE_LOCK:
+            _COOKIE_JARS[self._user] = dict(self)
+
+def install(db: FakeDB):
+    """app.py가 다음 rerun부터 대역을 쓰도록 모듈 속성을 바꿔 끼움."""
+    import supabase
+
+    supabase.create_client = lambda *_a, **_k: FakeClient(db)
+    mod = types.ModuleType("streamlit_cookies_manager")
+    mod.EncryptedCookieManager = FakeCookieManager
+    sys.modules["streamlit_cookies_manager"] = mod
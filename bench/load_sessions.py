@@ -0,0 +1,346 @@
+"""
+동시 접속 부하 테스트 (Streamlit AppTest × N 세션, Supabase 대역)
+
+    python bench/load_sessions.py --sessions 20 --rounds 2 --db-latency-ms 40 --db-jitter-ms 15
+    python bench/load_sessions.py --sessions 50 --ramp-s 5 --out bench/results/load-50.json
+
+세션 하나의 흐름 (모든 세션이 같은 프로세스 = 실제 서버 1대와 같은 조건):
+    restore(쿠키 → 로그인 복원) → quiz(퀴즈 화면) → answer × 문항 수 → submit → (next → answer → submit) × rounds-1 → my
+
+보고:
+- 동작별 rerun 지연 p50/p95/p99 (ms)
+- 동작별 평균 DB 호출 수 (auth 포함)
+- 세션별 session_state 크기(다른 세션과 공유되는 덱/인덱스 제외) + 프로세스 RSS 증가분 / 세션 수
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parent
+APP_PATH = ROOT / "app.py"
+RESULTS_DIR = HERE / "results"
+
+if str(HERE) not in sys.path:
+    sys.path.insert(0, str(HERE))
+
+import fake_supabase  # noqa: E402
+from bench_hot_paths import git_commit  # noqa: E402
+
+ACTIONS = ("restore", "quiz", "answer", "submit", "next", "my")
+
+# ============================================================
+# ✅ 측정 도구
+# ============================================================
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    k = (len(xs) - 1) * p / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+def rss_bytes() -> int:
+    """현재 RSS (리눅스 /proc 우선, 없으면 최대 RSS)."""
+    try:
+        with open("/proc/self/statm") as f:
+            import os
+
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _object_sizes(root, sizes: dict[int, int]) -> set[int]:
+    """root에서 닿는 객체 id 집합 (크기는 sizes에 기록). DataFrame/ndarray는 통째로 1개."""
+    import numpy as np
+    import pandas as pd
+
+    seen: set[int] = set()
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        oid = id(obj)
+        if oid in seen:
+            continue
+        seen.add(oid)
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            sizes[oid] = int(obj.memory_usage(deep=True).sum() if isinstance(obj, pd.DataFrame) else obj.memory_usage(deep=True))
+            continue
+        if isinstance(obj, np.ndarray):
+            sizes[oid] = int(obj.nbytes)
+            continue
+        sizes[oid] = sys.getsizeof(obj, 0)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return seen
+
+def session_state_sizes(states: list[dict]) -> list[int]:
+    """세션별 전용 메모리(바이트). 2개 이상 세션이 같이 가리키는 객체(공유 덱 등)는 제외."""
+    sizes: dict[int, int] = {}
+    reach = [_object_sizes(s, sizes) for s in states]
+    owners: dict[int, int] = defaultdict(int)
+    for r in reach:
+        for oid in r:
+            owners[oid] += 1
+    return [sum(sizes[o] for o in r if owners[o] == 1) for r in reach]
+
+LOAD_SECRETS = {
+    "COOKIE_PASSWORD": "load-test",
+    "SUPABASE_URL": "http://127.0.0.1:9",
+    "SUPABASE_ANON_KEY": "load-test",
+}
+
+def install_secrets(workdir: Path):
+    """
+    AppTest.secrets는 실행 중 전역 st.secrets를 바꿔 끼웠다가 되돌려서 동시 실행과 충돌함.
+    → 임시 secrets.toml을 설정으로 지정해 모든 세션이 같은 값을 보게 함.
+    """
+    from streamlit import config
+
+    path = workdir / "secrets.toml"
+    path.write_text("".join(f'{k} = "{v}"\n' for k, v in LOAD_SECRETS.items()), encoding="utf-8")
+    config.set_option("secrets.files", [str(path)])
+
+def install_data_paths(workdir: Path):
+    """저널/챌린지/과제 SQLite를 임시 폴더로 (repo의 data/에 테스트 기록이 남지 않게)."""
+    for env, name in (
+        ("HOTENA_JOURNAL_PATH", "attempt_journal.sqlite3"),
+        ("HOTENA_CHALLENGE_PATH", "challenge.sqlite3"),
+        ("HOTENA_CLASSROOM_PATH", "classroom.sqlite3"),
+    ):
+        os.environ[env] = str(workdir / name)
+
+def install_shared_script_cache():
+    """
+    AppTest는 rerun마다 새 ScriptCache를 만들어 app.py를 다시 compile함.
+    여러 스레드가 동시에 compile하면 CPython이 SystemError(AST recursion depth mismatch)를 냄
+    → 모든 세션이 미리 한 번 compile해 둔 캐시 1개를 같이 씀 (실제 서버도 스크립트 캐시는 1개).
+    """
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    shared = ScriptCache()
+    shared.get_bytecode(str(APP_PATH))
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: shared
+
+# ============================================================
+# ✅ 세션 시나리오
+# ============================================================
+class SessionRunner:
+    def __init__(self, idx: int, db: fake_supabase.FakeDB, timeout_s: float):
+        from streamlit.testing.v1 import AppTest
+
+        self.user_id = f"load{idx:04d}"
+        self.db = db
+        self.at = AppTest.from_file(str(APP_PATH), default_timeout=timeout_s)
+        self.at.session_state["_load_user"] = self.user_id
+        self.samples: list[tuple[str, float, int]] = []  # (action, ms, db_calls)
+        self.errors: list[str] = []
+
+    def _step(self, action: str, fn):
+        before = self.db.calls_for(self.user_id)
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:  # 한 세션의 실패가 전체 측정을 멈추지 않게
+            self.errors.append(f"{action}: {type(e).__name__}: {e}")
+            return False
+        ms = (time.perf_counter() - t0) * 1000.0
+        self.samples.append((action, ms, self.db.calls_for(self.user_id) - before))
+        if self.at.exception:
+            self.errors.append(f"{action}: {self.at.exception[0].value}")
+            return False
+        return True
+
+    def _button(self, key: str):
+        for b in self.at.button:
+            if b.key == key:
+                return b
+        return None
+
+    def _answer_all(self):
+        for r in list(self.at.radio):
+            if r.value is None and r.options:
+                self._step("answer", lambda r=r: r.set_value(r.options[0]).run())
+
+    def _submit(self) -> bool:
+        b = self._button("btn_submit")
+        if b is None:
+            self.errors.append("submit: 제출 버튼 없음")
+            return False
+        return self._step("submit", lambda: b.click().run())
+
+    def run(self, rounds: int):
+        at = self.at
+        if not self._step("restore", at.run):
+            return
+        at.session_state["page"] = "quiz"
+        if not self._step("quiz", at.run):
+            return
+        for rnd in range(rounds):
+            if rnd > 0:
+                nb = self._button("btn_next_10")
+                if nb is None:
+                    break
+                if not self._step("next", lambda: nb.click().run()):
+                    return
+            self._answer_all()
+            if not self._submit():
+                return
+        at.session_state["page"] = "my"
+        self._step("my", at.run)
+
+    def state_snapshot(self) -> dict:
+        return self.at.session_state.to_dict()
+
+# ============================================================
+# ✅ 실행/보고
+# ============================================================
+def summarize(runners: list[SessionRunner]) -> dict:
+    by_action: dict[str, list[float]] = defaultdict(list)
+    calls: dict[str, list[int]] = defaultdict(list)
+    for r in runners:
+        for action, ms, n_calls in r.samples:
+            by_action[action].append(ms)
+            calls[action].append(n_calls)
+    out = {}
+    for action in ACTIONS + tuple(a for a in by_action if a not in ACTIONS):
+        xs = by_action.get(action)
+        if not xs:
+            continue
+        out[action] = {
+            "count": len(xs),
+            "p50_ms": round(percentile(xs, 50), 2),
+            "p95_ms": round(percentile(xs, 95), 2),
+            "p99_ms": round(percentile(xs, 99), 2),
+            "max_ms": round(max(xs), 2),
+            "db_calls_mean": round(statistics.fmean(calls[action]), 2),
+            "db_calls_max": max(calls[action]),
+        }
+    all_ms = [ms for r in runners for _, ms, _ in r.samples]
+    out["_all"] = {
+        "count": len(all_ms),
+        "p50_ms": round(percentile(all_ms, 50), 2),
+        "p95_ms": round(percentile(all_ms, 95), 2),
+        "p99_ms": round(percentile(all_ms, 99), 2),
+    }
+    return out
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=10)
+    ap.add_argument("--rounds", type=int, default=1, help="세션당 퀴즈 제출 횟수")
+    ap.add_argument("--ramp-s", type=float, default=0.0, help="세션 시작을 이 시간(초)에 걸쳐 분산")
+    ap.add_argument("--db-latency-ms", type=float, default=30.0)
+    ap.add_argument("--db-jitter-ms", type=float, default=10.0)
+    ap.add_argument("--plan", default="pro", choices=["pro", "free"])
+    ap.add_argument("--timeout-s", type=float, default=120.0, help="rerun 1번 최대 대기")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", type=Path, default=None)
+    args = ap.parse_args(argv)
+
+    logging.disable(logging.WARNING)  # bare-mode/지원중단 경고가 세션 수만큼 반복됨
+    db = fake_supabase.FakeDB(args.db_latency_ms, args.db_jitter_ms, plan=args.plan, seed=args.seed)
+    fake_supabase.install(db)
+    workdir = Path(tempfile.mkdtemp(prefix="hotena_load_"))
+    install_secrets(workdir)
+    install_data_paths(workdir)
+    install_shared_script_cache()
+
+    gc.collect()
+    rss0 = rss_bytes()
+    runners = [SessionRunner(i, db, args.timeout_s) for i in range(args.sessions)]
+    start_gate = threading.Barrier(args.sessions) if args.ramp_s <= 0 else None
+
+    def _drive(i: int):
+        if start_gate is not None:
+            start_gate.wait()
+        else:
+            time.sleep(args.ramp_s * i / max(1, args.sessions))
+        runners[i].run(args.rounds)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as ex:
+        list(ex.map(_drive, range(args.sessions)))
+    wall_s = time.perf_counter() - t0
+
+    gc.collect()
+    rss1 = rss_bytes()
+    state_sizes = session_state_sizes([r.state_snapshot() for r in runners])
+    errors = [f"{r.user_id} {e}" for r in runners for e in r.errors]
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "sessions": args.sessions,
+            "rounds": args.rounds,
+            "ramp_s": args.ramp_s,
+            "db_latency_ms": args.db_latency_ms,
+            "db_jitter_ms": args.db_jitter_ms,
+            "plan": args.plan,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "wall_s": round(wall_s, 2),
+        "actions": summarize(runners),
+        "memory": {
+            "rss_delta_per_session_kb": round((rss1 - rss0) / max(1, args.sessions) / 1024, 1),
+            "session_state_kb_median": round(statistics.median(state_sizes) / 1024, 1) if state_sizes else 0,
+            "session_state_kb_max": round(max(state_sizes) / 1024, 1) if state_sizes else 0,
+        },
+        "db_calls_by_target": {
+            f"{target}.{op}": n
+            for (target, op), n in sorted(
+                _merge_users(db.calls).items(), key=lambda kv: -kv[1]
+            )
+        },
+        "errors": errors[:50],
+        "error_count": len(errors),
+    }
+
+    print(f"세션 {args.sessions}개 × {args.rounds}라운드, DB 지연 {args.db_latency_ms}±{args.db_jitter_ms}ms, {wall_s:.1f}s")
+    print(f"{'action':<10}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'db/act':>8}")
+    for action, r in result["actions"].items():
+        db_mean = r.get("db_calls_mean", "")
+        print(f"{action:<10}{r['count']:>6}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{db_mean!s:>8}")
+    mem = result["memory"]
+    print(f"메모리: RSS +{mem['rss_delta_per_session_kb']}KB/세션, session_state 중앙값 {mem['session_state_kb_median']}KB")
+    if errors:
+        print(f"오류 {len(errors)}건 (처음 5건):")
+        for e in errors[:5]:
+            print("  ", e)
+
+    out = args.out or RESULTS_DIR / f"load-{result['meta']['commit']}-s{args.sessions}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"저장: {out}")
+    return 1 if errors and len(errors) == args.sessions else 0
+
+def _merge_users(calls) -> dict:
+    merged: dict = defaultdict(int)
+    for (_uid, target, op), n in calls.items():
+        merged[(target, op)] += n
+    return merged
+
+if __name__ == "__main__":
+    sys.exit(main())
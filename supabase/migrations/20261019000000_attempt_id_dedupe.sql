@@ -0,0 +1,74 @@
+-- ============================================================
+-- 제출 저널 재전송 중복 방지 (attempt_id)
+--   - 앱의 저널 드레이너는 타임아웃 후 같은 제출을 다시 보낼 수 있음
+--     (실제로는 첫 요청이 이미 반영된 경우 → 여기서 걸러야 정확히 1번)
+--   - quiz_attempts: attempt_id UNIQUE → 앱은 upsert(on_conflict=attempt_id, ignore_duplicates)
+--   - word_results: record_word_results_bulk_once(p_items)
+--       처음 보는 attempt_id의 항목만 기존 record_word_results_bulk로 넘김 (같은 트랜잭션)
+--       → 실패하면 attempt_id 기록도 같이 롤백 = 다시 보내도 안전
+--   - 앱은 이 함수가 없으면 예전 RPC로 제출 1건씩 보내고, 응답이 불확실한 건은 다시 보내지 않음
+-- ============================================================
+
+alter table public.quiz_attempts add column if not exists attempt_id text;
+
+do $$
+begin
+  if not exists (select 1 from pg_constraint where conname = 'quiz_attempts_attempt_id_key') then
+    alter table public.quiz_attempts add constraint quiz_attempts_attempt_id_key unique (attempt_id);
+  end if;
+end $$;
+
+create table if not exists public.word_results_attempts (
+  attempt_id  text primary key,
+  created_at  timestamptz not null default now()
+);
+-- 직접 접근 X (정책 없음) → 아래 security definer 함수로만 기록
+alter table public.word_results_attempts enable row level security;
+
+-- 처음 보는 attempt_id만 돌려줌 (동시에 같은 id가 오면 PK 때문에 한쪽만 받음)
+create or replace function public.claim_word_results_attempts(p_ids text[])
+returns setof text
+language sql
+security definer
+set search_path = public
+as $$
+  insert into word_results_attempts(attempt_id)
+  select distinct unnest(p_ids)
+  on conflict do nothing
+  returning attempt_id;
+$$;
+
+revoke all on function public.claim_word_results_attempts(text[]) from public;
+grant execute on function public.claim_word_results_attempts(text[]) to authenticated, service_role;
+
+-- 호출자 권한으로 실행 (record_word_results_bulk의 RLS/auth.uid() 동작은 그대로)
+create or replace function public.record_word_results_bulk_once(p_items jsonb)
+returns integer
+language plpgsql
+set search_path = public
+as $$
+declare
+  fresh jsonb;
+begin
+  with ids as (
+    select claim_word_results_attempts(array(
+      select distinct i->>'attempt_id'
+      from jsonb_array_elements(p_items) i
+      where coalesce(i->>'attempt_id', '') <> ''
+    )) as attempt_id
+  )
+  select coalesce(jsonb_agg(i), '[]'::jsonb) into fresh
+  from jsonb_array_elements(p_items) i
+  where coalesce(i->>'attempt_id', '') = ''
+     or i->>'attempt_id' in (select attempt_id from ids);
+
+  if jsonb_array_length(fresh) > 0 then
+    perform record_word_results_bulk(fresh);
+  end if;
+  return jsonb_array_length(fresh);
+end $$;
+
+grant execute on function public.record_word_results_bulk_once(jsonb) to authenticated, service_role;
+
+-- 저널은 보낸 기록을 하루만 보관 → 그보다 오래된 attempt_id는 지워도 됨 (선택)
+-- delete from public.word_results_attempts where created_at < now() - interval '7 days';
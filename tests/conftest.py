@@ -0,0 +1,28 @@
+"""
+app.py는 Streamlit 스크립트라 import하면 화면까지 실행됨
+→ 벤치와 같은 방식으로 import/함수/단순 상수만 실행한 네임스페이스를 씀.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT / "bench") not in sys.path:
+    sys.path.insert(0, str(ROOT / "bench"))
+
+from bench_hot_paths import load_app_namespace  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app() -> dict:
+    return load_app_namespace()
+
+
+@pytest.fixture
+def guard(app, monkeypatch):
+    """테스트마다 새 DB 가드 (서킷/워커 풀 상태가 테스트끼리 섞이지 않게)."""
+    g = app["get_db_guard"].__wrapped__()
+    monkeypatch.setitem(app, "get_db_guard", lambda: g)
+    yield g
+    g["pool"].shutdown(wait=False)
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _rows(days):
+    return [{"id": d, "created_at": (T0 + timedelta(days=d)).isoformat()} for d in days]
+
+
+@pytest.fixture
+def entry(app):
+    def make(days, since=None, limit=None):
+        # 일부러 섞어서 넣음 → _attempt_entry가 created_at 오름차순으로 정렬
+        return app["_attempt_entry"](("u1",), ("id", "created_at"), _rows(reversed(days)), since, limit)
+    return make
+
+
+def _ids(rows):
+    return None if rows is None else [r["id"] for r in rows]
+
+
+def test_since_entry_serves_later_windows_only(app, entry):
+    e = entry([1, 3, 5, 7], since=T0 + timedelta(days=1))
+    assert _ids(app["_slice_since"](e, T0 + timedelta(days=4))) == [5, 7]
+    assert _ids(app["_slice_since"](e, T0 + timedelta(days=1))) == [1, 3, 5, 7]
+    assert app["_slice_since"](e, T0) is None  # 캐시보다 앞 구간은 모름
+
+
+def test_latest_entry_covers_since_when_not_truncated(app, entry):
+    e = entry([2, 4], limit=5)  # 전체 기록이 2건
+    assert _ids(app["_slice_since"](e, T0)) == [2, 4]
+    assert _ids(app["_slice_since"](e, T0 + timedelta(days=3))) == [4]
+
+
+def test_latest_entry_truncated_needs_older_row(app, entry):
+    e = entry([2, 4, 6], limit=3)  # 잘렸을 수 있음
+    assert _ids(app["_slice_since"](e, T0 + timedelta(days=3))) == [4, 6]
+    assert app["_slice_since"](e, T0 + timedelta(days=2)) is None  # 2일째 이전 행이 더 있을 수 있음
+    assert app["_slice_since"](e, T0) is None
+
+
+def test_slice_latest_from_limit_entry(app, entry):
+    e = entry([1, 2, 3, 4], limit=4)
+    assert _ids(app["_slice_latest"](e, 2)) == [3, 4]
+    assert _ids(app["_slice_latest"](e, 0)) == []
+    assert app["_slice_latest"](e, 10) is None  # 4건으로 잘렸을 수 있음
+    short = entry([1, 2], limit=4)
+    assert _ids(app["_slice_latest"](short, 10)) == [1, 2]  # 전체 기록이 더 적음
+
+
+def test_slice_latest_from_since_entry(app, entry):
+    e = entry([1, 2, 3], since=T0)
+    assert _ids(app["_slice_latest"](e, 2)) == [2, 3]
+    assert app["_slice_latest"](e, 5) is None  # since 이전 기록은 모름
@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+
+
+def _wrong(correct, picked, qtype="meaning"):
+    return {"유형": qtype, "정답": correct, "내 답": picked}
+
+
+class FakeAttempts:
+    """quiz_attempts 스캔 (id 내림차순 keyset). on_page: 페이지를 돌려주기 직전에 호출."""
+
+    def __init__(self, rows, on_page=None):
+        self.rows = sorted(rows, key=lambda r: -r["id"])
+        self.on_page = on_page
+
+    def table(self, _name):
+        return _Scan(self)
+
+
+class _Scan:
+    def __init__(self, db):
+        self.db, self.n, self.before = db, None, None
+
+    def select(self, *_):
+        return self
+
+    def gt(self, *_):
+        return self
+
+    def order(self, *_, **__):
+        return self
+
+    def limit(self, n):
+        self.n = n
+        return self
+
+    def lt(self, _col, v):
+        self.before = v
+        return self
+
+    def execute(self):
+        rows = [r for r in self.db.rows if self.before is None or r["id"] < self.before][: self.n]
+        if self.db.on_page:
+            self.db.on_page()
+        return type("Res", (), {"data": rows})()
+
+
+@pytest.fixture
+def store(app, guard, tmp_path, monkeypatch):
+    j = {"lock": threading.Lock(), "conn": app["_journal_connect"](tmp_path / "journal.sqlite3")}
+    s = {"lock": threading.Lock(), "index": app["_confusion_new"](), "rebuilds": []}
+    monkeypatch.setitem(app, "get_journal", lambda: j)
+    monkeypatch.setitem(app, "get_confusion_store", lambda: s)
+    yield s, j
+    j["conn"].close()
+
+
+def _count(idx, correct, picked, qtype="meaning"):
+    return idx["counts"].get((qtype, correct), {}).get(picked, 0)
+
+
+def test_rebuild_replaces_counts_with_scan(app, store):
+    s, j = store
+    app["record_confusions"]([_wrong("犬", "猫")])  # 스캔 결과에 없는 예전 증분 → 교체로 사라짐
+    rows = [{"id": i, "wrong_list": [_wrong("水", "氷")]} for i in range(1, 4)]
+    assert app["rebuild_confusion_index"](FakeAttempts(rows), page_size=2) == 3
+    assert _count(s["index"], "水", "氷") == 3
+    assert _count(s["index"], "犬", "猫") == 0
+    assert app["confusion_top"](s["index"], "meaning", "水") == ("氷",)
+    assert j["conn"].execute("SELECT correct, picked, n FROM confusions").fetchall() == [("水", "氷", 3)]
+
+
+def test_submits_during_rebuild_are_kept(app, store):
+    s, j = store
+    submits = iter([[_wrong("水", "氷")], [_wrong("山", "川")]])
+
+    def submit_mid_scan():
+        wl = next(submits, None)
+        if wl:
+            app["record_confusions"](wl)  # 스캔이 이미 지나간 새 제출
+
+    rows = [{"id": i, "wrong_list": [_wrong("水", "氷")]} for i in range(1, 4)]
+    app["rebuild_confusion_index"](FakeAttempts(rows, on_page=submit_mid_scan), page_size=2)
+    assert _count(s["index"], "水", "氷") == 4
+    assert _count(s["index"], "山", "川") == 1
+    assert s["rebuilds"] == []
+    saved = dict(((c, p), n) for c, p, n in j["conn"].execute("SELECT correct, picked, n FROM confusions"))
+    assert saved == {("水", "氷"): 4, ("山", "川"): 1}
+
+
+def test_failed_rebuild_keeps_index_and_stops_collecting(app, store):
+    s, _ = store
+    app["record_confusions"]([_wrong("犬", "猫")])
+
+    class Down:
+        def table(self, _name):
+            raise RuntimeError("backend down")
+
+    with pytest.raises(RuntimeError):
+        app["rebuild_confusion_index"](Down())
+    assert _count(s["index"], "犬", "猫") == 1
+    assert s["rebuilds"] == []
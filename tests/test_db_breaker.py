@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+
+def _trip(app, guard):
+    for _ in range(app["DB_BREAKER_MIN_CALLS"]):
+        app["_breaker_record"](guard, False, 0.0)
+    assert guard["open_until"] > time.time()
+
+
+def _fail():
+    raise RuntimeError("backend down")
+
+
+def test_opens_after_bad_calls_and_fast_fails(app, guard):
+    _trip(app, guard)
+    with pytest.raises(app["DBUnavailable"]):
+        app["db_call"](lambda: 1, name="t")
+
+
+def test_half_open_probe_success_closes(app, guard):
+    _trip(app, guard)
+    guard["open_until"] = time.time() - 1
+    assert app["db_call"](lambda: 42, name="t", timeout=2.0) == 42
+    assert guard["open_until"] == 0.0 and not guard["probing"]
+    assert app["db_call"](lambda: 7, name="t", timeout=2.0) == 7
+
+
+def test_half_open_probe_failure_reopens(app, guard):
+    _trip(app, guard)
+    guard["open_until"] = time.time() - 1
+    with pytest.raises(RuntimeError):
+        app["db_call"](_fail, name="t", timeout=2.0)
+    assert guard["open_until"] > time.time() and not guard["probing"]
+
+
+def test_only_one_probe_at_a_time(app, guard):
+    _trip(app, guard)
+    guard["open_until"] = time.time() - 1
+    assert app["_breaker_allow"](guard) == "probe"
+    assert not app["_breaker_allow"](guard)
+
+
+def test_overloaded_probe_does_not_wedge_the_breaker(app, guard):
+    _trip(app, guard)
+    guard["open_until"] = time.time() - 1
+    guard["inflight"] = app["DB_MAX_INFLIGHT"]  # 워커 풀 포화
+    with pytest.raises(app["DBUnavailable"], match="in flight"):
+        app["db_call"](lambda: 1, name="t", timeout=0.05)
+    assert not guard["probing"]
+
+    guard["inflight"] = 0
+    assert app["db_call"](lambda: 5, name="t", timeout=2.0) == 5
+    assert guard["open_until"] == 0.0
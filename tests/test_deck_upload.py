@@ -0,0 +1,46 @@
+import io
+
+import pytest
+
+HEADER = "level,pos,jp_word,reading,meaning,example_jp,example_kr\n"
+
+
+@pytest.fixture
+def validate(app, monkeypatch):
+    def run(body, chunk=1000):
+        monkeypatch.setitem(app, "DECK_UPLOAD_CHUNK", chunk)
+        return app["validate_deck_csv"](io.BytesIO((HEADER + body).encode("utf-8")))
+    return run
+
+
+def test_clean_deck_counts_rows_and_pos(validate):
+    r = validate("N5,noun,犬,いぬ,개,,\nN5,verb,食べる,たべる,먹다,,\n")
+    assert (r["schema"], r["rows"], r["n_errors"]) == ("canonical", 2, 0)
+    assert r["pos_counts"] == {"noun": 1, "verb": 1}
+
+
+def test_missing_column_raises(app):
+    with pytest.raises(ValueError):
+        app["validate_deck_csv"](io.BytesIO("level,pos,jp_word\nN5,noun,犬\n".encode("utf-8")))
+
+
+def test_duplicate_points_at_first_line(validate):
+    r = validate("N5,noun,犬,いぬ,개,,\nN5,noun,猫,ねこ,고양이,,\nN5,noun,犬,いぬ,개,,\n")
+    assert r["errors"] == [(4, "犬", "jp_word 중복 (2행)")]
+
+
+def test_line_numbers_across_chunks(validate):
+    body = "".join(f"N5,noun,w{i},r{i},m{i},,\n" for i in range(5)) + "N5,noun,w5,r5,,,\n"
+    assert validate(body, chunk=2)["errors"] == [(7, "w5", "meaning 비어 있음")]
+
+
+def test_line_numbers_count_blank_and_empty_rows(validate):
+    body = "N5,noun,犬,いぬ,개,,\n\n,,,,,,\nN5,noun,猫,,고양이,,\n"
+    r = validate(body, chunk=2)
+    assert r["rows"] == 2
+    assert r["errors"] == [(5, "猫", "reading 비어 있음")]
+
+
+def test_line_numbers_count_quoted_newlines(validate):
+    body = 'N5,noun,犬,いぬ,"개\n강아지",,\nN5,xx,猫,ねこ,고양이,,\n'
+    assert validate(body)["errors"] == [(4, "猫", "모르는 pos: xx")]
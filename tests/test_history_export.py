@@ -0,0 +1,64 @@
+import csv
+import io
+
+import pytest
+
+
+def _attempt(i, wrongs=None, **kw):
+    row = {"id": i, "created_at": f"2026-01-0{i}T00:00:00+00:00", "level": "noun", "pos_mode": "meaning",
+           "quiz_len": 10, "score": 10 - len(wrongs or []), "wrong_count": len(wrongs or [])}
+    if wrongs is not None:
+        row["wrong_list"] = wrongs
+    return {**row, **kw}
+
+
+def _wrong(no, word):
+    return {"No": no, "문제": f"{word}의 뜻은?", "내 답": "x", "정답": "y", "단어": word, "읽기": "", "뜻": "y"}
+
+
+def test_expand_one_row_per_wrong_answer(app):
+    out = app["expand_attempt_rows"]([_attempt(1, [_wrong(2, "犬"), _wrong(5, "猫")])])
+    assert [(r["attempt_id"], r["No"], r["단어"]) for r in out] == [(1, "2", "犬"), (1, "5", "猫")]
+    assert out[0]["pos_group"] == "noun" and out[0]["score"] == 8
+
+
+def test_expand_keeps_perfect_and_malformed_attempts(app):
+    cols = app["EXPORT_WRONG_COLS"]
+    out = app["expand_attempt_rows"]([
+        _attempt(1, []),
+        _attempt(2),                                  # wrong_list 없음
+        _attempt(3, wrong_list="[not json list]"),    # 리스트가 아님
+        _attempt(4, [None, {"단어": "鳥"}]),
+    ])
+    assert [r["attempt_id"] for r in out] == [1, 2, 3, 4, 4]
+    assert all(r[c] == "" for r in out[:3] for c in cols)
+    assert out[3]["단어"] == "" and out[4]["단어"] == "鳥" and out[4]["No"] == ""
+
+
+def test_csv_export_streams_pages(app):
+    buf = io.StringIO()
+    pages = iter([[_attempt(1, [_wrong(1, "犬")]), _attempt(2, [])], [_attempt(3, [_wrong(1, "猫"), _wrong(2, "鳥")])]])
+    assert app["write_history_export"](pages, buf) == (3, 4)
+    rows = list(csv.DictReader(io.StringIO(buf.getvalue())))
+    assert list(rows[0])[:2] == ["attempt_id", "created_at"]
+    assert [r["attempt_id"] for r in rows] == ["1", "2", "3", "3"]
+
+
+def test_parquet_export_matches_csv_rows(app):
+    pq = pytest.importorskip("pyarrow.parquet")
+    buf = io.BytesIO()
+    pages = [[_attempt(1, [_wrong(1, "犬")]), _attempt(2, [])]]
+    assert app["write_history_export"](iter(pages), buf, fmt="parquet") == (2, 2)
+    buf.seek(0)
+    table = pq.read_table(buf)
+    assert table.column("attempt_id").to_pylist() == [1, 2]
+    assert table.column("단어").to_pylist() == ["犬", ""]
+
+
+def test_capped_pages_stops_past_limit(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app, "EXPORT_MAX_BYTES", 100)
+    with open(tmp_path / "out.csv", "w", encoding="utf-8") as f:
+        pages = app["_capped_pages"](iter([[_attempt(i, [_wrong(1, "犬" * 50)])] for i in range(1, 5)]), f)
+        with pytest.raises(ValueError):
+            app["write_history_export"](pages, f)
+        assert f.tell() > 100
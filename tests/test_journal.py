@@ -0,0 +1,167 @@
+import json
+import threading
+
+import httpx
+import pytest
+
+
+class FakeServer:
+    """Supabase 대신: quiz_attempts upsert + word_results RPC (once는 마이그레이션과 같은 attempt_id 중복 제거)."""
+
+    def __init__(self, has_once=True):
+        self.has_once = has_once
+        self.attempts = {}
+        self.word_results = []
+        self.seen = set()
+        self.fail_next = None      # 반영하기 전에 던질 예외
+        self.drop_next = None      # "upsert" | "rpc": 그 요청은 반영한 뒤 응답 유실 (타임아웃)
+
+    def table(self, name):
+        return _Query(lambda: self._upsert, name)
+
+    def rpc(self, name, params):
+        return _Query(lambda: lambda: self._rpc(name, params["p_items"]), name)
+
+    def _upsert(self, payloads):
+        self._apply("upsert", lambda: [self.attempts.setdefault(p["attempt_id"], p) for p in payloads])
+
+    def _rpc(self, name, items):
+        if name == "record_word_results_bulk_once":
+            if not self.has_once:
+                raise RuntimeError("PGRST202: Could not find the function public.record_word_results_bulk_once(p_items)")
+            fresh = {it["attempt_id"] for it in items} - self.seen
+            self.seen |= fresh
+            items = [it for it in items if it["attempt_id"] in fresh]
+        self._apply("rpc", lambda: self.word_results.extend(items))
+
+    def _apply(self, op, fn):
+        if self.fail_next is not None:
+            e, self.fail_next = self.fail_next, None
+            raise e
+        fn()
+        if self.drop_next == op:
+            self.drop_next = None
+            raise httpx.ReadTimeout("response lost")
+
+
+class _Query:
+    def __init__(self, op, name):
+        self._op, self._name, self._args = op, name, ()
+
+    def upsert(self, payloads, **_):
+        self._args = (payloads,)
+        return self
+
+    def execute(self):
+        op = self._op()
+        return op(*self._args) if self._args else op()
+
+
+@pytest.fixture
+def journal(app, guard, tmp_path, monkeypatch):
+    j = {
+        "lock": threading.Lock(),
+        "conn": app["_journal_connect"](tmp_path / "journal.sqlite3"),
+        "wake": threading.Event(),
+        "pending_users": set(),
+        "tokens": {},
+        "service_key": "service",
+        "attempt_id_supported": True,
+        "word_results_dedupe": None,
+        "word_results_dedupe_checked_at": 0.0,
+        "unconfirmed_total": 0,
+        "last_error": "",
+        "last_drain_at": 0.0,
+        "sent_total": 0,
+    }
+    server = FakeServer()
+    monkeypatch.setitem(app, "get_journal", lambda: j)
+    monkeypatch.setitem(app, "_journal_client", lambda j, cred: server)
+    monkeypatch.setitem(app, "attempt_cache_invalidate", lambda uid: None)
+    yield j, server
+    j["conn"].close()
+
+
+def _submit(app, attempt_id, n_words=3):
+    items = [
+        {"attempt_id": attempt_id, "word_key": f"w{i}", "level": "BEGINNER", "pos": "noun",
+         "quiz_type": "meaning", "is_correct": i % 2 == 0}
+        for i in range(n_words)
+    ]
+    app["journal_append"](attempt_id, "u1", None, [
+        ("attempt", {"user_id": "u1", "attempt_id": attempt_id, "score": 2}),
+        ("word_results", items),
+    ])
+
+
+def _pending(j):
+    return j["conn"].execute("SELECT COUNT(*) FROM journal WHERE sent_at IS NULL").fetchone()[0]
+
+
+def test_append_same_attempt_twice_is_one_entry(app, journal):
+    j, _ = journal
+    _submit(app, "a1")
+    _submit(app, "a1")
+    assert _pending(j) == 2  # attempt + word_results
+    assert j["conn"].execute("SELECT SUM(n) FROM word_stats").fetchone()[0] == 3
+
+
+def test_replayed_claim_is_counted_once(app, journal):
+    j, server = journal
+    _submit(app, "a1")
+    server.drop_next = "upsert"  # quiz_attempts는 반영됐지만 응답 유실 → 다음 드레인에서 다시 나감
+    with pytest.raises(httpx.ReadTimeout):
+        app["journal_drain_once"](j)
+
+    # word_results도 반영 후 응답 유실 → 같은 항목이 다시 나감
+    (payload,) = j["conn"].execute("SELECT payload FROM journal WHERE kind = 'word_results'").fetchone()
+    items = json.loads(payload)
+    server.drop_next = "rpc"
+    with pytest.raises(httpx.ReadTimeout):
+        app["_journal_send_word_results_once"](j, server, items)
+    assert app["_journal_send_word_results_once"](j, server, items) is True
+
+    while _pending(j):
+        app["journal_drain_once"](j)
+    assert list(server.attempts) == ["a1"]
+    assert len(server.word_results) == 3
+    assert j["word_results_dedupe"] is True
+
+
+def test_without_server_dedupe_unanswered_send_is_not_retried(app, journal):
+    j, server = journal
+    server.has_once = False
+    _submit(app, "a1")
+    _submit(app, "a2")
+    server.drop_next = "rpc"  # 예전 RPC로 보낸 첫 제출의 응답 유실
+    app["journal_drain_once"](j)
+    assert _pending(j) == 0
+    assert j["word_results_dedupe"] is False
+    assert j["unconfirmed_total"] == 1
+    assert app["journal_drain_once"](j) == 0
+    assert sorted(it["attempt_id"] for it in server.word_results) == ["a1"] * 3 + ["a2"] * 3
+
+
+def test_without_server_dedupe_rejected_send_is_retried(app, journal):
+    j, server = journal
+    server.has_once = False
+    _submit(app, "a1")
+    app["journal_drain_once"](j)  # once 없음 확인 + attempt 전송
+    _submit(app, "a2")
+    server.fail_next = RuntimeError("500: statement timeout")  # 서버가 오류로 답함 = 롤백됨
+    with pytest.raises(RuntimeError):
+        app["journal_drain_once"](j)
+    assert _pending(j) == 1
+    app["journal_drain_once"](j)
+    assert _pending(j) == 0 and j["unconfirmed_total"] == 0
+    assert [it["attempt_id"] for it in server.word_results].count("a2") == 3
+
+
+def test_rechecks_server_dedupe_after_interval(app, journal):
+    j, server = journal
+    j["word_results_dedupe"] = False
+    j["word_results_dedupe_checked_at"] = 0.0  # 오래전에 확인 → 다시 확인
+    _submit(app, "a1")
+    app["journal_drain_once"](j)
+    assert j["word_results_dedupe"] is True
+    assert len(server.word_results) == 3
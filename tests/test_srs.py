@@ -0,0 +1,99 @@
+import pandas as pd
+import pytest
+
+NOW = 1_700_000_000.0
+DAY = 86400
+
+
+@pytest.fixture
+def deck():
+    pool = pd.DataFrame({"word_id": range(30), "jp_word": [f"w{i}" for i in range(30)]})
+    index = {"id_to_row": {i: i for i in range(30)}}
+    cand = (list(range(30)), frozenset(range(30)))
+    return pool, index, cand
+
+
+def test_review_intervals_follow_sm2(app):
+    item = None
+    ivs = []
+    t = NOW
+    for _ in range(4):
+        item = app["srs_review"](item, True, t)
+        ivs.append(item[1])
+        t = item[0]
+    assert ivs[:2] == [24, 6 * 24]
+    assert ivs[2] == round(ivs[1] * item[2] / 100)
+    wrong = app["srs_review"](item, False, t)
+    assert wrong[0] == int(t) + app["SRS_RELEARN_S"] and wrong[3] == 0
+
+
+def test_correct_word_is_scheduled_not_mastered(app):
+    state = app["srs_new_state"]()
+    app["srs_record"](state, [(7, True)], now=NOW)
+    assert not app["srs_graduate"](state, 7)
+    assert app["srs_pop_most_due"](state, 5, now=NOW + DAY + 1) == [7]
+
+
+def test_graduates_once_interval_passes_threshold(app):
+    state = app["srs_new_state"]()
+    t = NOW
+    graduated_after = None
+    for n in range(1, 10):
+        app["srs_record"](state, [(3, True)], now=t)
+        if app["srs_graduate"](state, 3):
+            graduated_after = n
+            break
+        t = state["items"][3][0]
+    assert graduated_after is not None and graduated_after >= 3
+    assert 3 not in state["items"]
+    assert app["srs_pop_most_due"](state, 5, now=t + 365 * DAY) == []
+
+
+def test_due_review_comes_before_new_words(app, deck):
+    pool, index, cand = deck
+    state = app["srs_new_state"]()
+    app["srs_record"](state, [(i, True) for i in range(5)], now=NOW - 2 * DAY)
+    picked = app["select_quiz_rows"](pool, index, cand, state, set(), set(), set(), 10, now=NOW)
+    assert len(picked) == 10
+    assert set(range(5)) <= set(picked)
+
+
+def test_closed_words_are_dropped_from_schedule_once(app, deck):
+    pool, index, cand = deck
+    state = app["srs_new_state"]()
+    app["srs_record"](state, [(i, True) for i in range(5)], now=NOW - 2 * DAY)
+    picked = app["select_quiz_rows"](pool, index, cand, state, set(), {"w0"}, {"w1"}, 10, now=NOW)
+    assert 0 not in picked and 1 not in picked
+    assert 0 not in state["items"] and 1 not in state["items"]
+    assert {2, 3, 4} <= set(state["items"])
+
+
+def test_fills_to_n_and_releases_seen_but_unanswered(app, deck):
+    pool, index, cand = deck
+    state = app["srs_new_state"]()
+    seen = {f"w{i}" for i in range(30)}
+    picked = app["select_quiz_rows"](pool, index, cand, state, seen, set(), set(), 10, now=NOW)
+    assert len(picked) == 10 and len(set(picked)) == 10
+
+
+def test_prefers_unseen_words(app, deck):
+    pool, index, cand = deck
+    state = app["srs_new_state"]()
+    seen = {f"w{i}" for i in range(25)}
+    picked = app["select_quiz_rows"](pool, index, cand, state, seen, set(), set(), 5, now=NOW)
+    assert sorted(picked) == [25, 26, 27, 28, 29]
+
+
+def test_none_when_too_few_open_words(app, deck):
+    pool, index, cand = deck
+    state = app["srs_new_state"]()
+    mastered = {f"w{i}" for i in range(25)}
+    assert app["select_quiz_rows"](pool, index, cand, state, set(), mastered, set(), 10, now=NOW) is None
+
+
+def test_early_review_when_everything_is_scheduled(app, deck):
+    pool, index, cand = deck
+    state = app["srs_new_state"]()
+    app["srs_record"](state, [(i, True) for i in range(30)], now=NOW)
+    picked = app["select_quiz_rows"](pool, index, cand, state, set(), set(), set(), 10, now=NOW + 60)
+    assert len(picked) == 10
@@ -0,0 +1,48 @@
+import pytest
+
+
+@pytest.fixture
+def ids(app, monkeypatch):
+    """word_id ↔ 단어 키 (덱 저장소 대신 고정 표). 해시 ID는 WORD_ID_HASH_BASE 이상."""
+    base = app["WORD_ID_HASH_BASE"]
+    table = {"犬": 0, "猫": 3, "鳥": 8, "魚": 200, "新語": base + 12345, "外来": base + 7}
+    rev = {v: k for k, v in table.items()}
+    monkeypatch.setitem(app, "word_ids_for_keys", lambda keys: [table[k] for k in keys if k in table])
+    monkeypatch.setitem(app, "word_keys_for_ids", lambda wids: [rev[w] for w in wids if w in rev])
+    return table
+
+
+def test_empty_set(app, ids):
+    assert app["encode_word_bitmap"]([]) == ""
+    assert app["encode_word_bitmap"](["모르는 단어"]) == ""
+    assert app["decode_word_bitmap"]("") == set()
+
+
+def test_listed_ids_round_trip(app, ids):
+    words = {"犬", "猫", "鳥", "魚"}
+    b64 = app["encode_word_bitmap"](words)
+    assert "." not in b64  # 해시 ID 없음 → 비트맵만
+    assert app["decode_word_bitmap"](b64) == words
+
+
+def test_hashed_ids_round_trip(app, ids):
+    words = {"犬", "新語", "外来"}
+    b64 = app["encode_word_bitmap"](words)
+    assert "." in b64
+    assert app["decode_word_bitmap"](b64) == words
+    only_hashed = app["encode_word_bitmap"]({"新語"})
+    assert only_hashed.startswith(".")
+    assert app["decode_word_bitmap"](only_hashed) == {"新語"}
+
+
+def test_max_listed_drops_untrusted_bits(app, ids):
+    b64 = app["encode_word_bitmap"]({"犬", "鳥", "魚", "新語"})
+    assert app["decode_word_bitmap"](b64, max_listed=10) == {"犬", "鳥", "新語"}
+    assert app["decode_word_bitmap"](b64, max_listed=0) == {"新語"}  # 목록이 바뀜 → 해시 ID만 믿음
+
+
+def test_bitmap_is_compact(app, ids, monkeypatch):
+    table = {f"w{i}": i for i in range(5000)}
+    monkeypatch.setitem(app, "word_ids_for_keys", lambda keys: [table[k] for k in keys if k in table])
+    b64 = app["encode_word_bitmap"](list(table))
+    assert len(b64) < 100  # 5000비트가 전부 1 → zlib으로 거의 없어짐
@@ -0,0 +1,111 @@
+"""
+인쇄용 학습지 일괄 생성 (문항 + 정답표, CSV/HTML)
+
+    python tools/make_worksheets.py --per-combo 100 --csv out/ws.csv --html out/ws.html
+    python tools/make_worksheets.py --deck data/one.csv --pos noun,verb --qtypes meaning,kr2jp --per-combo 500 --workers 4
+
+- app.py를 "실행"하지 않고 정의만 읽어서 사용 (bench와 같은 로더, UI·Supabase X)
+- 문항 생성은 app.py의 worksheet_plan / worksheet_rows (= make_question) 그대로
+- job(기본 100문항)을 프로세스 풀에 나눠 주고, 끝난 순서가 아니라 plan 순서대로 이어 씀
+- 같은 --seed = 같은 학습지 (workers 수와 무관)
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing as mp
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH = ROOT / "bench"
+
+if str(BENCH) not in sys.path:
+    sys.path.insert(0, str(BENCH))
+
+from bench_hot_paths import load_app_namespace  # noqa: E402
+
+PARALLEL_MIN_JOBS = 4  # job이 이보다 적으면 프로세스 풀 없이 바로 만듦
+
+# ============================================================
+# ✅ 워커 (fork면 부모의 덱/인덱스를 그대로 공유, spawn이면 initargs로 1번 전달)
+# ============================================================
+_NS: dict | None = None
+_POOL = None
+_INDEX = None
+
+def _quiet_streamlit():
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+def _init_worker(pool, index):
+    global _NS, _POOL, _INDEX
+    if _NS is None:
+        _NS = load_app_namespace()
+        _quiet_streamlit()
+    _POOL, _INDEX = pool, index
+
+def _run_job(job: dict) -> list[dict]:
+    return _NS["worksheet_rows"](_POOL, _INDEX, job)
+
+def iter_chunks_parallel(pool, index, jobs: list[dict], workers: int):
+    ctx = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(pool, index)) as ex:
+        yield from ex.map(_run_job, jobs)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--deck", type=Path, default=ROOT / "data" / "beginner.csv")
+    ap.add_argument("--pos", default="noun,adj_i,adj_na,verb,other", help="품사 그룹(쉼표 구분)")
+    ap.add_argument("--qtypes", default="reading,meaning,kr2jp", help="유형(쉼표 구분)")
+    ap.add_argument("--per-combo", type=int, default=50, help="품사×유형별 문항 수")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--workers", type=int, default=0, help="0 = CPU 수")
+    ap.add_argument("--csv", type=Path, default=None)
+    ap.add_argument("--html", type=Path, default=None)
+    ap.add_argument("--title", default="")
+    args = ap.parse_args(argv)
+    if args.csv is None and args.html is None:
+        ap.error("--csv 또는 --html 중 하나는 필요합니다.")
+
+    global _NS
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    _NS = load_app_namespace()
+    _quiet_streamlit()
+
+    t0 = time.perf_counter()
+    deck = _NS["current_deck"](str(args.deck.resolve()))
+    pool, index = deck["pool"], deck["index"]
+    _NS["wait_deck_neighbors"](index)  # fork 전에 (자식 프로세스에는 채우는 스레드가 없음)
+    groups = [g.strip() for g in args.pos.split(",") if g.strip()]
+    qtypes = [q.strip() for q in args.qtypes.split(",") if q.strip()]
+    jobs = _NS["worksheet_plan"](index, groups, qtypes, args.per_combo, args.seed)
+    print(f"deck: {len(pool)} words, {len(jobs)} jobs ({time.perf_counter() - t0:.1f}s)", file=sys.stderr)
+
+    workers = args.workers or mp.cpu_count()
+    if workers > 1 and len(jobs) >= PARALLEL_MIN_JOBS:
+        chunks = iter_chunks_parallel(pool, index, jobs, min(workers, len(jobs)))
+    else:
+        chunks = _NS["iter_worksheet_chunks"](pool, index, jobs)
+
+    title = args.title or f"{args.deck.stem} 학습지 (seed {args.seed})"
+    with ExitStack() as stack:
+        csv_f = html_f = None
+        if args.csv is not None:
+            args.csv.parent.mkdir(parents=True, exist_ok=True)
+            csv_f = stack.enter_context(open(args.csv, "w", encoding="utf-8-sig", newline=""))
+        if args.html is not None:
+            args.html.parent.mkdir(parents=True, exist_ok=True)
+            html_f = stack.enter_context(open(args.html, "w", encoding="utf-8"))
+        n = _NS["write_worksheets"](chunks, csv_f, html_f, title=title)
+
+    print(f"{n} questions in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())